@@ -1,5 +1,7 @@
 # services.py
+import time
 from asgiref.sync import sync_to_async
+from django.core.cache import cache
 from django.db import transaction
 from .models import UserGemWallet, GemTransaction
 # views.py
@@ -18,10 +20,239 @@ from Crypto.Hash import SHA256
 from Crypto.PublicKey import ECC
 from rest_framework.permissions import AllowAny
 
+from tori_backend.redis_client import get_redis, load_script
+from tori_backend.settings.constants import GEM_HOLD_TTL
+
 logger = logging.getLogger(__name__)
 
 User = get_user_model()
 
+# ---------------------------
+# 보석 홀드 (매칭 비용 에스크로)
+# ---------------------------
+# 매칭 시점에는 Redis의 사용 가능 잔액 미러에서 홀드만 잡고(DB 접근 없음),
+# 양쪽이 모두 수락했을 때 capture_gems로 DB 차감 + 거래 기록을 남긴다.
+# 거절/만료/연결 해제 시 release_gems로 홀드를 돌려준다.
+# - gem_available:{user_id}  사용 가능 잔액 = DB 잔액 - 홀드 합계 (없으면 DB에서 다시 채움)
+# - gem_holds:{user_id}      홀드 (Hash, hold_id -> amount)
+# - gem_hold_deadlines       홀드 만료 시각 (Sorted Set, 멤버 "user_id|hold_id") - 정리 작업이 해제
+# - gem_epoch:{user_id}      DB 잔액이 바뀔 때마다 증가 - 미러를 채우는 동안 바뀌었으면 채우지 않음
+# DB 잔액이 바뀌면(capture/spend/add/reward) 미러를 지우고 epoch를 올려, 다음 조회 때 DB에서 다시 채운다.
+AVAILABLE_KEY_PREFIX = "gem_available"
+HOLDS_KEY_PREFIX = "gem_holds"
+EPOCH_KEY_PREFIX = "gem_epoch"
+HOLD_DEADLINES_KEY = "gem_hold_deadlines"
+AVAILABLE_TTL = 60 * 10
+# 미러를 채우는 동안 잔액이 계속 바뀌면 이 횟수까지만 다시 시도 (그 뒤엔 저장하지 않은 계산값 반환)
+SEED_ATTEMPTS = 3
+
+# DB 잔액을 읽기 전에 본 epoch가 그대로일 때만 미러 저장 (그 사이 capture/spend가 있었으면 DB 값이 낡았을 수 있음)
+# KEYS: gem_available, gem_holds, gem_epoch / ARGV: DB 잔액, ttl, DB를 읽기 전 epoch
+# 반환: {사용 가능 잔액, 저장 여부}
+SEED_AVAILABLE_LUA = """
+local current = redis.call('GET', KEYS[1])
+if current then
+    return {tonumber(current), 1}
+end
+local held = 0
+for _, amount in ipairs(redis.call('HVALS', KEYS[2])) do
+    held = held + tonumber(amount)
+end
+local available = tonumber(ARGV[1]) - held
+if (redis.call('GET', KEYS[3]) or '') ~= ARGV[3] then
+    return {available, 0}
+end
+redis.call('SET', KEYS[1], available, 'EX', ARGV[2])
+return {available, 1}
+"""
+
+# DB 잔액 변경 후 미러 무효화 (다음 조회 때 DB에서 다시 채움)
+# KEYS: gem_available, gem_epoch / ARGV: epoch ttl
+INVALIDATE_AVAILABLE_LUA = """
+redis.call('DEL', KEYS[1])
+redis.call('INCR', KEYS[2])
+redis.call('EXPIRE', KEYS[2], ARGV[1])
+return 1
+"""
+
+# KEYS: gem_available, gem_holds, gem_hold_deadlines / ARGV: hold_id, amount, deadline, member
+# 반환: -1 미러 없음(채운 뒤 재시도), 0 잔액 부족, 1 성공 (같은 hold_id면 그대로 성공)
+HOLD_GEMS_LUA = """
+local available = redis.call('GET', KEYS[1])
+if not available then
+    return -1
+end
+if redis.call('HEXISTS', KEYS[2], ARGV[1]) == 1 then
+    return 1
+end
+if tonumber(available) < tonumber(ARGV[2]) then
+    return 0
+end
+redis.call('DECRBY', KEYS[1], ARGV[2])
+redis.call('HSET', KEYS[2], ARGV[1], ARGV[2])
+redis.call('ZADD', KEYS[3], ARGV[3], ARGV[4])
+return 1
+"""
+
+# KEYS: gem_available, gem_holds, gem_hold_deadlines / ARGV: hold_id, member
+RELEASE_GEMS_LUA = """
+local amount = redis.call('HGET', KEYS[2], ARGV[1])
+redis.call('ZREM', KEYS[3], ARGV[2])
+if not amount then
+    return 0
+end
+redis.call('HDEL', KEYS[2], ARGV[1])
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    redis.call('INCRBY', KEYS[1], amount)
+end
+return 1
+"""
+
+# DB 차감 후 홀드 정리 + 미러 무효화
+# KEYS: gem_available, gem_holds, gem_hold_deadlines, gem_epoch / ARGV: hold_id, member, epoch ttl
+CAPTURE_GEMS_LUA = """
+redis.call('ZREM', KEYS[3], ARGV[2])
+redis.call('HDEL', KEYS[2], ARGV[1])
+redis.call('DEL', KEYS[1])
+redis.call('INCR', KEYS[4])
+redis.call('EXPIRE', KEYS[4], ARGV[3])
+return 1
+"""
+
+
+def _hold_keys(user_id):
+    return [f"{AVAILABLE_KEY_PREFIX}:{user_id}", f"{HOLDS_KEY_PREFIX}:{user_id}", HOLD_DEADLINES_KEY]
+
+
+def _epoch_key(user_id):
+    return f"{EPOCH_KEY_PREFIX}:{user_id}"
+
+
+def _hold_member(user_id, hold_id):
+    return f"{user_id}|{hold_id}"
+
+
+def _wallet_balance(user_id):
+    wallet = UserGemWallet.objects.filter(user_id=user_id).only("balance").first()
+    return wallet.balance if wallet else 0
+
+
+async def _seed_available(redis_client, user_id):
+    seed = load_script(redis_client, SEED_AVAILABLE_LUA)
+    keys = _hold_keys(user_id)[:2] + [_epoch_key(user_id)]
+    for _ in range(SEED_ATTEMPTS):
+        epoch = await redis_client.get(_epoch_key(user_id))
+        balance = await sync_to_async(_wallet_balance)(user_id)
+        available, stored = await seed(
+            keys=keys, args=[balance, AVAILABLE_TTL, epoch.decode('utf-8') if epoch else ""], client=redis_client,
+        )
+        if stored:
+            break
+    return available
+
+
+async def get_available_gems(user_id):
+    """사용 가능 보석 (DB 잔액 - 홀드 합계) - 미러가 있으면 DB에 접근하지 않음"""
+    redis_client = get_redis()
+    available = await redis_client.get(f"{AVAILABLE_KEY_PREFIX}:{user_id}")
+    if available is None:
+        return await _seed_available(redis_client, user_id)
+    return int(available)
+
+
+async def hold_gems(user, amount, hold_id):
+    """
+    사용 가능 잔액에서 amount만큼 홀드 (DB 접근은 미러가 없을 때만)
+    잔액이 부족하면 False
+    """
+    if amount <= 0:
+        return True
+    redis_client = get_redis()
+    keys = _hold_keys(user.id)
+    hold = load_script(redis_client, HOLD_GEMS_LUA)
+    args = [hold_id, int(amount), time.time() + GEM_HOLD_TTL, _hold_member(user.id, hold_id)]
+
+    result = await hold(keys=keys, args=args, client=redis_client)
+    if result == -1:
+        await _seed_available(redis_client, user.id)
+        result = await hold(keys=keys, args=args, client=redis_client)
+    return result == 1
+
+
+async def release_gems(user_id, hold_id):
+    """홀드 해제 (이미 해제/확정된 홀드면 False)"""
+    redis_client = get_redis()
+    release = load_script(redis_client, RELEASE_GEMS_LUA)
+    released = await release(
+        keys=_hold_keys(user_id), args=[hold_id, _hold_member(user_id, hold_id)], client=redis_client,
+    )
+    return bool(released)
+
+
+async def capture_gems(user, amount, hold_id, note=None):
+    """
+    홀드를 확정 - DB 지갑 차감 + 거래 기록 (잔액 부족이면 ValueError, 홀드는 그대로 둠)
+    """
+    new_balance = await sync_to_async(_debit_wallet)(user, amount, note or "Spent gems")
+    redis_client = get_redis()
+    capture = load_script(redis_client, CAPTURE_GEMS_LUA)
+    await capture(
+        keys=_hold_keys(user.id) + [_epoch_key(user.id)], args=[hold_id, _hold_member(user.id, hold_id), AVAILABLE_TTL],
+        client=redis_client,
+    )
+    return new_balance
+
+
+async def release_expired_holds(now=None):
+    """만료 시각이 지난 홀드 해제 - 해제한 개수 반환"""
+    redis_client = get_redis()
+    members = await redis_client.zrangebyscore(HOLD_DEADLINES_KEY, "-inf", now if now is not None else time.time())
+    released = 0
+    for member in members:
+        user_id, hold_id = member.decode('utf-8').split("|", 1)
+        released += await release_gems(user_id, hold_id)
+    return released
+
+
+async def _invalidate_available(user_id):
+    """DB 잔액이 바뀌었으므로 미러를 지움"""
+    try:
+        redis_client = get_redis()
+        invalidate = load_script(redis_client, INVALIDATE_AVAILABLE_LUA)
+        await invalidate(keys=[f"{AVAILABLE_KEY_PREFIX}:{user_id}", _epoch_key(user_id)], args=[AVAILABLE_TTL],
+                         client=redis_client)
+    except Exception as e:
+        logger.error(f"Error invalidating gem balance mirror for user {user_id}: {e}")
+
+
+def _invalidate_available_sync(user_id):
+    try:
+        redis_client = cache.client.get_client()
+        invalidate = load_script(redis_client, INVALIDATE_AVAILABLE_LUA)
+        invalidate(keys=[f"{AVAILABLE_KEY_PREFIX}:{user_id}", _epoch_key(user_id)], args=[AVAILABLE_TTL],
+                   client=redis_client)
+    except Exception as e:
+        logger.error(f"Error invalidating gem balance mirror for user {user_id}: {e}")
+
+
+@transaction.atomic
+def _debit_wallet(user, amount, note):
+    wallet, _ = UserGemWallet.objects.get_or_create(user=user)
+    wallet.refresh_from_db()
+    if wallet.balance < amount:
+        raise ValueError("Not enough gems")
+    wallet.balance -= int(amount)
+    wallet.save(update_fields=["balance", "updated_at"])
+
+    GemTransaction.objects.create(
+        user=user,
+        transaction_type="spend",
+        amount=int(amount),
+        note=note
+    )
+    return wallet.balance
+
+
 async def add_gems(user, amount, note=None):
     """
     지갑에 gems를 증가시키고 트랜잭션 기록
@@ -41,6 +272,7 @@ async def add_gems(user, amount, note=None):
         return wallet.balance
 
     new_balance = await sync_to_async(increase)()
+    await _invalidate_available(user.id)
     return new_balance
 
 
@@ -48,24 +280,8 @@ async def spend_gems(user, amount, note=None):
     """
     지갑에서 gems를 감소시키고 트랜잭션 기록
     """
-    @transaction.atomic
-    def deduct():
-        wallet, _ = UserGemWallet.objects.get_or_create(user=user)
-        wallet.refresh_from_db()
-        if wallet.balance < amount:
-            raise ValueError("Not enough gems")
-        wallet.balance -= int(amount)
-        wallet.save(update_fields=["balance", "updated_at"])
-
-        GemTransaction.objects.create(
-            user=user,
-            transaction_type="spend",
-            amount=int(amount),
-            note=note or "Spent gems"
-        )
-        return wallet.balance
-
-    new_balance = await sync_to_async(deduct)()
+    new_balance = await sync_to_async(_debit_wallet)(user, amount, note or "Spent gems")
+    await _invalidate_available(user.id)
     return new_balance
 
 
@@ -85,6 +301,8 @@ def reward_gems_sync(user, amount, note=None):
             note=note or "Rewarded gems",
         )
 
+    # 바깥 트랜잭션이 있으면 커밋된 뒤에 반영
+    transaction.on_commit(lambda: _invalidate_available_sync(user.id))
     return wallet.balance
 
 
@@ -8,14 +8,9 @@ class MatchConfig(AppConfig):
     name = 'match'
 
     def ready(self):
-        from .models import MatchQueue, MatchRequest, MatchedRoom
+        from . import signals  # noqa: F401 - 매칭 프로필 캐시 시그널 등록
 
-        # 서버 시작 시 매칭 관련 임시 데이터 삭제
-        queue_count, _ = MatchQueue.objects.all().delete()
-        request_count, _ = MatchRequest.objects.all().delete()
-        room_count, _ = MatchedRoom.objects.all().delete()
-
-        logger.info(
-            f"Server start: Cleared MatchQueue={queue_count}, "
-            f"MatchRequest={request_count}, MatchedRoom={room_count}"
-        )
+        # 매칭 임시 데이터(MatchQueue/MatchRequest/MatchedRoom) 삭제와 활성 방 카운터 재설정은
+        # ASGI 서버 시작 시(tori_backend/asgi.py clear_match_data)에만 한다.
+        # ready()는 run_matcher / run_sweeper / run_event_consumer 같은 관리 명령에서도 실행되므로
+        # 여기서 지우면 백그라운드 작업을 재시작할 때마다 다른 프로세스의 진행 중인 방까지 사라진다.
@@ -0,0 +1,103 @@
+# match/buckets.py
+"""
+매칭 호환성 인덱스 (성별, 선호 성별, 나이 구간) 버킷 계산
+
+큐에 들어온 사용자는 match_queue 외에 자신이 속한 버킷 Sorted Set에도 함께 등록된다.
+파트너 검색 시에는 서로 호환될 수 있는 버킷만 조회하므로 큐 전체를 훑지 않는다.
+"""
+import logging
+from typing import Any, Dict, List, Optional
+
+from tori_backend.settings.constants import MATCH_AGE_BAND_SIZE
+
+logger = logging.getLogger(__name__)
+
+BUCKET_KEY_PREFIX = "match_bucket"
+USER_BUCKET_KEY_PREFIX = "match_bucket_of"  # 유저가 현재 등록된 버킷 키
+
+GENDERS = ("male", "female")
+
+
+def age_band(age: int) -> int:
+    """나이를 구간 번호로 변환"""
+    return int(age) // MATCH_AGE_BAND_SIZE
+
+
+def bucket_key(gender: str, preferred_gender: str, band: int) -> str:
+    return f"{BUCKET_KEY_PREFIX}:{gender}:{preferred_gender}:{band}"
+
+
+def user_bucket_key(user_id) -> str:
+    return f"{USER_BUCKET_KEY_PREFIX}:{user_id}"
+
+
+def bucket_for_setting(setting: Optional[Dict[str, Any]]) -> Optional[str]:
+    """매칭 설정이 속하는 버킷 키 (필수 정보가 없으면 None)"""
+    if not setting:
+        return None
+    gender = setting.get('user_gender')
+    preferred_gender = setting.get('preferred_gender')
+    age = setting.get('user_age')
+    if gender not in GENDERS or preferred_gender is None or age is None:
+        return None
+    return bucket_key(gender, preferred_gender, age_band(age))
+
+
+def candidate_bucket_keys(setting: Optional[Dict[str, Any]]) -> List[str]:
+    """
+    상호 호환 가능성이 있는 상대 버킷 목록
+
+    - 상대 성별: 내 선호 성별 (any면 전체)
+    - 상대 선호 성별: 내 성별 또는 any
+    - 상대 나이 구간: 내 age_min ~ age_max와 겹치는 구간
+    상대의 나이 범위에 내 나이가 들어가는지는 버킷으로 알 수 없으므로 is_compatible에서 확인한다.
+    """
+    if not setting:
+        return []
+    my_gender = setting.get('user_gender')
+    preferred_gender = setting.get('preferred_gender')
+    age_min = setting.get('age_min')
+    age_max = setting.get('age_max')
+    if my_gender not in GENDERS or preferred_gender is None or age_min is None or age_max is None:
+        return []
+    if age_min > age_max:
+        return []
+
+    other_genders = GENDERS if preferred_gender == 'any' else (preferred_gender,)
+    other_preferences = (my_gender, 'any')
+    bands = range(age_band(age_min), age_band(age_max) + 1)
+
+    return [
+        bucket_key(gender, preference, band)
+        for gender in other_genders
+        for preference in other_preferences
+        for band in bands
+    ]
+
+
+def is_compatible(my_setting: Dict[str, Any], other_setting: Dict[str, Any]) -> bool:
+    """매칭 호환성 확인"""
+    try:
+        # 필수 정보 확인
+        for key in ('user_age', 'user_gender', 'age_min', 'age_max', 'preferred_gender'):
+            if my_setting.get(key) is None or other_setting.get(key) is None:
+                return False
+
+        # 나이 범위 확인
+        if not (my_setting['age_min'] <= other_setting['user_age'] <= my_setting['age_max']):
+            return False
+        if not (other_setting['age_min'] <= my_setting['user_age'] <= other_setting['age_max']):
+            return False
+
+        # 성별 선호도 확인
+        if (my_setting['preferred_gender'] != 'any' and 
+            other_setting['user_gender'] != my_setting['preferred_gender']):
+            return False
+        if (other_setting['preferred_gender'] != 'any' and 
+            my_setting['user_gender'] != other_setting['preferred_gender']):
+            return False
+
+        return True
+    except Exception as e:
+        logger.error(f"Error checking compatibility: {e}")
+        return False
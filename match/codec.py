@@ -0,0 +1,146 @@
+# match/codec.py
+"""
+WebSocket 메시지 코덱 (MatchConsumer / VoiceChatSignalingConsumer 공용)
+
+기본은 지금까지와 같은 JSON 텍스트 프레임이고, 클라이언트가 원할 때만 바이너리 코덱을 쓴다.
+- 선택: 서브프로토콜 "tori.msgpack" (Sec-WebSocket-Protocol) 또는 쿼리 파라미터 ?codec=msgpack
+- msgpack: 바이너리 프레임, "type"/"action" 값은 MESSAGE_CODES의 짧은 정수 코드로 전송
+- json: orjson이 설치돼 있으면 orjson으로 인코딩 (출력 형식은 같은 JSON)
+msgpack / orjson은 선택 의존성(requirements-codec.txt) - 설치돼 있지 않으면 JSON(표준 json 모듈)으로 동작한다.
+"""
+import json
+import logging
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qs
+
+try:
+    import msgpack
+except ImportError:  # 선택 의존성
+    msgpack = None
+
+try:
+    import orjson
+except ImportError:  # 선택 의존성
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+SUBPROTOCOL_PREFIX = "tori."
+
+# 메시지 타입 / 액션 코드 (클라이언트와 공유 - 번호는 바꾸지 말고 뒤에 추가만)
+MESSAGE_CODES = {
+    # 서버 -> 클라이언트
+    "session": 1,
+    "pong": 2,
+    "gem_error": 3,
+    "match_found": 4,
+    "match_response": 5,
+    "match_success": 6,
+    "match_cancelled": 7,
+    "role_assignment": 8,
+    # 시그널링 중계
+    "offer": 9,
+    "answer": 10,
+    "ice-candidate": 11,
+    # 클라이언트 -> 서버 (action)
+    "join_queue": 20,
+    "respond": 21,
+    "leave_queue": 22,
+    "ping": 23,
+}
+MESSAGE_NAMES = {code: name for name, code in MESSAGE_CODES.items()}
+CODED_FIELDS = ("type", "action")
+
+Frame = Tuple[Optional[str], Optional[bytes]]  # (text_data, bytes_data)
+
+
+class JsonCodec:
+    name = "json"
+
+    def encode(self, message: Dict[str, Any]) -> Frame:
+        if orjson is not None:
+            return orjson.dumps(message).decode('utf-8'), None
+        return json.dumps(message), None
+
+    def decode(self, text_data: Optional[str], bytes_data: Optional[bytes]) -> Dict[str, Any]:
+        raw = text_data if text_data is not None else bytes_data
+        if orjson is not None:
+            return orjson.loads(raw)  # orjson.JSONDecodeError는 ValueError
+        return json.loads(raw)
+
+
+class MsgpackCodec:
+    name = "msgpack"
+
+    def encode(self, message: Dict[str, Any]) -> Frame:
+        compact = dict(message)
+        for field in CODED_FIELDS:
+            if compact.get(field) in MESSAGE_CODES:
+                compact[field] = MESSAGE_CODES[compact[field]]
+        return None, msgpack.packb(compact)
+
+    def decode(self, text_data: Optional[str], bytes_data: Optional[bytes]) -> Dict[str, Any]:
+        if bytes_data is None:
+            # 텍스트 프레임은 JSON으로 처리
+            return JSON_CODEC.decode(text_data, None)
+        try:
+            message = msgpack.unpackb(bytes_data)
+        except Exception as e:
+            raise ValueError(f"Invalid msgpack frame: {e}") from e
+        if not isinstance(message, dict):
+            raise ValueError("msgpack frame is not a map")
+        for field in CODED_FIELDS:
+            if isinstance(message.get(field), int):
+                message[field] = MESSAGE_NAMES.get(message[field], message[field])
+        return message
+
+
+JSON_CODEC = JsonCodec()
+CODECS = {JSON_CODEC.name: JSON_CODEC}
+if msgpack is not None:
+    CODECS[MsgpackCodec.name] = MsgpackCodec()
+
+
+def get_codec(name: Optional[str]):
+    return CODECS.get(name or "", JSON_CODEC)
+
+
+def negotiate(scope) -> Tuple[Any, Optional[str]]:
+    """
+    연결 scope에서 코덱 선택 - (codec, accept 시 돌려줄 서브프로토콜 또는 None)
+    서브프로토콜이 쿼리 파라미터보다 우선, 지원하지 않는 코덱은 JSON
+    """
+    for subprotocol in scope.get("subprotocols") or []:
+        name = subprotocol[len(SUBPROTOCOL_PREFIX):] if subprotocol.startswith(SUBPROTOCOL_PREFIX) else ""
+        if name in CODECS:
+            return CODECS[name], subprotocol
+
+    query = parse_qs(scope.get("query_string", b"").decode("utf-8"))
+    name = query.get("codec", [None])[0]
+    if name and name not in CODECS:
+        logger.warning(f"Unsupported WebSocket codec '{name}' requested, using json")
+    return get_codec(name), None
+
+
+class CodecConsumerMixin:
+    """AsyncWebsocketConsumer용 - connect에서 select_codec() 후 accept_codec()"""
+
+    codec = JSON_CODEC
+    subprotocol = None
+
+    def select_codec(self):
+        self.codec, self.subprotocol = negotiate(self.scope)
+
+    async def accept_codec(self):
+        await self.accept(subprotocol=self.subprotocol)
+
+    async def send_frame(self, frame: Frame):
+        text_data, bytes_data = frame
+        await self.send(text_data=text_data, bytes_data=bytes_data)
+
+    async def send_message(self, message: Dict[str, Any]):
+        await self.send_frame(self.codec.encode(message))
+
+    def decode_message(self, text_data: Optional[str], bytes_data: Optional[bytes]) -> Dict[str, Any]:
+        """수신 프레임 -> dict (잘못된 프레임은 ValueError)"""
+        return self.codec.decode(text_data, bytes_data)
@@ -1,18 +1,26 @@
 from channels.generic.websocket import AsyncWebsocketConsumer
-import json
 import logging
-from .services import MatchService
+import time
+from urllib.parse import parse_qs
+
+from tori_backend.redis_client import get_redis
+
+from . import events, presence, sessions
+from .codec import CodecConsumerMixin
+from .events import emit_event
+from .profiles import aget_profile, profile_user
+from .rematch import backoff_delay, get_dispatcher
+from .services import MatchService, build_match_notification
 from django.conf import settings
-import asyncio
 
 logger = logging.getLogger(__name__)
 
-class MatchConsumer(AsyncWebsocketConsumer):
+class MatchConsumer(CodecConsumerMixin, AsyncWebsocketConsumer):
 
     async def send_json(self, content):
-        """JSON 응답 전송"""
+        """응답 전송 (기본 JSON, 협상된 경우 msgpack - match/codec.py)"""
         try:
-            await self.send(text_data=json.dumps(content))
+            await self.send_message(content)
         except Exception as e:
             logger.error(f"Error sending JSON: {e}")
 
@@ -24,24 +32,48 @@ class MatchConsumer(AsyncWebsocketConsumer):
 
         self.user = self.scope["user"]
         self.user_id = str(self.user.id)
+        self.select_codec()
         self.group_name = f"user_{self.user.id}"
         self.service = MatchService(self.user)
+        self.resume_token = None
+        self.session_epoch = None
+        self.end_on_disconnect = False
+        self.session_taken_over = False
+        self.presence_touched_at = None
+        self.lock_retries = 0  # 연속 matching_in_progress 횟수 (재시도 백오프)
 
         try:
-            # 중복 로그인 체크
-            if await self.service.is_user_online():
+            redis_client = get_redis()
+
+            # 이 연결을 현재 세션으로 등록 - 이전 연결이 살아 있으면(중복 로그인) 그 채널에만 종료 요청
+            self.session_epoch, replaced_channel = await sessions.register_session(
+                redis_client, self.user_id, self.channel_name
+            )
+
+            # 재접속 유예 중인 세션 재개 (정리/재매칭 없이 이어서 사용)
+            # 이전 소켓이 반쯤 끊겨 아직 등록돼 있어도 같은 토큰이면 그 세션을 넘겨받는다
+            query = parse_qs(self.scope.get("query_string", b"").decode("utf-8"))
+            resume_token = query.get("resume", [None])[0]
+            room_name = await sessions.resume(redis_client, self.user_id, resume_token,
+                                              takeover=bool(replaced_channel))
+            if replaced_channel:
                 logger.info(f"User {self.user_id} is already online, disconnecting old session")
+                await self.channel_layer.send(replaced_channel, {
+                    "type": "force_disconnect",
+                    "reason": "session_resumed" if room_name is not None else "new_login"
+                })
+            if room_name is not None:
+                await self.resume_session(redis_client, room_name)
+                return
 
-                await self.channel_layer.group_send(
-                    f"user_{self.user_id}",
-                    {
-                        "type": "force_disconnect",
-                        "reason": "new_login"
-                    }
-                )
+            # 재개하지 않는 새 연결 - 유예 중인 이전 세션은 지금 정리
+            room_name = await sessions.end_grace(redis_client, self.user_id)
+            if room_name is not None:
+                await sessions.end_session(self.user, self.channel_layer, room_name)
+            elif replaced_channel:
+                # 대체된 연결은 끊길 때 정리를 건너뛰므로 이전 세션의 대기열/매치는 여기서 정리
+                await sessions.end_session(self.user, self.channel_layer)
 
-                await asyncio.sleep(0.1)
-                
             # 이미 매칭 중인지 확인
             if await self.service._has_active_match():
                 logger.warning(f"User {self.user_id} tried to connect but already has an active match")
@@ -50,10 +82,11 @@ class MatchConsumer(AsyncWebsocketConsumer):
 
             # 채널 그룹에 추가 후 accept
             await self.channel_layer.group_add(self.group_name, self.channel_name)
-            await self.accept()
+            await self.accept_codec()
 
             # 사용자 온라인 상태 표시
-            await self.service.mark_user_online()
+            await self.refresh_presence(force=True)
+            await self.send_session_token(redis_client)
 
             logger.info(f"User {self.user.id} connected to match service")
 
@@ -65,43 +98,79 @@ class MatchConsumer(AsyncWebsocketConsumer):
                 logger.warning(f"Failed to discard group for user {self.user.id}: {ex}")
             await self.close()
 
+    async def resume_session(self, redis_client, room_name):
+        """유예 중이던 세션 복원 - 대기열/매치/방은 그대로, 응답 대기 중인 매치는 다시 알림"""
+        if room_name:
+            self.current_room_name = room_name
+
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept_codec()
+        await self.refresh_presence(force=True)
+        await self.send_session_token(redis_client, room_name, resumed=True)
+        await emit_event(redis_client, events.RESUMED, user_id=self.user_id, room=room_name)
+
+        for match_data in await self.service.get_current_match_requests():
+            if match_data.get('status') != 'pending':
+                continue
+            partner_id = match_data['user2'] if match_data['user1'] == self.user_id else match_data['user1']
+            profile = await aget_profile(partner_id)
+            if profile:
+                await self.notify_match(build_match_notification(profile_user(profile)))
+
+        logger.info(f"User {self.user.id} resumed match session (room: {room_name or None})")
+
+    async def send_session_token(self, redis_client, room_name="", resumed=False):
+        """재개 토큰 발급 - 끊겼다가 ws/match/?resume=<token>으로 다시 연결하면 세션 유지"""
+        self.resume_token = await sessions.issue_token(redis_client, self.user_id, room_name)
+        await self.send_json({
+            "type": "session",
+            "resume_token": self.resume_token,
+            "resumed": resumed,
+        })
+
     async def disconnect(self, close_code):
-        """연결 해제 시 정리"""
+        """연결 해제 시 정리 (재접속 유예 중에는 대기열/매치/방 유지)"""
         try:
-            affected_users = await self.service.handle_disconnect_cleanup()
-            
-            logger.info(f"User {self.user.id} disconnected, affected users: {affected_users}")
-            
-            for user_id in affected_users:
-                if user_id != self.user.id:
+            get_dispatcher().unregister(self.user_id, self)
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+            redis_client = get_redis()
+            await emit_event(redis_client, events.DISCONNECTED, user_id=self.user_id, code=close_code)
+            room_name = getattr(self, "current_room_name", None)
+            released = await sessions.release_session(
+                redis_client, self.user_id, self.session_epoch, self.resume_token, room_name,
+                grace=not self.end_on_disconnect,
+            )
+            if released == sessions.SESSION_REPLACED:
+                # 새 연결이 이미 대기열/매치를 정리했으므로 음성 채팅방에만 알림 (세션을 이어받았으면 방도 유지)
+                logger.info(f"User {self.user.id} session replaced by a new connection, skipping cleanup")
+                if room_name and not self.session_taken_over:
                     await self.channel_layer.group_send(
-                        f"user_{user_id}",
+                        f"voicechat_{room_name}",
                         {
-                            "type": "match_cancelled",
-                            "from": self.user.username
+                            "type": "force_disconnect",
+                            "reason": "match_disconnected"
                         }
                     )
+                return
+            if released == sessions.SESSION_GRACE:
+                logger.info(f"User {self.user.id} disconnected, holding session for reconnect")
+                return
 
-            room_name = getattr(self, "current_room_name", None)
-            if room_name:
-                await self.channel_layer.group_send(
-                    f"voicechat_{room_name}",
-                    {
-                        "type": "force_disconnect",
-                        "reason": "match_disconnected"
-                    }
-                )
-            
-            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+            await sessions.drop_token(redis_client, self.user_id, self.resume_token)
+            await sessions.end_session(self.user, self.channel_layer, room_name)
             
         except Exception as e:
             logger.error(f"Error during disconnect cleanup for user {self.user.id}: {e}")
 
-    async def receive(self, text_data):
+    async def receive(self, text_data=None, bytes_data=None):
         """메시지 수신 처리"""
         try:
-            data = json.loads(text_data)
+            data = self.decode_message(text_data, bytes_data)
             action = data.get("action")
+            # ping을 보내지 않는 클라이언트도 프레임을 보내는 동안은 온라인으로 유지
+            if action != "ping":
+                await self.refresh_presence()
 
             if action == "join_queue":
                 await self.handle_join_queue()
@@ -109,17 +178,27 @@ class MatchConsumer(AsyncWebsocketConsumer):
                 await self.handle_response(data)
             elif action == "leave_queue":
                 await self.handle_leave_queue()
+            elif action == "ping":
+                await self.handle_ping()
             else:
                 logger.warning(f"Unknown action '{action}' from user {self.user.id}")
                 
-        except json.JSONDecodeError:
-            logger.error(f"Invalid JSON from user {self.user.id}: {text_data}")
+        except ValueError:
+            logger.error(f"Invalid message from user {self.user.id}: {text_data if text_data is not None else bytes_data}")
         except Exception as e:
             logger.error(f"Error processing message from user {self.user.id}: {e}")
 
     async def handle_join_queue(self):
         """큐 참가 처리"""
         try:
+            # 매칭 비용을 낼 수 없으면 큐에 넣지 않고 바로 알림
+            if not await self.service.can_afford_matching():
+                await self.send_json({
+                    "type": "gem_error",
+                    "reason": "not_enough_gems"
+                })
+                return
+
             success = await self.service.add_to_queue()
             if success:
                 await self.try_match()
@@ -129,13 +208,35 @@ class MatchConsumer(AsyncWebsocketConsumer):
     async def handle_leave_queue(self):
         """큐 떠나기 처리"""
         try:
+            get_dispatcher().unregister(self.user_id)
             await self.service.remove_from_queue()
         except Exception as e:
             logger.error(f"Error leaving queue for user {self.user.id}: {e}")
 
+    async def handle_ping(self):
+        """heartbeat - 온라인 상태 갱신"""
+        if await self.refresh_presence(force=True):
+            await self.send_json({"type": "pong"})
+
+    async def refresh_presence(self, force=False) -> bool:
+        """온라인 상태 갱신 - force가 아니면 presence.TOUCH_INTERVAL에 한 번만 기록"""
+        now = time.monotonic()
+        if not force and self.presence_touched_at is not None and now - self.presence_touched_at < presence.TOUCH_INTERVAL:
+            return True
+        touched = await self.service.mark_user_online()
+        if touched:
+            self.presence_touched_at = now
+        return touched
+
     async def try_match(self):
         """매칭 시도 - 단순화된 원자적 매칭 시스템"""
+        # 재시도 동안에는 이벤트 대상에서만 빼고, 다시 대기하게 되지 않으면 finally에서 해제
+        dispatcher = get_dispatcher()
+        dispatcher.suspend(self.user_id)
+        waiting = False
         try:
+            # 재매칭 알림으로 호출될 때도 연결이 살아 있다는 뜻이므로 함께 갱신
+            await self.refresh_presence()
             result, matched_user = await self.service.find_and_match_atomic()
             
             if result in ["no_wallet", "not_enough_gems"]:
@@ -147,11 +248,9 @@ class MatchConsumer(AsyncWebsocketConsumer):
                 return
 
             if result == "match_created" and matched_user:
-                image_url = self.user.profile_image.url if self.user.profile_image else ""
                 matched_user_image_url = matched_user.profile_image.url if matched_user.profile_image else ""
 
                 host = settings.SERVER_HOST
-                absolute_url = host + image_url
 
                 await self.send_json({
                     "type": "match_found",
@@ -163,19 +262,20 @@ class MatchConsumer(AsyncWebsocketConsumer):
 
                 await self.channel_layer.group_send(
                     f"user_{matched_user.id}",
-                    {
-                        "type": "notify_match",
-                        "partner": self.user.username,
-                        "partner_image_url": absolute_url,
-                        "partner_age": self.user.age if self.user.age else 0,
-                        "partner_gender": self.user.gender if self.user.gender else "unknown",
-                    }
+                    build_match_notification(self.user)
                 )
                 
                 logger.info(f"Match created between {self.user.id} and {matched_user.id}")
                 return
 
-            elif result in ["no_setting", "no_match", "already_matched"]:
+            elif result == "no_match":
+                # 호환 버킷에 새 대기자가 생기면 다시 시도 (match/rematch.py)
+                self.lock_retries = 0
+                waiting = dispatcher.register(self, await self.service.get_my_setting())
+                logger.debug(f"Match result for user {self.user.id}: {result}")
+                return
+
+            elif result in ["no_setting", "already_matched"]:
                 logger.debug(f"Match result for user {self.user.id}: {result}")
                 return
 
@@ -187,8 +287,11 @@ class MatchConsumer(AsyncWebsocketConsumer):
             #     return
 
             elif result == "matching_in_progress":
-                # logger.debug(f"Global matching in progress for user {self.user.id}, skipping retry")
-                # 큐 재등록/재시도 없이 그냥 종료
+                # 같은 버킷을 다른 요청이 스캔 중 - 큐 이벤트를 기다리면서 백오프 후 한 번은 직접 다시 시도
+                waiting = dispatcher.register(self, await self.service.get_my_setting())
+                if waiting:
+                    dispatcher.schedule(self.user_id, backoff_delay(self.lock_retries))
+                    self.lock_retries += 1
                 return
 
 
@@ -197,6 +300,10 @@ class MatchConsumer(AsyncWebsocketConsumer):
                 return
         except Exception as e:
             logger.error(f"Exception during match attempt for user {self.user.id}: {e}")
+        finally:
+            if not waiting:
+                self.lock_retries = 0
+                dispatcher.unregister(self.user_id)
 
     async def handle_response(self, data):
         """매치 응답 처리"""
@@ -236,6 +343,7 @@ class MatchConsumer(AsyncWebsocketConsumer):
             if result == "success":
                 room_name = f"{min(self.user.id, other_user.id)}_{max(self.user.id, other_user.id)}"
                 self.current_room_name = room_name
+                await sessions.set_room(get_redis(), self.user_id, room_name)
 
                 await self.send_json({
                     "type": "match_success",
@@ -254,6 +362,19 @@ class MatchConsumer(AsyncWebsocketConsumer):
                     "type": "match_cancelled",
                     "from": partner_name
                 })
+            elif result == "not_enough_gems":
+                # 수락 시점에 매칭 비용 확정 실패 -> 양쪽 모두 매치 취소
+                await self.send_json({
+                    "type": "match_cancelled",
+                    "from": partner_name
+                })
+                await self.channel_layer.group_send(
+                    f"user_{other_user_id}",
+                    {
+                        "type": "match_cancelled",
+                        "from": self.user.username
+                    }
+                )
             elif result in ["accept", "rejected"]:
                 await self.channel_layer.group_send(
                     f"user_{other_user_id}",
@@ -270,15 +391,23 @@ class MatchConsumer(AsyncWebsocketConsumer):
     async def force_disconnect(self, event):
         reason = event.get("reason", "unknown")
         logger.info(f"Force disconnecting due to: {reason}")
+        # 강제 종료는 유예하지 않음 (새 로그인으로 대체된 연결이면 정리는 새 연결이 맡음)
+        self.end_on_disconnect = True
+        self.session_taken_over = reason == "session_resumed"
         await self.close()
 
     async def match_cancelled(self, event):
         await self.send_json({
             "type": "match_cancelled",
-            "from": event.get("from")
+            "from": event.get("from"),
+            "reason": event.get("reason", "")
         })
+        # 응답 마감으로 취소되고 다시 큐에 들어간 경우 바로 재매칭 시도
+        if event.get("requeued"):
+            await self.try_match()
 
     async def notify_match(self, event):
+        get_dispatcher().unregister(self.user_id)
         await self.send_json({
             "type": "match_found",
             "partner": event.get("partner", ""),
@@ -295,6 +424,8 @@ class MatchConsumer(AsyncWebsocketConsumer):
         })
 
     async def match_success_notification(self, event):
+        self.current_room_name = event["room"]
+        await sessions.set_room(get_redis(), self.user_id, event["room"])
         await self.send_json({
             "type": "match_success",
             "room": event["room"]
@@ -1,24 +1,30 @@
 # yourapp/consumers_signaling.py
 from channels.generic.websocket import AsyncWebsocketConsumer
-import json
 import logging
 
+from .codec import CodecConsumerMixin, get_codec
+
 logger = logging.getLogger(__name__)
 
-class VoiceChatSignalingConsumer(AsyncWebsocketConsumer):
+class VoiceChatSignalingConsumer(CodecConsumerMixin, AsyncWebsocketConsumer):
+    # 상대 채널을 알면 SDP/ICE를 channel_layer.send로 상대에게만 전달
+    # (bench_signaling 명령이 기존 그룹 중계와 비교할 때만 False)
+    forward_to_peer = True
 
     async def connect(self):
         self.user = self.scope["user"]
+        self.peer_channel = None
         if self.user.is_anonymous:
             logger.warning("[CONNECT] Anonymous user attempted connection, rejecting")
             await self.close()
             return
         self.room_name = self.scope['url_route']['kwargs']['room_name']
         self.room_group_name = f"voicechat_{self.room_name}"
+        self.select_codec()
 
         # 그룹에 자신 추가
         await self.channel_layer.group_add(self.room_group_name, self.channel_name)
-        await self.accept()
+        await self.accept_codec()
         logger.info(f"[CONNECT] User {self.user.id} connected to voicechat room {self.room_name}")
 
         # 방 이름에서 상대방 user_id 추출
@@ -36,10 +42,10 @@ class VoiceChatSignalingConsumer(AsyncWebsocketConsumer):
         logger.info(f"[CONNECT] Role assignment: self={role_self}, other={role_other}")
 
         # 나 자신에게 역할 전송
-        await self.send(text_data=json.dumps({
+        await self.send_message({
             "type": "role_assignment",
             "role": role_self
-        }))
+        })
         logger.info(f"[CONNECT] Sent role_assignment to self: {role_self}")
 
         # 상대방에게 역할 전송
@@ -48,7 +54,8 @@ class VoiceChatSignalingConsumer(AsyncWebsocketConsumer):
             {
                 "type": "role_assignment_message",
                 "role": role_other,
-                "sender_id": self.user.id
+                "sender_id": self.user.id,
+                "sender_channel": self.channel_name,
             }
         )
         logger.info(f"[CONNECT] Sent role_assignment_message to other: {role_other}")
@@ -59,10 +66,22 @@ class VoiceChatSignalingConsumer(AsyncWebsocketConsumer):
         if event.get("sender_id") == self.user.id:
             return
 
-        await self.send(text_data=json.dumps({
+        # 나중에 들어온 상대의 채널을 기억하고, 상대에게도 내 채널을 직접 알려 줌
+        if self.forward_to_peer and event.get("sender_channel"):
+            self.peer_channel = event["sender_channel"]
+            await self.channel_layer.send(self.peer_channel, {
+                "type": "peer_channel_message",
+                "sender_id": self.user.id,
+                "channel": self.channel_name,
+            })
+
+        await self.send_message({
             "type": "role_assignment",
             "role": event["role"]
-        }))
+        })
+
+    async def peer_channel_message(self, event):
+        self.peer_channel = event["channel"]
 
     async def disconnect(self, close_code):
         try:
@@ -91,25 +110,40 @@ class VoiceChatSignalingConsumer(AsyncWebsocketConsumer):
         await self.close()
 
     async def match_cancelled(self, event):
-        await self.send(text_data=json.dumps({
+        # 상대가 나갔으면 다시 들어올 때까지 그룹으로 전달
+        if event.get("user_id") != self.user.id:
+            self.peer_channel = None
+        await self.send_message({
             "type": "match_cancelled",
             "from": event["from_user"]
-        }))
-
-    async def receive(self, text_data):
-        data = json.loads(text_data)
-        msg_type = data.get('type')
-
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                "type": "signal_message",
-                "message": data,
-                "sender_channel": self.channel_name,
-            }
-        )
+        })
+
+    async def receive(self, text_data=None, bytes_data=None):
+        # 받은 프레임을 그대로 중계 (디코딩/재인코딩 없음)
+        message = {
+            "type": "signal_message",
+            "codec": self.codec.name,
+            "text": text_data,
+            "bytes": bytes_data,
+            "sender_channel": self.channel_name,
+        }
+        if self.peer_channel:
+            await self.channel_layer.send(self.peer_channel, message)
+        else:
+            # 상대 채널을 아직 모르면(상대 미접속 등) 방 그룹으로
+            await self.channel_layer.group_send(self.room_group_name, message)
 
     async def signal_message(self, event):
         if event["sender_channel"] == self.channel_name:
             return
-        await self.send(text_data=json.dumps(event["message"]))
+        frame = (event.get("text"), event.get("bytes"))
+        if event.get("codec") == self.codec.name:
+            await self.send_frame(frame)
+            return
+        # 상대와 코덱이 다를 때만 변환
+        try:
+            message = get_codec(event.get("codec")).decode(*frame)
+        except ValueError:
+            logger.warning(f"[SIGNALING] Dropping undecodable signal message in {self.room_name}")
+            return
+        await self.send_message(message)
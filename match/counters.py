@@ -0,0 +1,56 @@
+# match/counters.py
+"""
+큐/매치/방 집계 (상태 조회용)
+
+get_queue_status가 큐 전체를 훑지 않도록 변경 시점마다 유지되는 값만 읽는다.
+- 큐 길이: ZCARD match_queue
+- 버킷별 대기 인원: match_bucket_keys(사용된 버킷 목록)의 각 버킷 ZCARD
+- 대기 중 매치: ZCARD match_pending (멤버=match_id, 스코어=응답 마감 시각 - 마감 처리 전까지 대기 중)
+- 활성 방: match_counters 해시의 active_rooms (방 생성/삭제 시 증감, 방을 한꺼번에 지울 때는 DB 개수로 다시 설정)
+"""
+from typing import Any, Dict
+
+from .models import MatchedRoom
+from .state import QUEUE_KEY
+
+BUCKET_KEYS_KEY = "match_bucket_keys"
+PENDING_KEY = "match_pending"
+COUNTERS_KEY = "match_counters"
+
+
+async def add_active_rooms(redis_client, amount: int):
+    if amount:
+        await redis_client.hincrby(COUNTERS_KEY, 'active_rooms', amount)
+
+
+def reseed_active_rooms(redis_client) -> int:
+    """
+    active_rooms를 MatchedRoom 개수로 다시 설정 (동기 클라이언트)
+    서버 시작 시처럼 증감 없이 방을 한꺼번에 지운 뒤 호출해야 값이 어긋나지 않는다.
+    """
+    count = MatchedRoom.objects.count()
+    redis_client.hset(COUNTERS_KEY, 'active_rooms', count)
+    return count
+
+
+async def read_counters(redis_client) -> Dict[str, Any]:
+    """O(버킷 수) 집계 조회 - 큐 길이와 무관"""
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.zcard(QUEUE_KEY)
+    pipe.smembers(BUCKET_KEYS_KEY)
+    pipe.zcard(PENDING_KEY)
+    pipe.hget(COUNTERS_KEY, 'active_rooms')
+    queue_count, bucket_keys, pending, active_rooms = await pipe.execute()
+
+    bucket_keys = sorted(key.decode('utf-8') for key in bucket_keys)
+    pipe = redis_client.pipeline(transaction=False)
+    for key in bucket_keys:
+        pipe.zcard(key)
+    depths = await pipe.execute() if bucket_keys else []
+
+    return {
+        'queue_count': queue_count,
+        'bucket_depths': {key: depth for key, depth in zip(bucket_keys, depths) if depth},
+        'pending_matches': pending,
+        'active_rooms': int(active_rooms or 0),
+    }
@@ -0,0 +1,110 @@
+# match/deadlines.py
+"""
+매치 제안 응답 마감 (지연 작업 스케줄러)
+
+제안된 매치는 match_pending(멤버=match_id, 스코어=응답 마감 시각)에 들어간다.
+예전에는 응답이 없으면 match_requests가 MATCH_REQUEST_TTL(5분) 뒤 조용히 사라질 때까지
+두 사용자 모두 _has_active_match에 걸려 재매칭도 재접속도 할 수 없었다.
+DeadlineScheduler는 마감이 지난 매치를 EXPIRE_PENDING_MATCH_LUA로 하나씩 만료시키고
+- 매칭 비용 홀드 반환
+- 수락했던 쪽(응답한 쪽)은 다시 큐에 추가
+- 양쪽에 match_cancelled(reason=timeout) 전송
+정리 작업 프로세스(run_sweeper) 안에서 별도 asyncio 태스크로 돈다.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from channels.layers import get_channel_layer
+
+from gem.services import release_gems
+from tori_backend.redis_client import get_redis, load_script
+from tori_backend.settings.constants import MATCH_DEADLINE_POLL_MS
+
+from . import events
+from .counters import PENDING_KEY
+from .events import emit_event
+from .profiles import aget_profiles, profile_user
+from .scripts import EXPIRE_PENDING_MATCH_LUA
+from .services import MatchService, decode_match
+
+logger = logging.getLogger(__name__)
+
+MATCH_REQUESTS_PREFIX = "match_requests:"
+
+
+class DeadlineScheduler:
+    def __init__(self, poll_ms: int = MATCH_DEADLINE_POLL_MS, batch_size: int = 100):
+        self.poll = poll_ms / 1000
+        self.batch_size = batch_size
+        self.channel_layer = get_channel_layer()
+
+    async def run_forever(self):
+        logger.info(f"Match deadline scheduler started (poll={self.poll}s)")
+        while True:
+            try:
+                await self.run_due()
+                await asyncio.sleep(await self._until_next_deadline())
+            except Exception as e:
+                logger.error(f"Match deadline scheduler failed: {e}", exc_info=True)
+                await asyncio.sleep(self.poll)
+
+    async def _until_next_deadline(self) -> float:
+        """다음 마감까지 남은 시간 (최대 poll)"""
+        head = await get_redis().zrange(PENDING_KEY, 0, 0, withscores=True)
+        if not head:
+            return self.poll
+        return min(self.poll, max(0.0, head[0][1] - time.time()))
+
+    async def run_due(self, now: Optional[float] = None) -> int:
+        """마감이 지난 매치를 모두 만료 - 만료시킨 개수 반환"""
+        redis_client = get_redis()
+        now = now if now is not None else time.time()
+        expired = 0
+        while True:
+            due = await redis_client.zrangebyscore(PENDING_KEY, "-inf", now, start=0, num=self.batch_size)
+            for match_id in due:
+                if await self.expire_match(redis_client, match_id.decode('utf-8')):
+                    expired += 1
+            if len(due) < self.batch_size:
+                return expired
+
+    async def expire_match(self, redis_client, match_id: str) -> bool:
+        record = await load_script(redis_client, EXPIRE_PENDING_MATCH_LUA)(
+            keys=[MATCH_REQUESTS_PREFIX + match_id, PENDING_KEY], args=[match_id], client=redis_client,
+        )
+        if not record:
+            return False  # 이미 응답/정리됐거나 다른 프로세스가 처리
+        match_data = decode_match(record)
+        logger.info(f"Match {match_id} expired without responses: {match_data}")
+
+        if match_data.get('hold_user') and match_data.get('hold_id'):
+            await release_gems(match_data['hold_user'], match_data['hold_id'])
+        await emit_event(redis_client, events.CANCELLED, reason='timeout', **events.match_fields(match_data))
+        await self._requeue_and_notify(redis_client, match_data)
+        return True
+
+    async def _requeue_and_notify(self, redis_client, match_data: Dict[str, Any]):
+        user_ids = [match_data['user1'], match_data['user2']]
+        profiles = await aget_profiles(user_ids)
+        responders = [
+            user_id for user_id, field in zip(user_ids, ('user1_response', 'user2_response'))
+            if match_data.get(field) == 'accept' and user_id in profiles
+        ]
+        requeued = set()
+        if responders:
+            service = MatchService(profile_user(profiles[responders[0]]))
+            requeued = {str(user_id) for user_id in await service.requeue_users(redis_client, responders)}
+
+        for user_id, partner_id in zip(user_ids, reversed(user_ids)):
+            partner = profiles.get(partner_id)
+            await self.channel_layer.group_send(
+                f"user_{user_id}",
+                {
+                    "type": "match_cancelled",
+                    "from": partner['username'] if partner else "",
+                    "reason": "timeout",
+                    "requeued": user_id in requeued,
+                }
+            )
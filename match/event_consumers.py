@@ -0,0 +1,218 @@
+# match/event_consumers.py
+"""
+match_events 스트림 컨슈머 그룹 (python manage.py run_event_consumer --group ...)
+
+WebSocket 경로는 XADD만 하고, 이벤트를 소비하는 일은 그룹별 별도 프로세스가 맡는다.
+- metrics: 이벤트 종류별 카운터 match_events_total{event=...}
+- history: 매치 결과 이벤트 -> MatchHistory (history_writer.py)
+- matcher: 큐 등록/매치 취소 이벤트가 들어오면 배치 매처를 한 번 실행
+XREADGROUP으로 읽고 처리한 뒤 XACK 하므로, 프로세스가 죽어도 같은 이름으로 다시 띄우면
+ACK하지 않은 이벤트부터 이어서 처리한다.
+읽지 않은 이벤트는 MAXLEN으로 잘리면 사라지므로, 그룹의 밀림(lag)을 주기적으로 확인해 로그로 경고한다.
+replay_match_events 명령이 쓰는 파생 데이터 재구성 함수도 여기에 둔다.
+"""
+import asyncio
+import logging
+import socket
+import time
+from collections import Counter
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from channels.db import database_sync_to_async
+
+from tori_backend.redis_client import get_redis
+from tori_backend.settings.constants import (
+    MATCH_EVENT_BATCH_SIZE, MATCH_EVENT_LAG_CHECK_INTERVAL, MATCH_EVENT_LAG_WARN_RATIO, MATCH_EVENT_STREAM_MAXLEN,
+)
+
+from . import events
+from .events import STREAM_KEY, decode_entries, ensure_group, iter_range
+from .history_writer import event_record, save_records
+from .matcher import BatchMatcher
+from .metrics import COUNTERS_KEY, MetricsBatch, _sample
+
+logger = logging.getLogger(__name__)
+
+Event = Tuple[str, Dict[str, str]]
+
+EVENT_COUNTERS_EPOCH_KEY = "match_metrics:events_epoch"
+
+
+async def handle_metrics(batch: List[Event]):
+    metrics = MetricsBatch()
+    for _, fields in batch:
+        metrics.inc('match_events_total', event=fields.get('event', 'unknown'))
+    await metrics.flush()
+    # 카운터가 센 첫 이벤트 ID (재구성 때 스트림이 여기까지 남아 있는지 확인)
+    await get_redis().set(EVENT_COUNTERS_EPOCH_KEY, batch[0][0], nx=True)
+
+
+async def handle_history(batch: List[Event]):
+    """읽은 묶음의 매치 결과를 bulk_create 한 번으로 저장 (실패하면 ACK되지 않아 다시 읽힘)"""
+    records = [record for record in (event_record(fields) for _, fields in batch) if record]
+    if records:
+        await database_sync_to_async(save_records)(records)
+
+
+class MatcherHandler:
+    """대기열이 바뀌는 이벤트가 있으면 배치 매처를 한 번 실행 (읽은 묶음당 한 번)"""
+
+    TRIGGERS = (events.ENQUEUED, events.CANCELLED)
+
+    def __init__(self):
+        self.matcher = BatchMatcher()
+
+    async def __call__(self, batch: List[Event]):
+        if any(fields.get('event') in self.TRIGGERS for _, fields in batch):
+            await self.matcher.run_tick()
+
+
+GROUP_HANDLERS: Dict[str, Callable[[], Callable[[List[Event]], Awaitable[None]]]] = {
+    'metrics': lambda: handle_metrics,
+    'history': lambda: handle_history,
+    'matcher': MatcherHandler,
+}
+
+# 그룹을 처음 만들 때 읽기 시작할 위치 (기본 "$" = 이후 이벤트부터)
+# history는 컨슈머가 늦게 떴더라도 스트림에 남은 결과를 모두 저장하도록 처음부터 읽는다
+GROUP_START_IDS: Dict[str, str] = {
+    'history': "0",
+}
+
+
+async def check_group_lag(redis_client, group: str) -> Optional[int]:
+    """
+    그룹이 아직 읽지 않은 이벤트 수를 확인하고, MAXLEN으로 잘려 유실됐거나 유실될 위험이면 로그를 남긴다
+    lag = 스트림에 추가된 수 - 그룹이 읽은 수 (Redis 7+의 entries-added / entries-read), 알 수 없으면 None
+    """
+    groups = await redis_client.xinfo_groups(STREAM_KEY)
+    info = next((info for info in groups if info['name'].decode('utf-8') == group), None)
+    if info is None:
+        return None
+    entries_read = info.get('entries-read')
+    if entries_read is None and info.get('last-delivered-id') == b'0-0':
+        entries_read = 0  # 처음부터 읽도록 만들고 아직 읽지 않은 그룹
+    stream = await redis_client.xinfo_stream(STREAM_KEY)
+    entries_added, length = stream.get('entries-added'), stream['length']
+    if entries_read is None or entries_added is None:
+        return None
+    lag = entries_added - entries_read
+    if lag > length:
+        logger.error(f"Match event group {group} lost {lag - length} events trimmed by MAXLEN before it read them "
+                     f"(replay_match_events cannot restore them)")
+    elif lag >= MATCH_EVENT_STREAM_MAXLEN * MATCH_EVENT_LAG_WARN_RATIO:
+        logger.warning(f"Match event group {group} is {lag} events behind (stream MAXLEN {MATCH_EVENT_STREAM_MAXLEN})")
+    return lag
+
+
+class EventGroupConsumer:
+    def __init__(self, group: str, handler: Callable[[List[Event]], Awaitable[None]],
+                 name: Optional[str] = None, batch_size: int = MATCH_EVENT_BATCH_SIZE, block_ms: int = 1000):
+        self.group = group
+        self.handler = handler
+        self.name = name or socket.gethostname()
+        self.batch_size = batch_size
+        self.block_ms = block_ms
+        self.start_id = GROUP_START_IDS.get(group, "$")
+
+    async def run_forever(self):
+        logger.info(f"Match event consumer started (group={self.group}, name={self.name})")
+        redis_client = get_redis()
+        await ensure_group(redis_client, self.group, self.start_id)
+        # 지난번에 읽고 ACK하지 못한 이벤트부터 ("0" = 보류 목록, ">" = 새 이벤트)
+        stream_id = "0"
+        lag_checked_at = 0.0
+        while True:
+            try:
+                if time.monotonic() - lag_checked_at >= MATCH_EVENT_LAG_CHECK_INTERVAL:
+                    lag_checked_at = time.monotonic()
+                    await check_group_lag(redis_client, self.group)
+                if stream_id == "0":
+                    if not await self._consume(redis_client, "0", None):
+                        stream_id = ">"
+                else:
+                    await self._consume(redis_client, ">", self.block_ms)
+            except Exception as e:
+                logger.error(f"Match event consumer {self.group} failed: {e}", exc_info=True)
+                stream_id = "0"  # 처리하지 못한 묶음은 ACK되지 않았으므로 보류 목록부터 다시
+                await asyncio.sleep(1)
+
+    async def run_once(self) -> int:
+        """밀린 이벤트를 모두 처리하고 처리한 개수 반환"""
+        redis_client = get_redis()
+        await ensure_group(redis_client, self.group, self.start_id)
+        await check_group_lag(redis_client, self.group)
+        handled = 0
+        for stream_id in ("0", ">"):
+            while True:
+                count = await self._consume(redis_client, stream_id, None)
+                handled += count
+                if not count:
+                    break
+        return handled
+
+    async def _consume(self, redis_client, stream_id: str, block: Optional[int]) -> int:
+        response = await redis_client.xreadgroup(
+            self.group, self.name, {STREAM_KEY: stream_id}, count=self.batch_size, block=block,
+        )
+        if not response or not response[0][1]:
+            return 0
+        entries = response[0][1]
+        batch = decode_entries(entries)
+        if batch:
+            await self.handler(batch)
+        # 잘려서 내용이 없는 항목도 ACK해야 보류 목록에서 빠진다
+        await redis_client.xack(STREAM_KEY, self.group, *[entry_id for entry_id, _ in entries])
+        return len(entries)
+
+
+# ---------------------------
+# 재생 (python manage.py replay_match_events)
+# ---------------------------
+async def rebuild_history(redis_client, start: str = "-", end: str = "+", batch_size: int = MATCH_EVENT_BATCH_SIZE) -> int:
+    """이벤트로 MatchHistory를 다시 저장 (event_id가 같으면 무시되므로 여러 번 실행해도 안전)"""
+    records, saved = [], 0
+    async for _, fields in iter_range(redis_client, start, end, batch_size):
+        record = event_record(fields)
+        if not record:
+            continue
+        records.append(record)
+        if len(records) >= batch_size:
+            saved += await database_sync_to_async(save_records)(records)
+            records = []
+    if records:
+        saved += await database_sync_to_async(save_records)(records)
+    return saved
+
+
+def _stream_id(entry_id: str) -> Tuple[int, ...]:
+    return tuple(int(part) for part in entry_id.split('-'))
+
+
+async def rebuild_event_counters(redis_client) -> Optional[Dict[str, int]]:
+    """
+    스트림 전체의 이벤트 수로 match_events_total 카운터를 다시 만든다 (지표 컨슈머를 멈춘 상태에서 실행)
+    카운터는 처음 센 이벤트(EVENT_COUNTERS_EPOCH_KEY)부터의 누적이라, 스트림 앞부분이 MAXLEN으로
+    그보다 뒤까지 잘렸으면 덮어쓸 때 값이 줄어든다 - 이때는 건드리지 않고 None 반환
+    """
+    head = await redis_client.xrange(STREAM_KEY, count=1)
+    if not head:
+        return {}
+    first_id = head[0][0].decode('utf-8')
+    epoch = await redis_client.get(EVENT_COUNTERS_EPOCH_KEY)
+    if epoch is not None and _stream_id(first_id) > _stream_id(epoch.decode('utf-8')):
+        logger.warning(f"Event counters start at {epoch.decode('utf-8')} but the stream was trimmed to {first_id}, "
+                       f"not rebuilding")
+        return None
+
+    counts = Counter()
+    async for _, fields in iter_range(redis_client):
+        counts[fields.get('event', 'unknown')] += 1
+    if counts:
+        pipe = redis_client.pipeline()
+        pipe.hset(COUNTERS_KEY, mapping={
+            _sample('match_events_total', {'event': event}): count for event, count in counts.items()
+        })
+        pipe.set(EVENT_COUNTERS_EPOCH_KEY, first_id)
+        await pipe.execute()
+    return dict(counts)
@@ -0,0 +1,100 @@
+# match/events.py
+"""
+매치 생명주기 이벤트 로그 (Redis Stream)
+
+상태 변화(큐 등록, 매치 제안, 수락/거절, 방 생성, 취소, 연결 해제)를 match_events 스트림 하나에
+XADD로 남긴다. 길이는 MATCH_EVENT_STREAM_MAXLEN 근처로 잘라(MAXLEN ~) 메모리를 제한한다.
+- 기록은 기존 파이프라인에 함께 싣거나(add_event) XADD 한 번(emit_event)이라 WebSocket 경로에 DB 대기가 없다
+- 지표/매처는 컨슈머 그룹으로 읽어 간다 (match/event_consumers.py, python manage.py run_event_consumer)
+- 장애 후 파생 데이터는 python manage.py replay_match_events로 다시 만든다
+이벤트 기록 실패는 매칭에 영향을 주지 않도록 로그만 남긴다.
+"""
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from tori_backend.settings.constants import MATCH_EVENT_STREAM_MAXLEN
+
+logger = logging.getLogger(__name__)
+
+STREAM_KEY = "match_events"
+
+ENQUEUED = "enqueued"
+PROPOSED = "proposed"
+ACCEPTED = "accepted"
+REJECTED = "rejected"
+ROOM_CREATED = "room_created"
+CANCELLED = "cancelled"
+DISCONNECTED = "disconnected"
+RESUMED = "resumed"
+
+
+def build_event(event: str, **fields) -> Dict[str, str]:
+    """스트림 항목 (값은 모두 문자열, None은 '')"""
+    entry = {'event': event, 'at': repr(time.time())}
+    for key, value in fields.items():
+        entry[key] = "" if value is None else str(value)
+    return entry
+
+
+def add_event(pipe, event: str, **fields):
+    """이미 만든 파이프라인에 XADD를 함께 싣는다"""
+    pipe.xadd(STREAM_KEY, build_event(event, **fields), maxlen=MATCH_EVENT_STREAM_MAXLEN, approximate=True)
+
+
+async def emit_event(redis_client, event: str, **fields):
+    try:
+        await redis_client.xadd(
+            STREAM_KEY, build_event(event, **fields), maxlen=MATCH_EVENT_STREAM_MAXLEN, approximate=True
+        )
+    except Exception as e:
+        logger.error(f"Error appending match event {event}: {e}")
+
+
+def match_fields(match_data: Dict[str, Any]) -> Dict[str, Any]:
+    """매치 기록에서 이벤트에 남길 필드 (history_writer.build_record로 다시 만들 수 있게)"""
+    return {
+        'match_id': match_data.get('match_id'),
+        'created_at': match_data.get('created_at'),
+        'user1': match_data.get('user1'),
+        'user2': match_data.get('user2'),
+    }
+
+
+def decode_entries(entries) -> List[Tuple[str, Dict[str, str]]]:
+    """
+    XRANGE / XREADGROUP 항목 -> [(entry_id, fields), ...]
+    보류 중에 MAXLEN으로 잘린 항목은 XREADGROUP이 내용 없이(None / 빈 필드) 돌려주므로 건너뛴다.
+    """
+    return [
+        (
+            entry_id.decode('utf-8'),
+            {key.decode('utf-8'): value.decode('utf-8') for key, value in fields.items()},
+        )
+        for entry_id, fields in entries
+        if fields
+    ]
+
+
+async def ensure_group(redis_client, group: str, start_id: str = "$"):
+    """컨슈머 그룹 생성 (이미 있으면 그대로 사용)"""
+    try:
+        await redis_client.xgroup_create(STREAM_KEY, group, id=start_id, mkstream=True)
+    except Exception as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+async def iter_range(redis_client, start: str = "-", end: str = "+", count: int = 500,
+                     event: Optional[str] = None):
+    """스트림을 count개씩 나눠 순서대로 읽기 (재생용)"""
+    while True:
+        entries = decode_entries(await redis_client.xrange(STREAM_KEY, start, end, count=count))
+        if not entries:
+            return
+        for entry_id, fields in entries:
+            if event is None or fields.get('event') == event:
+                yield entry_id, fields
+        if len(entries) < count:
+            return
+        start = f"({entries[-1][0]}"
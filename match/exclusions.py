@@ -0,0 +1,84 @@
+# match/exclusions.py
+"""
+최근 상대 / 거절 상대 제외 목록
+
+거절 후 두 사용자가 곧바로 큐에 돌아가면 다음 스캔이 같은 쌍을 다시 제안하는 일이 많다.
+사용자별 작은 Set match_exclude:{user_id}에 최근 매칭/거절한 상대를 MATCH_EXCLUDE_TTL 동안 두고,
+후보 스캔은 스캔마다 한 번 읽어 온 집합으로 O(1) 확인만 한다 (DB 조회 없음).
+- 매치 결과(수락/거절)가 나오면 양쪽 집합에 서로를 추가
+- 집합에 SEED_MEMBER가 없으면(처음 읽거나 TTL 만료) 최근 MatchHistory로 한 번에 채움
+"""
+from datetime import timedelta
+from typing import Dict, Iterable, List, Set
+
+from channels.db import database_sync_to_async
+from django.db.models import Q
+from django.utils import timezone
+
+from tori_backend.settings.constants import MATCH_EXCLUDE_TTL
+
+from .models import MatchHistory
+
+EXCLUDE_KEY_PREFIX = "match_exclude"
+SEED_MEMBER = "-"  # MatchHistory로 채운 집합 표시 (상대가 없어도 빈 집합을 캐시하기 위함)
+
+
+def exclude_key(user_id) -> str:
+    return f"{EXCLUDE_KEY_PREFIX}:{user_id}"
+
+
+def load_recent_partners(user_ids: List[str]) -> Dict[str, Set[str]]:
+    """MatchHistory에서 MATCH_EXCLUDE_TTL 안에 수락/거절한 상대를 한 번에 조회"""
+    ids = [int(user_id) for user_id in user_ids]
+    since = timezone.now() - timedelta(seconds=MATCH_EXCLUDE_TTL)
+    partners = {str(user_id): set() for user_id in ids}
+    rows = MatchHistory.objects.filter(
+        Q(user1_id__in=ids) | Q(user2_id__in=ids), matched_at__gte=since, outcome__in=('accepted', 'rejected')
+    ).values_list('user1_id', 'user2_id')
+    for user1_id, user2_id in rows:
+        if str(user1_id) in partners:
+            partners[str(user1_id)].add(str(user2_id))
+        if str(user2_id) in partners:
+            partners[str(user2_id)].add(str(user1_id))
+    return partners
+
+
+async def aget_exclusions(redis_client, user_ids: Iterable) -> Dict[str, Set[str]]:
+    """{user_id: 제외할 상대 ID 집합} - 파이프라인 1회, 채워지지 않은 사용자만 DB에서 한 번에 조회"""
+    user_ids = [str(user_id) for user_id in user_ids]
+    if not user_ids:
+        return {}
+    pipe = redis_client.pipeline(transaction=False)
+    for user_id in user_ids:
+        pipe.smembers(exclude_key(user_id))
+    exclusions = {
+        user_id: {member.decode('utf-8') for member in members}
+        for user_id, members in zip(user_ids, await pipe.execute())
+    }
+
+    missing = [user_id for user_id, members in exclusions.items() if SEED_MEMBER not in members]
+    if missing:
+        loaded = await database_sync_to_async(load_recent_partners)(missing)
+        pipe = redis_client.pipeline(transaction=False)
+        for user_id in missing:
+            pipe.sadd(exclude_key(user_id), SEED_MEMBER, *loaded[user_id])
+            pipe.expire(exclude_key(user_id), MATCH_EXCLUDE_TTL)
+            exclusions[user_id] |= loaded[user_id]
+        await pipe.execute()
+
+    for members in exclusions.values():
+        members.discard(SEED_MEMBER)
+    return exclusions
+
+
+async def aget_excluded(redis_client, user_id) -> Set[str]:
+    return (await aget_exclusions(redis_client, [user_id]))[str(user_id)]
+
+
+async def exclude_pair(redis_client, user_a, user_b):
+    """두 사용자를 서로의 제외 목록에 추가 (매치 수락/거절 시)"""
+    pipe = redis_client.pipeline(transaction=False)
+    for user_id, other_id in ((user_a, user_b), (user_b, user_a)):
+        pipe.sadd(exclude_key(user_id), str(other_id))
+        pipe.expire(exclude_key(user_id), MATCH_EXCLUDE_TTL)
+    await pipe.execute()
@@ -0,0 +1,67 @@
+# match/history_writer.py
+"""
+MatchHistory 기록 (match_events 스트림의 history 컨슈머 그룹)
+
+매치 결과(방 생성/거절/만료/취소)는 응답 경로에서 INSERT하지 않고 match_events 스트림에 남긴 이벤트로 저장한다.
+- python manage.py run_event_consumer --group history 가 읽은 묶음마다 bulk_create(ignore_conflicts=True) 한 번
+- 저장한 뒤에 XACK하므로 프로세스가 죽어도 ACK하지 않은 이벤트부터 다시 저장
+- event_id(매치 ID + 생성 시각 + 결과)가 unique라서 같은 기록을 여러 번 넣어도 한 번만 저장된다
+"""
+import logging
+import time
+from datetime import datetime, timezone as dt_timezone
+from typing import Any, Dict, List, Optional
+
+from . import events
+from .models import MatchHistory
+
+logger = logging.getLogger(__name__)
+
+HISTORY_OUTCOMES = {
+    events.ROOM_CREATED: 'accepted',
+    events.REJECTED: 'rejected',
+}
+
+
+def history_outcome(fields: Dict[str, str]) -> Optional[str]:
+    """이벤트 -> MatchHistory 결과 (기록 대상이 아니면 None)"""
+    event = fields.get('event')
+    if event == events.CANCELLED:
+        return 'expired' if fields.get('reason') in ('expired', 'timeout') else 'cancelled'
+    return HISTORY_OUTCOMES.get(event)
+
+
+def build_record(match_data: Dict[str, Any], outcome: str, now: Optional[float] = None) -> Dict[str, Any]:
+    """매치 기록(이벤트 필드) -> 저장할 항목 (user1 < user2로 정렬)"""
+    user_ids = sorted((int(match_data['user1']), int(match_data['user2'])))
+    return {
+        'event_id': f"{match_data['match_id']}:{match_data.get('created_at') or ''}:{outcome}",
+        'user1': user_ids[0],
+        'user2': user_ids[1],
+        'outcome': outcome,
+        'at': now if now is not None else time.time(),
+    }
+
+
+def event_record(fields: Dict[str, str]) -> Optional[Dict[str, Any]]:
+    """스트림 이벤트 -> 저장할 항목 (기록 대상이 아니면 None)"""
+    outcome = history_outcome(fields)
+    if not outcome or not fields.get('user1') or not fields.get('user2'):
+        return None
+    return build_record(fields, outcome, now=float(fields['at']))
+
+
+def save_records(records: List[Dict[str, Any]]) -> int:
+    """bulk_create 한 번으로 저장 (이미 저장된 event_id는 무시)"""
+    rows = [
+        MatchHistory(
+            user1_id=record['user1'],
+            user2_id=record['user2'],
+            outcome=record['outcome'],
+            matched_at=datetime.fromtimestamp(record['at'], tz=dt_timezone.utc),
+            event_id=record['event_id'],
+        )
+        for record in records
+    ]
+    MatchHistory.objects.bulk_create(rows, ignore_conflicts=True)
+    return len(rows)
@@ -0,0 +1,94 @@
+# match/locks.py
+"""
+호환성 버킷 단위로 나눈 매칭 락 (소유자 토큰 포함)
+
+- 락 키는 요청자 버킷마다 따로 두므로 서로 다른 성별/나이 구간의 매칭은 서로 막지 않는다.
+- 획득할 때마다 INCR로 단조 증가하는 토큰을 발급해 값으로 저장하고,
+  해제는 토큰이 일치할 때만 지운다. TTL이 지나 다른 워커가 가져간 락을 지우지 않기 위함이다.
+- 경합/대기/보유 시간은 match_lock_stats 해시에 누적한다.
+"""
+import asyncio
+import logging
+import time
+from typing import Dict
+
+from tori_backend.redis_client import load_script
+
+from .scripts import RELEASE_LOCK_LUA
+
+logger = logging.getLogger(__name__)
+
+LOCK_KEY_PREFIX = "match_lock"
+LOCK_STATS_KEY = "match_lock_stats"
+LOCK_POLL_INTERVAL = 0.01
+
+
+def bucket_lock_key(bucket: str) -> str:
+    return f"{LOCK_KEY_PREFIX}:{bucket}"
+
+
+class FencedLock:
+    def __init__(self, redis_client, key: str, ttl: float, wait_timeout: float = 0.0):
+        self.redis_client = redis_client
+        self.key = key
+        self.ttl_ms = int(ttl * 1000)
+        self.wait_timeout = wait_timeout
+        self.token = None
+        self._acquired_at = None
+
+    async def acquire(self) -> bool:
+        """락 획득 (wait_timeout 동안 재시도)"""
+        started = time.monotonic()
+        token = str(await self.redis_client.incr(f"{self.key}:fence"))
+        contended = False
+
+        while True:
+            if await self.redis_client.set(self.key, token, px=self.ttl_ms, nx=True):
+                self.token = token
+                self._acquired_at = time.monotonic()
+                await self._record(acquired=1, contended=int(contended), wait_ms=(self._acquired_at - started) * 1000)
+                return True
+
+            contended = True
+            if time.monotonic() - started >= self.wait_timeout:
+                await self._record(contended=1, timeouts=1, wait_ms=(time.monotonic() - started) * 1000)
+                return False
+            await asyncio.sleep(LOCK_POLL_INTERVAL)
+
+    async def release(self) -> bool:
+        """토큰이 일치할 때만 해제 (이미 만료되어 다른 워커가 가져갔으면 건드리지 않음)"""
+        if self.token is None:
+            return False
+        try:
+            release_lock = load_script(self.redis_client, RELEASE_LOCK_LUA)
+            released = await release_lock(keys=[self.key], args=[self.token], client=self.redis_client)
+            hold_ms = (time.monotonic() - self._acquired_at) * 1000
+            if released:
+                await self._record(hold_ms=hold_ms)
+            else:
+                logger.warning(f"Lock {self.key} expired before release (token {self.token})")
+                await self._record(expired=1, hold_ms=hold_ms)
+            return bool(released)
+        finally:
+            self.token = None
+            self._acquired_at = None
+
+    async def _record(self, **counters):
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for field, value in counters.items():
+                if not value:
+                    continue
+                if field.endswith('_ms'):
+                    pipe.hincrbyfloat(LOCK_STATS_KEY, field, round(value, 3))
+                else:
+                    pipe.hincrby(LOCK_STATS_KEY, field, value)
+            await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to record lock stats for {self.key}: {e}")
+
+
+async def get_lock_stats(redis_client) -> Dict[str, float]:
+    """락 통계 (acquired, contended, timeouts, expired, wait_ms, hold_ms)"""
+    raw = await redis_client.hgetall(LOCK_STATS_KEY)
+    return {key.decode('utf-8'): float(value) for key, value in raw.items()}
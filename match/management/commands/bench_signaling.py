@@ -0,0 +1,155 @@
+import asyncio
+import time
+
+import redis.asyncio as aioredis
+from channels import DEFAULT_CHANNEL_LAYER
+from channels.layers import channel_layers, get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from match.consumers_signaling import VoiceChatSignalingConsumer
+
+User = get_user_model()
+
+LAYER_METHODS = ("send", "group_send", "group_add", "group_discard")
+BENCH_USER_ID = 2_000_000_000  # 실제 사용자와 겹치지 않는 방 이름용 ID (DB 조회 없음)
+PEER_ALIAS = "bench_signaling_peer"
+RECEIVE_TIMEOUT = 5
+
+
+class GroupRelaySignalingConsumer(VoiceChatSignalingConsumer):
+    """비교 기준 - SDP/ICE도 모두 방 그룹으로 중계 (직접 전달 이전 동작)"""
+    forward_to_peer = False
+
+
+class Command(BaseCommand):
+    help = "음성 채팅 시그널링 통화 연결 1회당 채널 레이어 호출 / Redis 명령 수 측정 (그룹 중계 vs 상대 채널 직접 전달)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--calls", type=int, default=20, help="모드별 통화 연결 횟수")
+        parser.add_argument("--candidates", type=int, default=10, help="통화 연결 1회에 양쪽이 각각 보내는 ICE candidate 수")
+
+    def handle(self, *args, **options):
+        results = asyncio.run(self.run(options["calls"], options["candidates"]))
+        for mode, stats in results.items():
+            self.stdout.write(f"{mode}: " + ", ".join(f"{name}={value:.1f}" for name, value in stats.items()))
+
+        baseline, direct = results["group_relay"], results["direct"]
+        if "redis_commands" not in baseline:
+            self.stdout.write("Redis 명령 수는 channels_redis 레이어에서만 측정됩니다 (메모리 레이어는 group_send가 send로 집계됨)")
+            return
+        self.stdout.write(f"redis_commands per call setup: {baseline['redis_commands']:.1f} -> "
+                          f"{direct['redis_commands']:.1f} "
+                          f"({(1 - direct['redis_commands'] / baseline['redis_commands']) * 100:.1f}% fewer)")
+
+    async def run(self, calls: int, candidates: int):
+        layer = get_channel_layer()
+        redis_client = _layer_redis(layer)
+        # 두 사용자가 서로 다른 워커에 붙은 상황 - channels_redis는 같은 레이어 인스턴스의 채널을
+        # 하나의 Redis 키로 묶으므로 상대 쪽은 별도 인스턴스를 쓴다 (메모리 레이어는 공유해야 전달됨)
+        peer_layer = channel_layers.make_backend(DEFAULT_CHANNEL_LAYER) if redis_client is not None else layer
+        channel_layers.backends[PEER_ALIAS] = peer_layer
+
+        counts = {name: 0 for name in LAYER_METHODS}
+        originals = []
+        for instance in {id(layer): layer, id(peer_layer): peer_layer}.values():
+            for name in LAYER_METHODS:
+                originals.append((instance, name, getattr(instance, name)))
+                setattr(instance, name, _counting(getattr(instance, name), counts, name))
+
+        results = {}
+        try:
+            for mode, consumer_class in (("group_relay", GroupRelaySignalingConsumer),
+                                         ("direct", VoiceChatSignalingConsumer)):
+                peer_class = type(f"{consumer_class.__name__}OnPeer", (consumer_class,),
+                                  {"channel_layer_alias": PEER_ALIAS})
+                for name in counts:
+                    counts[name] = 0
+                before = await _commands_processed(redis_client)
+                started = time.perf_counter()
+                for call in range(calls):
+                    # 통화마다 별도 태스크 (실제 연결처럼 - 끝난 연결의 취소가 다음 통화의 receive에 영향 주지 않도록)
+                    await asyncio.create_task(
+                        _call_setup(consumer_class, peer_class, BENCH_USER_ID + call * 2, candidates)
+                    )
+                elapsed = time.perf_counter() - started
+                after = await _commands_processed(redis_client)
+
+                stats = {name: count / calls for name, count in counts.items()}
+                stats["layer_calls"] = sum(counts.values()) / calls
+                if before is not None and after is not None:
+                    stats["redis_commands"] = (after - before) / calls
+                stats["ms"] = elapsed * 1000 / calls
+                results[mode] = stats
+        finally:
+            for instance, name, original in originals:
+                setattr(instance, name, original)
+            channel_layers.backends.pop(PEER_ALIAS, None)
+            if peer_layer is not layer:
+                await peer_layer.close_pools()
+            if redis_client is not None:
+                await redis_client.aclose()
+        return results
+
+
+async def _call_setup(consumer_class, peer_class, first_user_id: int, candidates: int):
+    """두 사용자 접속 -> 역할 배정 -> offer/answer -> ICE candidate 교환 -> 종료"""
+    offerer = User(id=first_user_id, username=f"bench_{first_user_id}")
+    answerer = User(id=first_user_id + 1, username=f"bench_{first_user_id + 1}")
+    room_name = f"{offerer.id}_{answerer.id}"
+
+    def communicator(application_class, user):
+        client = WebsocketCommunicator(application_class.as_asgi(), f"/ws/voicechat/{room_name}/")
+        client.scope["user"] = user
+        client.scope["url_route"] = {"kwargs": {"room_name": room_name}}
+        return client
+
+    offer_side, answer_side = communicator(consumer_class, offerer), communicator(peer_class, answerer)
+    await offer_side.connect()
+    await offer_side.receive_json_from(RECEIVE_TIMEOUT)  # role_assignment (offer)
+    await answer_side.connect()
+    await answer_side.receive_json_from(RECEIVE_TIMEOUT)  # role_assignment (answer)
+    await offer_side.receive_json_from(RECEIVE_TIMEOUT)  # 상대 접속 후 다시 받는 role_assignment
+
+    await offer_side.send_json_to({"type": "offer", "sdp": "v=0"})
+    await answer_side.receive_json_from(RECEIVE_TIMEOUT)
+    await answer_side.send_json_to({"type": "answer", "sdp": "v=0"})
+    await offer_side.receive_json_from(RECEIVE_TIMEOUT)
+    for index in range(candidates):
+        await offer_side.send_json_to({"type": "ice-candidate", "candidate": f"offer-{index}"})
+        await answer_side.send_json_to({"type": "ice-candidate", "candidate": f"answer-{index}"})
+    for _ in range(candidates):
+        await answer_side.receive_json_from(RECEIVE_TIMEOUT)
+        await offer_side.receive_json_from(RECEIVE_TIMEOUT)
+
+    await offer_side.disconnect()
+    await answer_side.receive_json_from(RECEIVE_TIMEOUT)  # match_cancelled
+    await answer_side.disconnect()
+
+
+def _counting(method, counts, name):
+    async def wrapper(*args, **kwargs):
+        counts[name] += 1
+        return await method(*args, **kwargs)
+    return wrapper
+
+
+def _layer_redis(layer):
+    """channels_redis 레이어면 첫 번째 호스트에 INFO용 클라이언트 연결 (그 외 레이어는 None)"""
+    hosts = getattr(layer, "hosts", None)
+    if not hosts:
+        return None
+    host = hosts[0]
+    address = host.get("address") if isinstance(host, dict) else host
+    if isinstance(address, str):
+        return aioredis.Redis.from_url(address)
+    return aioredis.Redis(host=address[0], port=address[1])
+
+
+async def _commands_processed(redis_client):
+    """Redis 명령 누적 호출 수 (Lua 스크립트 안에서 실행된 명령 포함, INFO 자신은 제외)"""
+    if redis_client is None:
+        return None
+    stats = await redis_client.info("commandstats")
+    return sum(value["calls"] for name, value in stats.items() if name != "cmdstat_info")
@@ -0,0 +1,31 @@
+import asyncio
+
+from django.core.management.base import BaseCommand
+
+from match.event_consumers import rebuild_event_counters, rebuild_history
+from tori_backend.redis_client import get_redis
+
+
+class Command(BaseCommand):
+    help = "match_events 스트림을 다시 읽어 파생 데이터(MatchHistory / 이벤트 카운터)를 재구성"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--target", choices=["history", "metrics", "all"], default="all")
+        parser.add_argument("--start", default="-", help="history 시작 스트림 ID (기본: 처음)")
+        parser.add_argument("--end", default="+", help="history 끝 스트림 ID (기본: 마지막)")
+
+    def handle(self, *args, **options):
+        asyncio.run(self._replay(options["target"], options["start"], options["end"]))
+
+    async def _replay(self, target, start, end):
+        redis_client = get_redis()
+        if target in ("history", "all"):
+            saved = await rebuild_history(redis_client, start, end)
+            self.stdout.write(f"MatchHistory: replayed {saved} records")
+        if target in ("metrics", "all"):
+            # 카운터는 누적 값이라 구간 지정 없이 스트림 전체로만 재계산
+            counts = await rebuild_event_counters(redis_client)
+            if counts is None:
+                self.stdout.write("match_events_total: stream was trimmed past the counters, left unchanged")
+                return
+            self.stdout.write("match_events_total: " + ", ".join(f"{event}={count}" for event, count in sorted(counts.items())))
@@ -0,0 +1,32 @@
+import asyncio
+
+from django.core.management.base import BaseCommand
+
+from match.event_consumers import GROUP_HANDLERS, EventGroupConsumer
+from tori_backend.settings.constants import MATCH_EVENT_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = "match_events 스트림을 컨슈머 그룹으로 읽어 지표/배치 매처에 전달"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--group", choices=sorted(GROUP_HANDLERS), required=True)
+        parser.add_argument("--name", default=None, help="그룹 안 컨슈머 이름 (기본: 호스트 이름)")
+        parser.add_argument("--batch-size", type=int, default=MATCH_EVENT_BATCH_SIZE)
+        parser.add_argument("--once", action="store_true", help="밀린 이벤트만 처리하고 종료")
+
+    def handle(self, *args, **options):
+        consumer = EventGroupConsumer(
+            options["group"],
+            GROUP_HANDLERS[options["group"]](),
+            name=options["name"],
+            batch_size=options["batch_size"],
+        )
+        if options["once"]:
+            handled = asyncio.run(consumer.run_once())
+            self.stdout.write(f"Handled {handled} events")
+            return
+        try:
+            asyncio.run(consumer.run_forever())
+        except KeyboardInterrupt:
+            self.stdout.write("Match event consumer stopped")
@@ -0,0 +1,26 @@
+import asyncio
+
+from django.core.management.base import BaseCommand
+
+from match.matcher import BatchMatcher
+from tori_backend.settings.constants import MATCHER_BATCH_SIZE, MATCHER_TICK_INTERVAL_MS
+
+
+class Command(BaseCommand):
+    help = "match_queue를 주기적으로 배치 매칭하는 백그라운드 매처 실행"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval-ms", type=int, default=MATCHER_TICK_INTERVAL_MS)
+        parser.add_argument("--batch-size", type=int, default=MATCHER_BATCH_SIZE)
+        parser.add_argument("--once", action="store_true", help="한 번만 매칭하고 종료")
+
+    def handle(self, *args, **options):
+        matcher = BatchMatcher(batch_size=options["batch_size"], interval_ms=options["interval_ms"])
+        if options["once"]:
+            pairs = asyncio.run(matcher.run_tick())
+            self.stdout.write(f"Paired {pairs} couples")
+            return
+        try:
+            asyncio.run(matcher.run_forever())
+        except KeyboardInterrupt:
+            self.stdout.write("Batch matcher stopped")
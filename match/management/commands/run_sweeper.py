@@ -0,0 +1,36 @@
+import asyncio
+
+from django.core.management.base import BaseCommand
+
+from match.deadlines import DeadlineScheduler
+from match.sweeper import QueueSweeper
+from tori_backend.settings.constants import MATCH_DEADLINE_POLL_MS, MATCH_SWEEP_INTERVAL_MS, MATCH_SWEEP_SCAN_COUNT
+
+
+class Command(BaseCommand):
+    help = "응답 마감이 지난 매치 제안 / 재접속 유예가 끝난 세션 / 오프라인 사용자 / 고아 user_matches / 만료된 match_requests를 주기적으로 정리"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval-ms", type=int, default=MATCH_SWEEP_INTERVAL_MS)
+        parser.add_argument("--scan-count", type=int, default=MATCH_SWEEP_SCAN_COUNT)
+        parser.add_argument("--deadline-poll-ms", type=int, default=MATCH_DEADLINE_POLL_MS)
+        parser.add_argument("--once", action="store_true", help="한 번만 정리하고 종료")
+
+    def handle(self, *args, **options):
+        sweeper = QueueSweeper(interval_ms=options["interval_ms"], scan_count=options["scan_count"])
+        scheduler = DeadlineScheduler(poll_ms=options["deadline_poll_ms"])
+        if options["once"]:
+            counts = asyncio.run(self.run_once(sweeper, scheduler))
+            self.stdout.write(", ".join(f"{name}={count}" for name, count in counts.items()))
+            return
+        try:
+            asyncio.run(self.run_forever(sweeper, scheduler))
+        except KeyboardInterrupt:
+            self.stdout.write("Queue sweeper stopped")
+
+    async def run_once(self, sweeper, scheduler):
+        expired_deadlines = await scheduler.run_due()
+        return {'expired_deadlines': expired_deadlines, **await sweeper.run_sweep()}
+
+    async def run_forever(self, sweeper, scheduler):
+        await asyncio.gather(sweeper.run_forever(), scheduler.run_forever())
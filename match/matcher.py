@@ -0,0 +1,152 @@
+# match/matcher.py
+"""
+백그라운드 배치 매처
+
+WebSocket 워커와 별도 프로세스(python manage.py run_matcher)에서 N ms마다 깨어나
+match_queue의 오래 기다린 사용자부터 호환 가능한 상대를 탐욕적으로 짝지어 준다.
+선점은 MatchService._create_match (CLAIM_PAIR_LUA)를 그대로 사용하므로
+소켓 쪽 try_match와 동시에 돌아도 같은 사용자가 두 번 매칭되지 않는다.
+"""
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from typing import Any, Dict, Tuple
+
+from channels.layers import get_channel_layer
+
+from tori_backend.redis_client import get_redis
+from tori_backend.settings.constants import MATCHER_BATCH_SIZE, MATCHER_TICK_INTERVAL_MS
+
+from .buckets import bucket_for_setting, candidate_bucket_keys
+from .exclusions import aget_exclusions
+from .metrics import MetricsBatch
+from .profiles import profile_to_setting, profile_user
+from .services import MatchService, build_match_notification
+from .state import afetch_user_states
+
+logger = logging.getLogger(__name__)
+
+
+class BatchMatcher:
+    def __init__(self, batch_size: int = MATCHER_BATCH_SIZE, interval_ms: int = MATCHER_TICK_INTERVAL_MS):
+        self.batch_size = batch_size
+        self.interval = interval_ms / 1000
+        self.queue_key = "match_queue"
+        self.channel_layer = get_channel_layer()
+
+    async def run_forever(self):
+        logger.info(f"Batch matcher started (interval={self.interval}s, batch_size={self.batch_size})")
+        while True:
+            started = time.monotonic()
+            try:
+                await self.run_tick()
+            except Exception as e:
+                logger.error(f"Batch matcher tick failed: {e}", exc_info=True)
+            await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+    async def run_tick(self) -> int:
+        """한 번의 배치 매칭 - 성사된 쌍의 수 반환"""
+        waiting = await self._load_waiting_users()
+        if len(waiting) < 2:
+            return 0
+
+        # 배치 안에서도 호환성 버킷으로 묶어 후보를 좁힌다
+        by_bucket = defaultdict(list)
+        for user_id, (score, _, setting) in waiting.items():
+            by_bucket[bucket_for_setting(setting)].append((score, user_id))
+
+        # 최근 매칭/거절한 상대는 후보에서 제외 (파이프라인 1회)
+        exclusions = await aget_exclusions(get_redis(), waiting)
+
+        metrics = MetricsBatch()
+        paired = set()
+        skipped = set()
+        pairs = 0
+        for user_id in sorted(waiting, key=lambda uid: waiting[uid][0]):
+            if user_id in paired or user_id in skipped:
+                continue
+            score, user, setting = waiting[user_id]
+            service = MatchService(user)
+
+            candidates = sorted(
+                candidate
+                for key in candidate_bucket_keys(setting)
+                for candidate in by_bucket.get(key, [])
+            )
+            for other_score, other_id in candidates:
+                if other_id == user_id or other_id in paired or other_id in skipped or other_id in exclusions[user_id]:
+                    continue
+                _, other_user, other_setting = waiting[other_id]
+                if not service._is_compatible(setting, other_setting):
+                    continue
+
+                # 소켓 경로와 같은 쪽이 요청자 - 나중에 큐에 들어온 쪽이 먼저 기다린 쪽을 선점하고 보석을 낸다
+                # (소켓 경로에서는 새로 들어온 사용자의 try_match가 대기 중인 상대를 선점)
+                if other_score >= score:
+                    requester_id, requester, requester_setting, partner = other_id, other_user, other_setting, user
+                else:
+                    requester_id, requester, requester_setting, partner = user_id, user, setting, other_user
+                requester_service = MatchService(requester)
+
+                claim = await requester_service._create_match(partner, metrics)
+                if not claim:
+                    # 소켓 쪽 매칭이 둘 중 하나를 먼저 가져감 - 가져간 쪽만 이번 틱에서 제외
+                    if not await self._still_waiting(user_id):
+                        paired.add(user_id)
+                        break
+                    paired.add(other_id)
+                    continue
+
+                # 잔액 부족은 join_queue 시 이미 gem_error로 알렸으므로 이번 틱에서만 제외
+                if not await requester_service._charge_matching_cost(requester_setting, partner, claim, metrics):
+                    skipped.add(requester_id)
+                    if requester_id == user_id:
+                        break
+                    continue
+
+                paired.update((user_id, other_id))
+                pairs += 1
+                await self._notify_pair(requester, partner)
+                break
+
+        metrics.inc('match_attempts_total', pairs, result='batch_match_created')
+        await metrics.flush()
+        if pairs:
+            logger.info(f"Batch matcher paired {pairs} couples from {len(waiting)} waiting users")
+        return pairs
+
+    async def _load_waiting_users(self) -> Dict[str, Tuple[float, Any, Dict[str, Any]]]:
+        """큐 앞쪽 batch_size명 중 온라인이고 매치가 없는 사용자 {user_id: (score, user, setting)}"""
+        redis_client = get_redis()
+        members = await redis_client.zrange(self.queue_key, 0, self.batch_size - 1, withscores=True)
+        scores = {user_id_bytes.decode('utf-8'): score for user_id_bytes, score in members}
+        if not scores:
+            return {}
+
+        states = await afetch_user_states(redis_client, list(scores), with_profiles=True)
+
+        waiting = {}
+        for user_id, state in states.items():
+            if not state['online'] or state['match_id'] or not state['profile']:
+                continue
+            setting = profile_to_setting(state['profile'])
+            if setting:
+                waiting[user_id] = (scores[user_id], profile_user(state['profile']), setting)
+        return waiting
+
+    async def _still_waiting(self, user_id: str) -> bool:
+        """아직 큐에 있고 진행 중인 매치가 없는지 (선점 실패 시 어느 쪽이 빠졌는지 확인)"""
+        pipe = get_redis().pipeline()
+        pipe.zscore(self.queue_key, user_id)
+        pipe.exists(f"user_matches:{user_id}")
+        score, matched = await pipe.execute()
+        return score is not None and not matched
+
+    async def _notify_pair(self, user, other_user):
+        """양쪽 user_{id} 그룹에 match_found 알림"""
+        try:
+            await self.channel_layer.group_send(f"user_{user.id}", build_match_notification(other_user))
+            await self.channel_layer.group_send(f"user_{other_user.id}", build_match_notification(user))
+        except Exception as e:
+            logger.error(f"Error notifying match {user.id} <-> {other_user.id}: {e}")
@@ -0,0 +1,182 @@
+# match/metrics.py
+"""
+매칭 파이프라인 지표 (카운터 / 히스토그램)
+
+여러 워커의 값을 Redis 해시 두 개에 합산하고 /metrics에서 Prometheus 텍스트 형식으로 내보낸다.
+- match_metrics:counters  필드 = 샘플 이름(라벨 포함), 값 = 누적 값
+- match_metrics:hist      필드 = "샘플 이름\t버킷 상한|sum|count"
+요청 하나에서 나온 지표는 MetricsBatch에 모았다가 파이프라인 한 번으로 기록한다.
+지표 기록 실패는 매칭에 영향을 주지 않도록 로그만 남긴다.
+"""
+import logging
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+from tori_backend.redis_client import get_redis
+
+from .locks import get_lock_stats
+
+logger = logging.getLogger(__name__)
+
+COUNTERS_KEY = "match_metrics:counters"
+HISTOGRAMS_KEY = "match_metrics:hist"
+
+# 단계별 처리 시간 (초)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+# 큐 대기 시간 (초)
+QUEUE_WAIT_BUCKETS = (1, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+HISTOGRAM_BUCKETS = {
+    'match_stage_seconds': LATENCY_BUCKETS,
+    'match_room_create_seconds': LATENCY_BUCKETS,
+    'match_time_in_queue_seconds': QUEUE_WAIT_BUCKETS,
+}
+
+HELP = {
+    'match_attempts_total': "find_and_match_atomic 결과별 횟수 (matching_in_progress = 버킷 락 경합)",
+    'match_claims_total': "상대 선점 시도 결과별 횟수",
+    'match_responses_total': "매치 응답(accept/reject) 횟수",
+    'match_stage_seconds': "find_and_match_atomic 단계별 처리 시간",
+    'match_room_create_seconds': "MatchedRoom 생성 시간",
+    'match_time_in_queue_seconds': "큐 진입부터 매치 선점까지 대기 시간",
+    'match_events_total': "match_events 스트림 이벤트 종류별 수 (run_event_consumer --group metrics)",
+}
+
+# locks.py의 match_lock_stats (ms 단위 누적값은 초로 변환)
+LOCK_STAT_METRICS = {
+    'acquired': ('match_lock_acquired_total', 1),
+    'contended': ('match_lock_contended_total', 1),
+    'timeouts': ('match_lock_timeouts_total', 1),
+    'expired': ('match_lock_expired_total', 1),
+    'wait_ms': ('match_lock_wait_seconds_total', 0.001),
+    'hold_ms': ('match_lock_hold_seconds_total', 0.001),
+}
+
+
+def _sample(name: str, labels: Dict[str, str]) -> str:
+    if not labels:
+        return name
+    return name + "{" + ",".join(f'{key}="{value}"' for key, value in sorted(labels.items())) + "}"
+
+
+def _bucket_for(name: str, value: float) -> str:
+    for upper in HISTOGRAM_BUCKETS.get(name, LATENCY_BUCKETS):
+        if value <= upper:
+            return repr(float(upper))
+    return "+Inf"
+
+
+class MetricsBatch:
+    """지표를 모았다가 flush()에서 한 번에 기록"""
+
+    def __init__(self):
+        self.counters = defaultdict(int)
+        self.observations: List[Tuple[str, str, float]] = []
+
+    def inc(self, name: str, amount: int = 1, **labels):
+        self.counters[_sample(name, labels)] += amount
+
+    def observe(self, name: str, value: float, **labels):
+        sample = _sample(name, labels)
+        self.observations.append((sample, name, value))
+
+    @contextmanager
+    def time(self, name: str = 'match_stage_seconds', **labels):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(name, time.monotonic() - started, **labels)
+
+    async def flush(self, redis_client=None):
+        if not self.counters and not self.observations:
+            return
+        try:
+            pipe = (redis_client or get_redis()).pipeline(transaction=False)
+            for sample, amount in self.counters.items():
+                pipe.hincrby(COUNTERS_KEY, sample, amount)
+            for sample, name, value in self.observations:
+                pipe.hincrby(HISTOGRAMS_KEY, f"{sample}\t{_bucket_for(name, value)}", 1)
+                pipe.hincrbyfloat(HISTOGRAMS_KEY, f"{sample}\tsum", round(value, 6))
+                pipe.hincrby(HISTOGRAMS_KEY, f"{sample}\tcount", 1)
+            await pipe.execute()
+        except Exception as e:
+            logger.error(f"Error recording match metrics: {e}")
+        finally:
+            self.counters.clear()
+            self.observations.clear()
+
+
+async def inc(name: str, amount: int = 1, **labels):
+    batch = MetricsBatch()
+    batch.inc(name, amount, **labels)
+    await batch.flush()
+
+
+async def observe(name: str, value: float, **labels):
+    batch = MetricsBatch()
+    batch.observe(name, value, **labels)
+    await batch.flush()
+
+
+def _metric_name(sample: str) -> str:
+    return sample.split("{", 1)[0]
+
+
+def _with_label(sample: str, key: str, value: str) -> str:
+    label = f'{key}="{value}"'
+    if "{" not in sample:
+        return f"{sample}{{{label}}}"
+    return sample[:-1] + "," + label + "}"
+
+
+def _format(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+async def render_prometheus(redis_client) -> str:
+    """Prometheus 텍스트 형식 (text/plain; version=0.0.4)"""
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.hgetall(COUNTERS_KEY)
+    pipe.hgetall(HISTOGRAMS_KEY)
+    raw_counters, raw_histograms = await pipe.execute()
+
+    lines = []
+    counters = defaultdict(dict)
+    for sample, value in raw_counters.items():
+        sample = sample.decode('utf-8')
+        counters[_metric_name(sample)][sample] = float(value)
+    for stat, value in (await get_lock_stats(redis_client)).items():
+        if stat in LOCK_STAT_METRICS:
+            name, scale = LOCK_STAT_METRICS[stat]
+            counters[name][name] = value * scale
+
+    for name in sorted(counters):
+        if name in HELP:
+            lines.append(f"# HELP {name} {HELP[name]}")
+        lines.append(f"# TYPE {name} counter")
+        for sample, value in sorted(counters[name].items()):
+            lines.append(f"{sample} {_format(value)}")
+
+    histograms = defaultdict(lambda: defaultdict(dict))
+    for field, value in raw_histograms.items():
+        sample, suffix = field.decode('utf-8').rsplit("\t", 1)
+        histograms[_metric_name(sample)][sample][suffix] = float(value)
+
+    for name in sorted(histograms):
+        if name in HELP:
+            lines.append(f"# HELP {name} {HELP[name]}")
+        lines.append(f"# TYPE {name} histogram")
+        for sample, values in sorted(histograms[name].items()):
+            base = sample.replace(name, f"{name}_bucket", 1)
+            cumulative = 0
+            for upper in HISTOGRAM_BUCKETS.get(name, LATENCY_BUCKETS):
+                cumulative += values.get(repr(float(upper)), 0)
+                lines.append(f"{_with_label(base, 'le', repr(float(upper)))} {_format(cumulative)}")
+            lines.append(f"{_with_label(base, 'le', '+Inf')} {_format(values.get('count', 0))}")
+            lines.append(f"{sample.replace(name, f'{name}_sum', 1)} {_format(values.get('sum', 0))}")
+            lines.append(f"{sample.replace(name, f'{name}_count', 1)} {_format(values.get('count', 0))}")
+
+    return "\n".join(lines) + "\n"
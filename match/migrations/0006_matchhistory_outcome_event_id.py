@@ -0,0 +1,55 @@
+# Generated by Django 5.0.6 on 2026-10-17 18:21
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("match", "0005_delete_recentmatchexclude"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name="matchhistory",
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name="matchhistory",
+            name="event_id",
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name="matchhistory",
+            name="outcome",
+            field=models.CharField(
+                choices=[
+                    ("accepted", "Accepted"),
+                    ("rejected", "Rejected"),
+                    ("expired", "Expired"),
+                    ("cancelled", "Cancelled"),
+                ],
+                default="accepted",
+                max_length=20,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="matchhistory",
+            name="matched_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name="matchhistory",
+            index=models.Index(
+                fields=["user1", "matched_at"], name="match_match_user1_i_94c269_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="matchhistory",
+            index=models.Index(
+                fields=["user2", "matched_at"], name="match_match_user2_i_c50a4b_idx"
+            ),
+        ),
+    ]
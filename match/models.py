@@ -1,16 +1,32 @@
 from django.db import models
 from django.conf import settings
 
+from django.utils import timezone
+from datetime import timedelta
+
 class MatchHistory(models.Model):
     user1 = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='match_histories_1')
     user2 = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='match_histories_2')
-    matched_at = models.DateTimeField(auto_now_add=True)
+    # 이벤트로 일괄 기록(match/history_writer.py)할 때 실제 결과 시각을 넣기 위해 auto_now_add 대신 default 사용
+    matched_at = models.DateTimeField(default=timezone.now)
+    outcome = models.CharField(
+        max_length=20,
+        choices=[
+            ('accepted', 'Accepted'),
+            ('rejected', 'Rejected'),
+            ('expired', 'Expired'),
+            ('cancelled', 'Cancelled')
+        ],
+        default='accepted'
+    )
+    # 매치 하나의 결과를 가리키는 키 - 같은 기록을 다시 넣어도 한 번만 저장 (bulk_create ignore_conflicts)
+    event_id = models.CharField(max_length=64, unique=True, null=True, blank=True)
 
     class Meta:
-        unique_together = (('user1', 'user2'),)
-
-from django.utils import timezone
-from datetime import timedelta
+        indexes = [
+            models.Index(fields=['user1', 'matched_at']),
+            models.Index(fields=['user2', 'matched_at']),
+        ]
 
 class MatchSetting(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
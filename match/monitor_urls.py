@@ -0,0 +1,9 @@
+# match/monitor_urls.py
+from django.urls import path
+from .views import QueueSnapshotView, QueueStatusView, QueueUsersView
+
+urlpatterns = [
+    path('queue/status/', QueueStatusView.as_view(), name='match-queue-status'),
+    path('queue/users/', QueueUsersView.as_view(), name='match-queue-users'),
+    path('queue/snapshot/', QueueSnapshotView.as_view(), name='match-queue-snapshot'),
+]
@@ -0,0 +1,63 @@
+# match/presence.py
+"""
+heartbeat 기반 온라인 상태 (Sorted Set)
+
+사용자마다 user_online:{id} TTL 키를 두는 대신 match_presence 하나에
+멤버=user_id, 스코어=마지막 heartbeat 시각을 기록한다.
+- 연결, 수신 프레임(ping 포함), 매칭 시도 때 ZADD로 갱신 (연결마다 TOUCH_INTERVAL에 한 번)
+- 여러 명의 온라인 여부는 ZMSCORE 한 번
+- 오래된 사용자 전체는 ZRANGEBYSCORE 한 번
+"""
+import time
+from typing import Iterable, List, Optional
+
+from tori_backend.settings.constants import MATCH_PRESENCE_TIMEOUT
+
+PRESENCE_KEY = "match_presence"
+# 재접속 유예 중인 사용자 (멤버=user_id, 스코어=유예 종료 시각 - sessions.py)
+GRACE_KEY = "match_grace"
+# 연결 쪽에서 heartbeat를 다시 기록하는 최소 간격 (프레임마다 ZADD 하지 않도록)
+TOUCH_INTERVAL = MATCH_PRESENCE_TIMEOUT / 4
+
+
+def presence_cutoff(now: Optional[float] = None) -> float:
+    """이 시각보다 오래된 heartbeat는 오프라인"""
+    return (now if now is not None else time.time()) - MATCH_PRESENCE_TIMEOUT
+
+
+def is_fresh(score: Optional[float], cutoff: float) -> bool:
+    return score is not None and float(score) >= cutoff
+
+
+def grace_expired(grace_until: Optional[float], now: float) -> bool:
+    """유예가 끝났는데 아직 정리 작업이 처리하지 않은 사용자 (유예 중 갱신된 heartbeat는 무시)"""
+    return grace_until is not None and float(grace_until) <= now
+
+
+async def touch(redis_client, user_id, now: Optional[float] = None):
+    """heartbeat 기록"""
+    await redis_client.zadd(PRESENCE_KEY, {str(user_id): now if now is not None else time.time()})
+
+
+async def remove(redis_client, *user_ids):
+    if user_ids:
+        await redis_client.zrem(PRESENCE_KEY, *[str(user_id) for user_id in user_ids])
+
+
+async def is_online(redis_client, user_id) -> bool:
+    return is_fresh(await redis_client.zscore(PRESENCE_KEY, str(user_id)), presence_cutoff())
+
+
+async def online_flags(redis_client, user_ids: Iterable) -> List[bool]:
+    """user_ids 순서대로 온라인 여부 (ZMSCORE 1회)"""
+    user_ids = [str(user_id) for user_id in user_ids]
+    if not user_ids:
+        return []
+    cutoff = presence_cutoff()
+    return [is_fresh(score, cutoff) for score in await redis_client.zmscore(PRESENCE_KEY, user_ids)]
+
+
+async def stale_users(redis_client, now: Optional[float] = None) -> List[str]:
+    """heartbeat가 끊긴 사용자 전체 (ZRANGEBYSCORE 1회)"""
+    members = await redis_client.zrangebyscore(PRESENCE_KEY, "-inf", f"({presence_cutoff(now)}")
+    return [user_id.decode('utf-8') for user_id in members]
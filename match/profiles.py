@@ -0,0 +1,202 @@
+# match/profiles.py
+"""
+매칭 프로필 캐시 (Read-through)
+
+사용자별 매칭에 필요한 값(나이, 성별, 선호 조건, 닉네임, 프로필 이미지)을
+Redis 해시 match_profile:{user_id} 하나에 모아 둔다.
+- 처음 읽을 때 DB에서 한 번에 채우고
+- MatchSetting / User 저장 시 시그널(match/signals.py)로 갱신/무효화한다.
+  대기 중인 사용자는 이때 호환성 버킷도 새 설정에 맞게 옮긴다 (rebucket_queued_user).
+큐 스캔은 캐시만 읽으므로 SQL이 발생하지 않는다.
+"""
+import logging
+from typing import Any, Dict, Iterable, List, Optional
+
+from channels.db import database_sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+from tori_backend.redis_client import get_redis, load_script
+
+from .buckets import bucket_for_setting, user_bucket_key
+from .models import MatchSetting
+from .rematch import QUEUE_EVENTS_CHANNEL, queue_event
+from .scripts import REBUCKET_USER_LUA
+
+User = get_user_model()
+logger = logging.getLogger(__name__)
+
+PROFILE_KEY_PREFIX = "match_profile"
+PROFILE_TTL = 60 * 60 * 24
+
+INT_FIELDS = ('age', 'age_min', 'age_max', 'radius_km', 'setting_id')
+
+
+def profile_key(user_id) -> str:
+    return f"{PROFILE_KEY_PREFIX}:{user_id}"
+
+
+def build_profile(user, setting: Optional[MatchSetting]) -> Dict[str, Any]:
+    """User + MatchSetting으로 프로필 생성 (설정이 없으면 설정 필드는 None)"""
+    return {
+        'user_id': str(user.id),
+        'username': user.username,
+        'age': user.age,
+        'gender': user.gender,
+        'image': user.profile_image.name if user.profile_image else "",
+        'image_url': user.profile_image.url if user.profile_image else "",
+        'setting_id': setting.id if setting else None,
+        'age_min': setting.age_min if setting else None,
+        'age_max': setting.age_max if setting else None,
+        'radius_km': setting.radius_km if setting else None,
+        'preferred_gender': setting.preferred_gender if setting else None,
+    }
+
+
+def profile_to_setting(profile: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """_is_compatible에서 쓰는 설정 dict로 변환 (MatchSetting이 없으면 None)"""
+    if not profile or profile.get('setting_id') is None:
+        return None
+    return {
+        'age_min': profile['age_min'],
+        'age_max': profile['age_max'],
+        'preferred_gender': profile['preferred_gender'],
+        'user_age': profile['age'],
+        'user_gender': profile['gender'],
+    }
+
+
+def profile_user(profile: Dict[str, Any]):
+    """프로필로 만든 저장되지 않은 User 인스턴스 (id/username/age/gender/profile_image만 사용할 때)"""
+    return User(
+        id=int(profile['user_id']),
+        username=profile['username'],
+        age=profile['age'],
+        gender=profile['gender'],
+        profile_image=profile['image'] or None,
+    )
+
+
+def _encode(profile: Dict[str, Any]) -> Dict[str, str]:
+    return {key: "" if value is None else str(value) for key, value in profile.items()}
+
+
+def decode_profile(raw: Dict[bytes, bytes]) -> Dict[str, Any]:
+    profile = {}
+    for key, value in raw.items():
+        key = key.decode('utf-8')
+        value = value.decode('utf-8')
+        if value == "":
+            profile[key] = "" if key in ('image', 'image_url') else None
+        elif key in INT_FIELDS:
+            profile[key] = int(value)
+        else:
+            profile[key] = value
+    return profile
+
+
+def _read_pipeline(redis_client, user_ids: List[str]):
+    pipe = redis_client.pipeline(transaction=False)
+    for user_id in user_ids:
+        pipe.hgetall(profile_key(user_id))
+    return pipe
+
+
+def _decode_all(user_ids: List[str], results: list) -> Dict[str, Dict[str, Any]]:
+    return {user_id: decode_profile(raw) for user_id, raw in zip(user_ids, results) if raw}
+
+
+def _write_cached(redis_client, profiles: Iterable[Dict[str, Any]]):
+    pipe = redis_client.pipeline(transaction=False)
+    for profile in profiles:
+        key = profile_key(profile['user_id'])
+        pipe.delete(key)
+        pipe.hset(key, mapping=_encode(profile))
+        pipe.expire(key, PROFILE_TTL)
+    pipe.execute()
+
+
+def load_profiles_from_db(user_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """DB에서 프로필을 한 번에 읽어 캐시에 기록 (존재하지 않는 사용자는 제외)"""
+    users = User.objects.filter(id__in=[int(user_id) for user_id in user_ids])
+    settings_by_user = {
+        setting.user_id: setting
+        for setting in MatchSetting.objects.filter(user_id__in=[int(user_id) for user_id in user_ids])
+    }
+    profiles = {str(user.id): build_profile(user, settings_by_user.get(user.id)) for user in users}
+    if profiles:
+        _write_cached(cache.client.get_client(), profiles.values())
+    return profiles
+
+
+def get_profiles(user_ids: Iterable) -> Dict[str, Dict[str, Any]]:
+    """프로필 일괄 조회 (동기 코드용)"""
+    user_ids = [str(user_id) for user_id in user_ids]
+    if not user_ids:
+        return {}
+    profiles = _decode_all(user_ids, _read_pipeline(cache.client.get_client(), user_ids).execute())
+    missing = [user_id for user_id in user_ids if user_id not in profiles]
+    if missing:
+        profiles.update(load_profiles_from_db(missing))
+    return profiles
+
+
+def get_profile(user_id) -> Optional[Dict[str, Any]]:
+    return get_profiles([user_id]).get(str(user_id))
+
+
+async def aget_profiles(user_ids: Iterable) -> Dict[str, Dict[str, Any]]:
+    """프로필 일괄 조회 (비동기 코드용, redis.asyncio 사용 - 캐시 미스일 때만 DB 스레드로 이동)"""
+    user_ids = [str(user_id) for user_id in user_ids]
+    if not user_ids:
+        return {}
+    profiles = _decode_all(user_ids, await _read_pipeline(get_redis(), user_ids).execute())
+    missing = [user_id for user_id in user_ids if user_id not in profiles]
+    if missing:
+        profiles.update(await database_sync_to_async(load_profiles_from_db)(missing))
+    return profiles
+
+
+async def aget_profile(user_id) -> Optional[Dict[str, Any]]:
+    return (await aget_profiles([user_id])).get(str(user_id))
+
+
+def refresh_profile(user, setting: Optional[MatchSetting] = None):
+    """저장된 값으로 프로필 다시 기록"""
+    try:
+        _write_cached(cache.client.get_client(), [build_profile(user, setting)])
+    except Exception as e:
+        logger.error(f"Error refreshing match profile for user {user.id}: {e}")
+
+
+def rebucket_queued_user(user_id) -> bool:
+    """
+    대기 중인 사용자의 버킷을 현재 프로필(설정/나이/성별)에 맞게 옮긴다 (대기 순서 유지)
+    대기 중이 아니면 프로필을 읽지 않는다. 갱신/무효화 뒤에 호출해야 새 값으로 계산된다.
+    """
+    from .counters import BUCKET_KEYS_KEY
+    from .state import QUEUE_KEY
+
+    try:
+        redis_client = cache.client.get_client()
+        if redis_client.zscore(QUEUE_KEY, user_id) is None:
+            return False
+        setting = profile_to_setting(get_profile(user_id))
+        bucket = bucket_for_setting(setting) or ''
+        moved = load_script(redis_client, REBUCKET_USER_LUA)(
+            keys=[QUEUE_KEY, user_bucket_key(user_id), BUCKET_KEYS_KEY], args=[user_id, bucket], client=redis_client,
+        )
+        if moved and bucket:
+            # 새 버킷을 후보로 보는 대기자 중 호환되는 사람에게 재매칭 기회 (match/rematch.py)
+            redis_client.publish(QUEUE_EVENTS_CHANNEL, queue_event([bucket], [setting]))
+        return bool(moved)
+    except Exception as e:
+        logger.error(f"Error re-bucketing queued user {user_id}: {e}")
+        return False
+
+
+def invalidate_profile(user_id):
+    try:
+        cache.client.get_client().delete(profile_key(user_id))
+    except Exception as e:
+        logger.error(f"Error invalidating match profile for user {user_id}: {e}")
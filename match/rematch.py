@@ -0,0 +1,194 @@
+# match/rematch.py
+"""
+큐 변경 이벤트 기반 재매칭
+
+try_match가 no_match / matching_in_progress로 끝난 사용자는 예전에는 나중에 들어온 사용자가
+우연히 자신을 스캔해 줄 때까지 기다려야 했다.
+- 큐 등록(참가/거절 후 재등록/연결 해제 후 재등록)과 선점 해제 시 바뀐 버킷 키를
+  Redis pub/sub 채널 match_queue_events로 발행한다 (등록 파이프라인에 PUBLISH를 함께 실어 보냄)
+- 워커(이벤트 루프)마다 구독 태스크 하나가 이벤트를 받아, 그 버킷을 후보 버킷으로 보는
+  이 워커의 대기 사용자에게만 MATCH_REMATCH_DEBOUNCE_MS 뒤 try_match를 한 번 다시 실행한다
+  (디바운스 동안 들어온 이벤트는 합쳐서 한 번만 재시도)
+- 등록 이벤트는 새 대기자의 설정도 함께 실어, 그 대기자와 호환되는(나이 범위 포함) 대기자만 깨운다
+  (버킷은 상대 나이 범위에 내 나이가 드는지까지는 걸러 주지 않음 / 설정이 없는 이벤트는 버킷만 보고 깨움)
+- 이벤트 하나에 깨우는 대기자는 그중 오래 기다린 순으로 MATCH_REMATCH_WAKE_LIMIT명까지
+  (새 대기자 한 명에 버킷 전체가 같은 락으로 몰려 matching_in_progress가 되는 것을 막음)
+- matching_in_progress 재시도는 지터를 넣은 지수 백오프 (backoff_delay)
+"""
+import asyncio
+import heapq
+import json
+import logging
+import random
+import weakref
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from tori_backend.redis_client import get_redis
+from tori_backend.settings.constants import (
+    MATCH_REMATCH_BACKOFF_BASE_MS,
+    MATCH_REMATCH_BACKOFF_MAX_MS,
+    MATCH_REMATCH_DEBOUNCE_MS,
+    MATCH_REMATCH_WAKE_LIMIT,
+)
+
+from .buckets import candidate_bucket_keys, is_compatible
+
+logger = logging.getLogger(__name__)
+
+QUEUE_EVENTS_CHANNEL = "match_queue_events"
+
+
+def queue_event(buckets: Iterable, settings: Iterable[Optional[Dict[str, Any]]] = ()) -> str:
+    """버킷 변경 이벤트 - settings는 새로 들어온 대기자의 설정 (깨울 대기자를 호환되는 사람으로 좁힘)"""
+    return json.dumps({
+        'buckets': sorted({
+            bucket.decode('utf-8') if isinstance(bucket, bytes) else bucket
+            for bucket in buckets if bucket
+        }),
+        'settings': [setting for setting in settings if setting],
+    })
+
+
+def parse_queue_event(data) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """(버킷, 새 대기자 설정) - 버킷 목록만 보내던 예전 형식도 읽음"""
+    payload = json.loads(data)
+    if isinstance(payload, list):
+        return payload, []
+    return payload.get('buckets', []), payload.get('settings', [])
+
+
+async def publish_queue_change(redis_client, buckets: Iterable, settings: Iterable[Optional[Dict[str, Any]]] = ()):
+    """버킷 변경 알림 (파이프라인에 실을 때는 pipe.publish(QUEUE_EVENTS_CHANNEL, queue_event(...)))"""
+    buckets = [bucket for bucket in buckets if bucket]
+    if buckets:
+        await redis_client.publish(QUEUE_EVENTS_CHANNEL, queue_event(buckets, settings))
+
+
+def backoff_delay(attempt: int) -> float:
+    """matching_in_progress 재시도 지연 (초) - 시도마다 두 배, 상한 이후 고정, 절반은 무작위"""
+    ceiling = min(MATCH_REMATCH_BACKOFF_MAX_MS, MATCH_REMATCH_BACKOFF_BASE_MS * 2 ** min(attempt, 16)) / 1000
+    return random.uniform(ceiling / 2, ceiling)
+
+
+class RematchDispatcher:
+    """이벤트 루프(워커)마다 하나 - 대기 중인 컨슈머 등록/재시도 예약"""
+
+    def __init__(self, debounce_ms: int = MATCH_REMATCH_DEBOUNCE_MS, wake_limit: int = MATCH_REMATCH_WAKE_LIMIT):
+        self.debounce = debounce_ms / 1000
+        self.wake_limit = wake_limit
+        self.waiters: Dict[str, object] = {}  # user_id -> MatchConsumer
+        self.buckets_of: Dict[str, Set[str]] = {}  # user_id -> 후보 버킷
+        self.settings_of: Dict[str, Dict[str, Any]] = {}  # user_id -> 매칭 설정 (깨울 때 호환성 확인)
+        self.waiters_by_bucket: Dict[str, Set[str]] = defaultdict(set)  # 후보 버킷 -> user_id
+        self.waiting_since: Dict[str, float] = {}  # user_id -> 처음 대기자가 된 시각 (재시도해도 유지)
+        self.scheduled: Dict[str, asyncio.TimerHandle] = {}
+        self._listener = None
+
+    def register(self, consumer, my_setting) -> bool:
+        """매칭 실패한 컨슈머를 대기자로 등록 (후보 버킷이 없으면 등록하지 않음)"""
+        buckets = set(candidate_bucket_keys(my_setting)) if my_setting else set()
+        user_id = consumer.user_id
+        self.suspend(user_id)
+        if not buckets:
+            self.waiting_since.pop(user_id, None)
+            return False
+        self.waiters[user_id] = consumer
+        self.buckets_of[user_id] = buckets
+        self.settings_of[user_id] = my_setting
+        for bucket in buckets:
+            self.waiters_by_bucket[bucket].add(user_id)
+        self.waiting_since.setdefault(user_id, asyncio.get_running_loop().time())
+        self._ensure_listener()
+        return True
+
+    def unregister(self, user_id: str, consumer=None):
+        """대기자 해제 - consumer를 주면 그 연결이 등록한 경우만 (같은 사용자의 새 연결은 유지)"""
+        if consumer is not None and self.waiters.get(user_id) is not consumer:
+            return
+        self.suspend(user_id)
+        self.waiting_since.pop(user_id, None)
+
+    def suspend(self, user_id: str):
+        """재시도하는 동안 이벤트 대상에서만 뺀다 (대기 순서는 유지 - 다시 register하면 원래 자리)"""
+        self.waiters.pop(user_id, None)
+        self.settings_of.pop(user_id, None)
+        for bucket in self.buckets_of.pop(user_id, ()):
+            waiting = self.waiters_by_bucket.get(bucket)
+            if waiting is not None:
+                waiting.discard(user_id)
+                if not waiting:
+                    del self.waiters_by_bucket[bucket]
+        handle = self.scheduled.pop(user_id, None)
+        if handle:
+            handle.cancel()
+
+    def schedule(self, user_id: str, delay: Optional[float] = None):
+        """디바운스(또는 delay초) 후 재매칭 (이미 예약돼 있으면 합침)"""
+        if user_id in self.scheduled or user_id not in self.waiters:
+            return
+        loop = asyncio.get_running_loop()
+        self.scheduled[user_id] = loop.call_later(self.debounce if delay is None else delay, self._fire, user_id)
+
+    def _fire(self, user_id: str):
+        self.scheduled.pop(user_id, None)
+        consumer = self.waiters.get(user_id)
+        if consumer is not None:
+            asyncio.get_running_loop().create_task(consumer.try_match())
+
+    def dispatch(self, buckets: Iterable[str], settings: Iterable[Dict[str, Any]] = ()):
+        """
+        바뀐 버킷을 후보로 보는 대기자 중 오래 기다린 wake_limit명만 재매칭 예약
+        settings(새 대기자 설정)가 있으면 그중 누구와도 호환되지 않는 대기자는 깨우지 않는다
+        """
+        user_ids = set()
+        for bucket in buckets:
+            user_ids |= self.waiters_by_bucket.get(bucket, set())
+        user_ids -= self.scheduled.keys()  # 이미 예약된 대기자는 그 재시도로 충분
+        settings = list(settings)
+        if settings:
+            user_ids = {
+                user_id for user_id in user_ids
+                if any(is_compatible(self.settings_of[user_id], setting) for setting in settings)
+            }
+        for user_id in heapq.nsmallest(self.wake_limit, user_ids, key=self.waiting_since.__getitem__):
+            self.schedule(user_id)
+
+    def _ensure_listener(self):
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.get_running_loop().create_task(self._listen())
+
+    async def _listen(self):
+        pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(QUEUE_EVENTS_CHANNEL)
+            async for message in pubsub.listen():
+                if message.get('type') != 'message':
+                    continue
+                try:
+                    self.dispatch(*parse_queue_event(message['data']))
+                except Exception as e:
+                    logger.error(f"Error dispatching queue event {message.get('data')}: {e}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # 다음 register 때 다시 구독
+            logger.error(f"Queue event listener stopped: {e}")
+        finally:
+            try:
+                await pubsub.aclose()
+            except Exception:
+                pass
+
+
+_dispatchers = weakref.WeakKeyDictionary()
+
+
+def get_dispatcher() -> RematchDispatcher:
+    """현재 이벤트 루프의 재매칭 디스패처"""
+    loop = asyncio.get_running_loop()
+    dispatcher = _dispatchers.get(loop)
+    if dispatcher is None:
+        dispatcher = RematchDispatcher()
+        _dispatchers[loop] = dispatcher
+    return dispatcher
@@ -0,0 +1,326 @@
+# match/scripts.py
+"""
+매칭 상태 전이를 원자적으로 처리하는 Redis Lua 스크립트 모음
+
+스크립트는 Redis 서버에서 한 번에 실행되므로 여러 워커가 동시에 같은 사용자를 잡으려 해도
+둘 중 하나만 성공한다. 전역 락 없이 매칭을 병렬로 돌리기 위해 사용한다.
+
+단일 Redis 노드(또는 단일 primary + replica) 전제 - Redis Cluster에서는 동작하지 않는다.
+일부 스크립트는 KEYS로 받지 않은 키를 스크립트 안에서 읽은 값으로 만들어 접근한다
+(버킷 키: match_bucket_of 값 / ARGV, 상대의 user_matches:{partner}, match_requests:{id}).
+상대와 버킷은 스크립트가 실행되는 순간에야 정해지므로 미리 KEYS로 넘길 수 없고,
+해시 태그로 한 슬롯에 모으면 모든 매칭 키가 한 노드에 몰려 클러스터의 의미가 없다.
+그런 스크립트는 주석에 "KEYS 밖 접근"으로 표시한다. 설정: settings.MATCH_REDIS
+스크립트 로더(load_script)는 tori_backend/redis_client.py
+"""
+
+
+# 두 사용자가 아직 큐에 있고 매치가 없으면 큐/버킷 인덱스에서 빼고 매치(해시)를 기록한다.
+# KEYS: match_queue, user_matches:a, user_matches:b, match_requests:{id}, match_bucket_of:a, match_bucket_of:b, match_pending
+# ARGV: a, b, match_id, ttl, response_timeout, field1, value1, field2, value2, ...
+# KEYS 밖 접근: 두 사용자의 버킷 키 (match_bucket_of 값)
+# match_pending 스코어 = 응답 마감 시각 (지나면 match/deadlines.py가 매치를 만료시킴)
+# 반환: 실패 시 0, 성공 시 {score_a, score_b, bucket_a, bucket_b} (해제 시 원래 자리로 되돌리기 위함)
+CLAIM_PAIR_LUA = """
+local score_a = redis.call('ZSCORE', KEYS[1], ARGV[1])
+local score_b = redis.call('ZSCORE', KEYS[1], ARGV[2])
+if not score_a or not score_b then
+    return 0
+end
+if redis.call('EXISTS', KEYS[2]) == 1 or redis.call('EXISTS', KEYS[3]) == 1 then
+    return 0
+end
+
+redis.call('ZREM', KEYS[1], ARGV[1], ARGV[2])
+local bucket_a = redis.call('GET', KEYS[5]) or ''
+local bucket_b = redis.call('GET', KEYS[6]) or ''
+if bucket_a ~= '' then redis.call('ZREM', bucket_a, ARGV[1]) end
+if bucket_b ~= '' then redis.call('ZREM', bucket_b, ARGV[2]) end
+redis.call('DEL', KEYS[5], KEYS[6])
+
+local ttl = tonumber(ARGV[4])
+redis.call('DEL', KEYS[4])
+redis.call('HSET', KEYS[4], unpack(ARGV, 6))
+redis.call('EXPIRE', KEYS[4], ttl)
+redis.call('SET', KEYS[2], ARGV[3], 'EX', ttl)
+redis.call('SET', KEYS[3], ARGV[3], 'EX', ttl)
+redis.call('ZADD', KEYS[7], tonumber(redis.call('TIME')[1]) + tonumber(ARGV[5]), ARGV[3])
+return {score_a, score_b, bucket_a, bucket_b}
+"""
+
+# CLAIM_PAIR_LUA로 잡은 매치를 취소하고 두 사용자를 원래 대기 순서로 되돌린다.
+# KEYS: match_queue, user_matches:a, user_matches:b, match_requests:{id}, match_bucket_of:a, match_bucket_of:b, match_pending
+# ARGV: a, b, match_id, score_a, score_b, bucket_a, bucket_b
+# KEYS 밖 접근: bucket_a, bucket_b (ARGV)
+RELEASE_PAIR_LUA = """
+if redis.call('GET', KEYS[2]) == ARGV[3] then redis.call('DEL', KEYS[2]) end
+if redis.call('GET', KEYS[3]) == ARGV[3] then redis.call('DEL', KEYS[3]) end
+redis.call('DEL', KEYS[4])
+redis.call('ZREM', KEYS[7], ARGV[3])
+
+redis.call('ZADD', KEYS[1], ARGV[4], ARGV[1])
+redis.call('ZADD', KEYS[1], ARGV[5], ARGV[2])
+if ARGV[6] ~= '' then
+    redis.call('ZADD', ARGV[6], ARGV[4], ARGV[1])
+    redis.call('SET', KEYS[5], ARGV[6])
+end
+if ARGV[7] ~= '' then
+    redis.call('ZADD', ARGV[7], ARGV[5], ARGV[2])
+    redis.call('SET', KEYS[6], ARGV[7])
+end
+return 1
+"""
+
+# 대기 중인 사용자의 버킷을 옮긴다 (매칭 설정/프로필 변경) - 큐 점수(대기 순서)는 그대로
+# KEYS: match_queue, match_bucket_of:{uid}, match_bucket_keys / ARGV: user_id, 새 버킷 키 (없으면 '')
+# KEYS 밖 접근: 이전 버킷 (match_bucket_of 값), 새 버킷 (ARGV)
+# 반환: 옮겼으면 1, 대기 중이 아니거나 버킷이 같으면 0
+REBUCKET_USER_LUA = """
+local score = redis.call('ZSCORE', KEYS[1], ARGV[1])
+if not score then
+    return 0
+end
+local previous = redis.call('GET', KEYS[2]) or ''
+if previous == ARGV[2] then
+    return 0
+end
+if previous ~= '' then redis.call('ZREM', previous, ARGV[1]) end
+if ARGV[2] ~= '' then
+    redis.call('ZADD', ARGV[2], score, ARGV[1])
+    redis.call('SADD', KEYS[3], ARGV[2])
+    redis.call('SET', KEYS[2], ARGV[2])
+else
+    redis.call('DEL', KEYS[2])
+end
+return 1
+"""
+
+# heartbeat가 끊긴 대기자를 큐/버킷에서만 뺀다 (매치/방/세션은 그대로) - 확인과 제거 사이에 갱신된 heartbeat는 존중
+# KEYS: match_queue, match_presence, match_grace / ARGV: cutoff, user_id1, user_id2, ...
+# KEYS 밖 접근: match_bucket_of:{uid}와 그 값(버킷 키)
+# 반환: 제거한 user_id 목록
+DEQUEUE_STALE_LUA = """
+local cutoff = tonumber(ARGV[1])
+local removed = {}
+for i = 2, #ARGV do
+    local user_id = ARGV[i]
+    local seen = redis.call('ZSCORE', KEYS[2], user_id)
+    local fresh = seen and tonumber(seen) >= cutoff
+    if not fresh and not redis.call('ZSCORE', KEYS[3], user_id) then
+        if redis.call('ZREM', KEYS[1], user_id) == 1 then
+            local member_key = 'match_bucket_of:' .. user_id
+            local bucket = redis.call('GET', member_key)
+            if bucket then redis.call('ZREM', bucket, user_id) end
+            redis.call('DEL', member_key)
+            table.insert(removed, user_id)
+        end
+    end
+end
+return removed
+"""
+
+# 매치 응답(accept/reject)을 기록하고 결과 상태를 한 번에 반환한다.
+# 두 사용자가 동시에 응답해도 서로의 응답을 덮어쓰지 않는다.
+# KEYS: match_requests:{id}
+# ARGV: user_id, response, now
+# 반환: {outcome, field1, value1, ...}
+#   outcome: expired | not_participant | closed | waiting | both_accepted | rejected
+RESPOND_MATCH_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return {'expired'}
+end
+
+local user1 = redis.call('HGET', KEYS[1], 'user1')
+local user2 = redis.call('HGET', KEYS[1], 'user2')
+local my_field, other_field
+if user1 == ARGV[1] then
+    my_field, other_field = 'user1_response', 'user2_response'
+elseif user2 == ARGV[1] then
+    my_field, other_field = 'user2_response', 'user1_response'
+else
+    return {'not_participant'}
+end
+
+local outcome
+if redis.call('HGET', KEYS[1], 'status') ~= 'pending' then
+    outcome = 'closed'
+elseif ARGV[2] == 'accept' then
+    redis.call('HSET', KEYS[1], my_field, 'accept', 'updated_at', ARGV[3])
+    if redis.call('HGET', KEYS[1], other_field) == 'accept' then
+        redis.call('HSET', KEYS[1], 'status', 'accepted')
+        outcome = 'both_accepted'
+    else
+        outcome = 'waiting'
+    end
+else
+    redis.call('HSET', KEYS[1], my_field, ARGV[2], 'status', 'rejected', 'updated_at', ARGV[3])
+    outcome = 'rejected'
+end
+
+local result = redis.call('HGETALL', KEYS[1])
+table.insert(result, 1, outcome)
+return result
+"""
+
+# 응답 마감이 지난 매치를 만료시킨다 - 아직 아무도 결과를 내지 않았을 때만 (status == pending)
+# 여러 프로세스가 같은 마감을 처리해도 match_pending에서 ZREM에 성공한 한 곳만 진행한다.
+# KEYS: match_requests:{id}, match_pending / ARGV: match_id
+# KEYS 밖 접근: 두 사용자의 user_matches (매치 기록의 user1/user2)
+# 반환: 처리할 것이 없으면 nil, 만료시켰으면 매치 기록 HGETALL
+EXPIRE_PENDING_MATCH_LUA = """
+if redis.call('ZREM', KEYS[2], ARGV[1]) == 0 then
+    return false
+end
+if redis.call('HGET', KEYS[1], 'status') ~= 'pending' then
+    return false
+end
+local record = redis.call('HGETALL', KEYS[1])
+for _, field in ipairs({'user1', 'user2'}) do
+    local user_matches = 'user_matches:' .. (redis.call('HGET', KEYS[1], field) or '')
+    if redis.call('GET', user_matches) == ARGV[1] then
+        redis.call('DEL', user_matches)
+    end
+end
+redis.call('DEL', KEYS[1])
+return record
+"""
+
+# 매치 기록을 지우고, 아직 이 매치를 가리키는 user_matches만 함께 지운다.
+# KEYS: match_requests:{id}, user_matches:a, user_matches:b, match_pending
+# ARGV: match_id, created_at (조회한 기록과 같은 매치일 때만 지우기 위함)
+CLEAR_MATCH_LUA = """
+if redis.call('HGET', KEYS[1], 'created_at') ~= ARGV[2] then
+    return 0
+end
+redis.call('DEL', KEYS[1])
+redis.call('ZREM', KEYS[4], ARGV[1])
+for i = 2, 3 do
+    if redis.call('GET', KEYS[i]) == ARGV[1] then
+        redis.call('DEL', KEYS[i])
+    end
+end
+return 1
+"""
+
+# 가리키는 매치 기록이 없을 때만 user_matches를 지운다.
+# KEYS: user_matches:{uid}, match_requests:{id} / ARGV: match_id
+CLEAR_ORPHAN_MATCH_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] and redis.call('EXISTS', KEYS[2]) == 0 then
+    redis.call('DEL', KEYS[1])
+    return 1
+end
+return 0
+"""
+
+# 연결 해제한 사용자의 Redis 상태를 한 번에 정리하고 매치 상대를 반환한다.
+# presence/큐/버킷에서 제거하고, 진행 중인 매치가 있으면 기록과 양쪽 user_matches를 지운다.
+# KEYS: match_presence, match_queue, match_bucket_of:{uid}, user_matches:{uid}, match_pending
+# ARGV: user_id, match_requests 키 접두사
+# KEYS 밖 접근: 버킷 (match_bucket_of 값), match_requests:{id}, 상대의 user_matches
+# 반환: {partner_id, hold_user, hold_id, match_id, created_at} (매치가 없으면 빈 문자열)
+DISCONNECT_USER_LUA = """
+redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('ZREM', KEYS[2], ARGV[1])
+local bucket = redis.call('GET', KEYS[3])
+if bucket then redis.call('ZREM', bucket, ARGV[1]) end
+redis.call('DEL', KEYS[3])
+
+local match_id = redis.call('GET', KEYS[4])
+if not match_id then
+    return {'', '', '', '', ''}
+end
+redis.call('DEL', KEYS[4])
+redis.call('ZREM', KEYS[5], match_id)
+
+local record_key = ARGV[2] .. match_id
+local fields = redis.call('HMGET', record_key, 'user1', 'user2', 'hold_user', 'hold_id', 'created_at')
+redis.call('DEL', record_key)
+
+local partner = ''
+if fields[1] == ARGV[1] then
+    partner = fields[2] or ''
+elseif fields[2] == ARGV[1] then
+    partner = fields[1] or ''
+end
+if partner ~= '' then
+    local partner_matches = 'user_matches:' .. partner
+    if redis.call('GET', partner_matches) == match_id then
+        redis.call('DEL', partner_matches)
+    end
+end
+return {partner, fields[3] or '', fields[4] or '', match_id, fields[5] or ''}
+"""
+
+# 세션 등록 - 사용자의 현재 연결(channel)을 새 연결로 바꾸고 epoch 증가
+# KEYS: match_session:{uid} / ARGV: channel_name
+# 반환: {epoch, 이전 연결의 channel_name('' = 없음)}
+SESSION_REGISTER_LUA = """
+local old = redis.call('HGET', KEYS[1], 'channel') or ''
+local epoch = redis.call('HINCRBY', KEYS[1], 'epoch', 1)
+redis.call('HSET', KEYS[1], 'channel', ARGV[1])
+return {epoch, old}
+"""
+
+# 연결 종료 - 이 연결이 아직 현재 세션(epoch 일치)일 때만 등록 해제 후,
+# 유예가 허용되고 재개 토큰이 일치하면 재접속 유예 시작
+# KEYS: match_session:{uid}, match_resume:{uid}, match_grace, match_presence
+# ARGV: user_id, epoch, token, deadline, resume_ttl, now, room, grace(1/0)
+# 반환: -1 = 새 연결로 대체됨(정리하지 않음), 0 = 바로 정리, 1 = 유예 시작
+SESSION_RELEASE_LUA = """
+if redis.call('HGET', KEYS[1], 'epoch') ~= ARGV[2] then
+    return -1
+end
+redis.call('HDEL', KEYS[1], 'channel')
+if ARGV[8] ~= '1' or redis.call('HGET', KEYS[2], 'token') ~= ARGV[3] then
+    return 0
+end
+redis.call('ZADD', KEYS[3], ARGV[4], ARGV[1])
+redis.call('HSET', KEYS[2], 'room', ARGV[7])
+redis.call('EXPIRE', KEYS[2], ARGV[5])
+redis.call('ZADD', KEYS[4], ARGV[6], ARGV[1])
+return 1
+"""
+
+# 세션 재개 - 토큰이 일치하고, 유예 중이거나 아직 끊기지 않은 이전 연결을 넘겨받는 경우(takeover=1)만
+# (반쯤 끊긴 소켓이 아직 disconnect되지 않아 유예가 시작되지 않았어도 같은 토큰이면 이어서 사용)
+# KEYS: match_resume:{uid}, match_grace / ARGV: user_id, token, takeover
+# 반환: 실패 시 nil, 성공 시 {room}
+SESSION_RESUME_LUA = """
+if redis.call('HGET', KEYS[1], 'token') ~= ARGV[2] then
+    return false
+end
+if redis.call('ZREM', KEYS[2], ARGV[1]) == 0 and ARGV[3] ~= '1' then
+    return false
+end
+return {redis.call('HGET', KEYS[1], 'room') or ''}
+"""
+
+# 유예 종료(만료 또는 재개하지 않는 새 연결) - 먼저 ZREM에 성공한 쪽만 정리를 맡는다
+# KEYS: match_grace, match_resume:{uid} / ARGV: user_id
+# 반환: 실패 시 nil, 성공 시 {room}
+SESSION_END_GRACE_LUA = """
+if redis.call('ZREM', KEYS[1], ARGV[1]) == 0 then
+    return false
+end
+local room = redis.call('HGET', KEYS[2], 'room') or ''
+redis.call('DEL', KEYS[2])
+return {room}
+"""
+
+# 토큰이 일치할 때만 재개 정보 삭제 (새 연결이 발급한 토큰은 유지)
+# KEYS: match_resume:{uid} / ARGV: token
+SESSION_DROP_LUA = """
+if redis.call('HGET', KEYS[1], 'token') == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# 토큰이 일치할 때만 락 해제
+# KEYS: lock_key / ARGV: token
+RELEASE_LOCK_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
@@ -1,53 +1,110 @@
-import json
 import time
 import logging
 from typing import Dict, List, Optional, Tuple, Any
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.core.cache import cache
 from django.db import transaction
 from django.db.models import Q
 from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
 from .models import MatchSetting, MatchedRoom
 from gem.models import UserGemWallet
 
 
 from typing import Tuple, Optional            # 타입 힌트
 from asgiref.sync import sync_to_async      # atomic 트랜잭션
-from tori_backend.settings.constants import GEM_COST_BY_GENDER
-
-from gem.services import spend_gems
+from tori_backend.redis_client import get_redis, load_script
+from tori_backend.settings.constants import (
+    GEM_COST_BY_GENDER, MATCH_BUCKET_SCAN_LIMIT, MATCH_CLAIM_ATTEMPTS, MATCH_LOCK_WAIT_TIMEOUT,
+    MATCH_REQUEST_TTL, MATCH_RESPONSE_TIMEOUT, MATCH_STATE_PAGE_SIZE,
+)
+
+from . import events
+from .events import add_event, emit_event
+from .exclusions import aget_excluded, exclude_pair
+from .counters import BUCKET_KEYS_KEY, PENDING_KEY, add_active_rooms, read_counters
+from .buckets import bucket_for_setting, candidate_bucket_keys, is_compatible, user_bucket_key
+from . import presence
+from .metrics import MetricsBatch, inc as inc_metric, observe as observe_metric
+from .locks import FencedLock, bucket_lock_key, get_lock_stats
+from .profiles import aget_profile, profile_to_setting, profile_user
+from .rematch import QUEUE_EVENTS_CHANNEL, publish_queue_change, queue_event
+from .scripts import CLAIM_PAIR_LUA, DISCONNECT_USER_LUA, RELEASE_PAIR_LUA, RESPOND_MATCH_LUA
+from .sweeper import sweep_stale_users
+from .state import QUEUE_KEY, adequeue_users, afetch_user_states, aiter_queue_pages
+
+from gem.services import capture_gems, get_available_gems, hold_gems, release_gems
 
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
 
+
+def build_match_notification(partner) -> Dict[str, Any]:
+    """user_{id} 그룹으로 보낼 notify_match 이벤트 (partner = 상대에게 보여줄 사용자)"""
+    image_url = partner.profile_image.url if partner.profile_image else ""
+    return {
+        "type": "notify_match",
+        "partner": partner.username,
+        "partner_image_url": settings.SERVER_HOST + image_url,
+        "partner_age": partner.age if partner.age else 0,
+        "partner_gender": partner.gender if partner.gender else "unknown",
+    }
+
+
+MATCH_RESPONSE_FIELDS = ('user1_response', 'user2_response')
+MATCH_TIME_FIELDS = ('created_at', 'updated_at')
+
+
+def encode_match(match_data: Dict[str, Any]) -> List[str]:
+    """매치 dict -> HSET용 [field, value, ...] (None은 빈 문자열)"""
+    args = []
+    for key, value in match_data.items():
+        args += [key, "" if value is None else str(value)]
+    return args
+
+
+def decode_match(raw) -> Dict[str, Any]:
+    """HGETALL 결과(dict 또는 [field, value, ...]) -> 매치 dict"""
+    if not isinstance(raw, dict):
+        raw = dict(zip(raw[::2], raw[1::2]))
+    match_data = {}
+    for key, value in raw.items():
+        key = key.decode('utf-8') if isinstance(key, bytes) else key
+        value = value.decode('utf-8') if isinstance(value, bytes) else value
+        if key in MATCH_RESPONSE_FIELDS:
+            match_data[key] = value or None
+        elif key in MATCH_TIME_FIELDS:
+            match_data[key] = float(value) if value else None
+        else:
+            match_data[key] = value
+    return match_data
+
+
 class MatchService:
     def __init__(self, user):
         self.user = user
         self.user_id = str(user.id)
         
         # Redis 키 정의 (기존 호환성 유지)
-        self.user_online_key = f"user_online:{self.user_id}"
         self.queue_key = "match_queue"  # Sorted Set: 매칭 대기열
         self.match_requests_key = "match_requests"  # 매치 데이터 키 프리픽스
         self.user_matches_key = f"user_matches:{self.user_id}"  # 유저의 현재 매치
         
         # Lock 키들
-        self.global_match_lock = "global_match_lock"
         self.user_lock_key = f"user_lock:{self.user_id}"
         
         # TTL 상수
-        self.ONLINE_TTL = 60
-        self.MATCH_TTL = 300  # 5분
+        self.MATCH_TTL = MATCH_REQUEST_TTL  # 5분
         self.LOCK_TTL = 10
 
     # ---------------------------
     # 기본 상태 관리 (기존 메서드명 유지)
     # ---------------------------
     async def mark_user_online(self) -> bool:
-        """사용자 온라인 상태 표시"""
+        """사용자 온라인 상태 표시 (heartbeat 갱신)"""
         try:
-            cache.set(self.user_online_key, True, timeout=self.ONLINE_TTL)
+            await presence.touch(get_redis(), self.user_id)
             return True
         except Exception as e:
             logger.error(f"Error marking user {self.user_id} online: {e}")
@@ -56,7 +113,7 @@ class MatchService:
     async def mark_user_offline(self):
         """사용자 오프라인 처리"""
         try:
-            cache.delete(self.user_online_key)
+            await presence.remove(get_redis(), self.user_id)
             await self.handle_disconnect_cleanup()
         except Exception as e:
             logger.error(f"Error marking user {self.user_id} offline: {e}")
@@ -65,7 +122,7 @@ class MatchService:
         """온라인 상태 확인"""
         target_id = user_id or self.user_id
         try:
-            return bool(cache.get(f"user_online:{str(target_id)}"))
+            return await presence.is_online(get_redis(), target_id)
         except Exception:
             return False
 
@@ -83,9 +140,8 @@ class MatchService:
             # 온라인 상태 갱신
             await self.mark_user_online()
             
-            # 큐에 추가 (타임스탬프로 정렬)
-            redis_client = cache.client.get_client()
-            redis_client.zadd(self.queue_key, {self.user_id: time.time()})
+            # 큐 + 호환성 인덱스에 추가 (타임스탬프로 정렬)
+            await self._enqueue_user(get_redis(), self.user_id, await self.get_my_setting(), time.time())
             
             logger.info(f"User {self.user_id} added to queue")
             return True
@@ -96,34 +152,60 @@ class MatchService:
     async def remove_from_queue(self) -> bool:
         """대기열에서 제거"""
         try:
-            redis_client = cache.client.get_client()
-            redis_client.zrem(self.queue_key, self.user_id)
+            await self._dequeue_user(get_redis(), self.user_id)
             logger.info(f"User {self.user_id} removed from queue")
             return True
         except Exception as e:
             logger.error(f"Error removing user {self.user_id} from queue: {e}")
             return False
 
+    async def _enqueue_user(self, redis_client, user_id: str, setting: Optional[Dict[str, Any]], score: float):
+        """match_queue와 버킷 인덱스에 함께 등록 (설정이 바뀌었으면 이전 버킷에서 이동)"""
+        await self._enqueue_users(redis_client, [(user_id, setting, score)])
+
+    async def _enqueue_users(self, redis_client, entries: List[Tuple[str, Optional[Dict[str, Any]], float]]):
+        """여러 사용자를 한 번에 등록 - entries: [(user_id, 매칭 설정, score), ...]"""
+        if not entries:
+            return
+        settings = [setting for _, setting, _ in entries]
+        entries = [(user_id, bucket_for_setting(setting), score) for user_id, setting, score in entries]
+        member_keys = [user_bucket_key(user_id) for user_id, _, _ in entries]
+        previous_buckets = await redis_client.mget(member_keys)
+
+        pipe = redis_client.pipeline()
+        for (user_id, bucket, score), member_key, previous in zip(entries, member_keys, previous_buckets):
+            previous = previous.decode('utf-8') if previous else None
+            add_event(pipe, events.ENQUEUED, user_id=user_id, bucket=bucket)
+            pipe.zadd(self.queue_key, {user_id: score})
+            if previous and previous != bucket:
+                pipe.zrem(previous, user_id)
+            if bucket:
+                pipe.zadd(bucket, {user_id: score})
+                pipe.sadd(BUCKET_KEYS_KEY, bucket)
+                pipe.set(member_key, bucket)
+            else:
+                pipe.delete(member_key)
+        # 바뀐 버킷을 보고 있는 대기자 중 새 대기자와 호환되는 사람에게 재매칭 기회 (match/rematch.py)
+        buckets = [bucket for _, bucket, _ in entries if bucket]
+        if buckets:
+            pipe.publish(QUEUE_EVENTS_CHANNEL, queue_event(buckets, settings))
+        await pipe.execute()
+
+    async def _dequeue_user(self, redis_client, user_id: str):
+        """match_queue와 버킷 인덱스에서 함께 제거"""
+        await self._dequeue_users(redis_client, [user_id])
+
+    async def _dequeue_users(self, redis_client, user_ids: List[str]):
+        """여러 사용자를 match_queue와 버킷 인덱스에서 한 번에 제거"""
+        await adequeue_users(redis_client, user_ids)
+
     # ---------------------------
     # 설정 조회 (기존 메서드명 유지)
     # ---------------------------
     async def get_my_setting(self) -> Optional[Dict[str, Any]]:
-        """사용자 매칭 설정 조회"""
+        """사용자 매칭 설정 조회 (매칭 프로필 캐시)"""
         try:
-            def _fetch():
-                return MatchSetting.objects.select_related('user').filter(user=self.user).first()
-            
-            setting = await database_sync_to_async(_fetch)()
-            if not setting:
-                return None
-                
-            return {
-                'age_min': setting.age_min,
-                'age_max': setting.age_max,
-                'preferred_gender': setting.preferred_gender,
-                'user_age': setting.user.age,
-                'user_gender': setting.user.gender
-            }
+            return profile_to_setting(await aget_profile(self.user_id))
         except Exception as e:
             logger.error(f"Error getting settings for user {self.user_id}: {e}")
             return None
@@ -132,149 +214,235 @@ class MatchService:
     # 핵심: 원자적 매칭 로직
     # ---------------------------
     async def find_and_match_atomic(self) -> Tuple[str, Optional[Any]]:
-        """전역 락을 사용한 원자적 매칭 + 보석 차감 (상대 발견 후 차감)"""
-        if not cache.set(self.global_match_lock, self.user_id, timeout=self.LOCK_TTL, nx=True):
-            return ("matching_in_progress", None)
-        
+        """버킷 락 + Lua 스크립트로 상대를 선점한 뒤 보석 차감 (단계별 시간/결과는 지표로 기록)"""
+        metrics = MetricsBatch()
+        result = await self._find_and_match(metrics)
+        metrics.inc('match_attempts_total', result=result[0])
+        await metrics.flush()
+        return result
+
+    async def _find_and_match(self, metrics: MetricsBatch) -> Tuple[str, Optional[Any]]:
         try:
             # 1. 내 설정 조회
-            my_setting = await self.get_my_setting()
+            with metrics.time(stage='settings'):
+                my_setting = await self.get_my_setting()
             if not my_setting:
                 return ("no_setting", None)
 
+            # 잔액이 부족하면 스캔/락 전에 바로 반환 (Redis 잔액 미러만 확인)
+            if not await self.can_afford_matching(my_setting):
+                return ("not_enough_gems", None)
+
             # 2. 이미 매칭 중인지 확인
             if await self._has_active_match():
                 return ("already_matched", None)
 
-            # 3. 적합한 상대 찾기
-            partner = await self._find_compatible_partner(my_setting)
+            # 3. 내 버킷 락 획득 (다른 버킷의 매칭은 막지 않음)
+            lock = FencedLock(
+                get_redis(),
+                bucket_lock_key(bucket_for_setting(my_setting) or f"user:{self.user_id}"),
+                ttl=self.LOCK_TTL,
+                wait_timeout=MATCH_LOCK_WAIT_TIMEOUT,
+            )
+            with metrics.time(stage='lock'):
+                acquired = await lock.acquire()
+            if not acquired:
+                return ("matching_in_progress", None)
+
+            # 4. 적합한 상대를 찾아 선점 (다른 워커에게 졌으면 다음 후보로)
+            try:
+                partner, claim = await self._claim_compatible_partner(my_setting, metrics)
+            finally:
+                await lock.release()
+
             if not partner:
                 return ("no_match", None)
 
-            # 4. 상대를 찾았으니 보석 차감
-            preferred_gender = my_setting.get("preferred_gender", "any").lower()
-            deduct_amount = GEM_COST_BY_GENDER.get(preferred_gender, 0)
-
-            try:
-                # spend_gems는 async-safe + atomic 처리 포함
-                await spend_gems(user=self.user, amount=deduct_amount, note="Matching cost")
-            except ValueError:
+            # 5. 상대를 선점했으니 보석 차감 (실패하면 선점 해제)
+            if not await self._charge_matching_cost(my_setting, partner, claim, metrics):
                 return ("not_enough_gems", None)
 
-            # 5. 매치 생성
-            match_id = await self._create_match(partner)
-            if not match_id:
-                return ("match_creation_failed", None)
-
-            # 6. 양쪽 큐에서 제거
-            await self.remove_from_queue()
-            partner_service = MatchService(partner)
-            await partner_service.remove_from_queue()
-
             logger.info(f"Match created: {self.user_id} <-> {partner.id}")
             return ("match_created", partner)
 
         except Exception as e:
             logger.error(f"Error in atomic matching: {e}")
             return ("error", None)
-        finally:
-            cache.delete(self.global_match_lock)
 
+    def _matching_cost(self, my_setting: Dict[str, Any]) -> int:
+        preferred_gender = my_setting.get("preferred_gender", "any").lower()
+        return GEM_COST_BY_GENDER.get(preferred_gender, 0)
 
+    async def can_afford_matching(self, my_setting: Optional[Dict[str, Any]] = None) -> bool:
+        """선호 성별에 따른 매칭 비용을 낼 수 있는지 (캐시된 잔액으로 확인)"""
+        my_setting = my_setting or await self.get_my_setting()
+        if not my_setting:
+            return True
+        cost = self._matching_cost(my_setting)
+        if not cost:
+            return True
+        try:
+            return await get_available_gems(self.user_id) >= cost
+        except Exception as e:
+            # 확인 실패 시에는 홀드 단계에서 다시 검사하므로 통과
+            logger.error(f"Error checking gem balance for user {self.user_id}: {e}")
+            return True
+
+    async def _charge_matching_cost(self, my_setting: Dict[str, Any], partner: User, claim: Dict[str, Any],
+                                    metrics: Optional[MetricsBatch] = None) -> bool:
+        """
+        선점한 매치의 보석 홀드 (잔액 부족이면 선점을 해제하고 False)
+        요청자(self)가 낸다 - 배치 매처도 나중에 큐에 들어온 쪽을 요청자로 호출한다.
+        DB 차감은 양쪽이 모두 수락했을 때 _capture_match_cost에서 한다.
+        """
+        deduct_amount = self._matching_cost(my_setting)
+        match_id = claim['match_id']
+        # match_id는 같은 두 사람이면 매번 같으므로 선점 시각을 붙여 매치마다 다른 홀드로 만든다
+        # (HOLD_GEMS_LUA는 같은 hold_id면 그대로 성공 처리 - 남은 예전 홀드가 새 차감을 대신하면 안 됨)
+        hold_id = f"match:{match_id}:{claim['created_at']}"
+
+        with (metrics or MetricsBatch()).time(stage='hold_gems'):
+            held = await hold_gems(self.user, deduct_amount, hold_id)
+        if not held:
+            await self._release_match(partner, claim)
+            return False
+
+        redis_client = get_redis()
+        if deduct_amount:
+            # 수락/거절/만료 시 누구의 홀드를 확정/해제할지 매치 기록에 남김
+            await redis_client.hset(
+                self.match_requests_key + ":" + match_id,
+                mapping={'hold_user': self.user_id, 'hold_id': hold_id, 'hold_amount': deduct_amount},
+            )
+        await emit_event(
+            redis_client, events.PROPOSED, match_id=match_id, created_at=claim['created_at'],
+            user1=self.user_id, user2=partner.id,
+        )
+        return True
+
+    async def _capture_match_cost(self, match_id: str, match_data: Dict[str, Any], other_user: User) -> bool:
+        """양쪽 수락 시 홀드 확정 (DB 차감 + 거래 기록) - 잔액 부족이면 False"""
+        hold_user = match_data.get('hold_user')
+        if not hold_user:
+            return True
+        payer = self.user if hold_user == self.user_id else other_user
+        try:
+            await capture_gems(payer, int(match_data.get('hold_amount') or 0), match_data['hold_id'], note="Matching cost")
+            return True
+        except ValueError:
+            logger.warning(f"Could not capture matching cost for user {hold_user} (match {match_id})")
+            return False
 
+    async def _claim_compatible_partner(self, my_setting: Dict[str, Any], metrics: MetricsBatch) -> Tuple[Optional[User], Optional[Dict[str, Any]]]:
+        """호환 가능한 상대를 찾아 선점 (경쟁에서 지면 다음 후보로)"""
+        started = time.monotonic()
+        claim_seconds = 0.0
+        partner, claim = None, None
+        attempts = 0
+        async for candidate in self._iter_compatible_partners(my_setting):
+            claim_started = time.monotonic()
+            claim = await self._create_match(candidate, metrics)
+            claim_seconds += time.monotonic() - claim_started
+            if claim:
+                partner = candidate
+                break
+            attempts += 1
+            if attempts >= MATCH_CLAIM_ATTEMPTS:
+                break
+
+        # 후보 조회(scan)와 선점(claim - 큐/버킷 제거 포함)을 나눠서 기록
+        metrics.observe('match_stage_seconds', time.monotonic() - started - claim_seconds, stage='scan')
+        if attempts or partner:
+            metrics.observe('match_stage_seconds', claim_seconds, stage='claim')
+        return partner, claim
 
     async def _find_compatible_partner(self, my_setting: Dict[str, Any]) -> Optional[User]:
-        """호환 가능한 파트너 찾기"""
+        """호환 가능한 파트너 찾기 (첫 번째 후보)"""
+        async for partner in self._iter_compatible_partners(my_setting):
+            return partner
+        return None
+
+    async def _iter_compatible_partners(self, my_setting: Dict[str, Any]):
+        """호환 가능한 파트너를 오래 기다린 순으로 하나씩 반환 (호환 가능한 버킷만 조회)"""
         try:
-            redis_client = cache.client.get_client()
-            queue_users = redis_client.zrange(self.queue_key, 0, -1)
-            
-            for user_id_bytes in queue_users:
-                other_user_id = user_id_bytes.decode('utf-8')
+            redis_client = get_redis()
+            excluded = await aget_excluded(redis_client, self.user_id)  # 최근 매칭/거절한 상대
+            queue_users = [
+                user_id for user_id in await self._scan_candidate_buckets(redis_client, my_setting)
+                if user_id != self.user_id and user_id not in excluded  # 자신, 제외 목록 제외
+            ]
+            # 후보를 페이지 단위로 나눠 상태를 일괄 조회 (앞쪽에서 찾으면 뒤 페이지는 읽지 않음)
+            for start in range(0, len(queue_users), MATCH_STATE_PAGE_SIZE):
+                page = queue_users[start:start + MATCH_STATE_PAGE_SIZE]
+                states = await afetch_user_states(redis_client, page, with_profiles=True)
                 
-                # 자신 제외
-                if other_user_id == self.user_id:
-                    continue
-                
-                # 온라인 상태 확인
-                if not await self.is_user_online(other_user_id):
-                    # 오프라인 사용자는 큐에서 제거
-                    redis_client.zrem(self.queue_key, other_user_id)
-                    continue
-                
-                # 이미 매칭 중인지 확인
-                if cache.get(f"user_matches:{str(other_user_id)}"):
-                    continue
-                
-                # 사용자 정보 조회
-                try:
-                    other_user = await database_sync_to_async(User.objects.get)(id=int(other_user_id))
-                except User.DoesNotExist:
-                    redis_client.zrem(self.queue_key, other_user_id)
-                    continue
-                
-                # 상대방 설정 조회
-                try:
-                    def _fetch_other_setting():
-                        return MatchSetting.objects.select_related('user').get(user=other_user)
-                    other_setting_obj = await database_sync_to_async(_fetch_other_setting)()
-                except MatchSetting.DoesNotExist:
-                    continue
-                
-                other_setting = {
-                    'age_min': other_setting_obj.age_min,
-                    'age_max': other_setting_obj.age_max,
-                    'preferred_gender': other_setting_obj.preferred_gender,
-                    'user_age': other_setting_obj.user.age,
-                    'user_gender': other_setting_obj.user.gender
-                }
-                
-                # 호환성 확인
-                if self._is_compatible(my_setting, other_setting):
-                    return other_user
+                # 오프라인/존재하지 않는 사용자는 건너뛰기만 한다 (큐 정리는 match/sweeper.py 담당)
+                for other_user_id in page:
+                    state = states[other_user_id]
+                    if not state['online'] or not state['profile']:
+                        continue
+                    
+                    # 이미 매칭 중인지 확인
+                    if state['match_id']:
+                        continue
+                    
+                    profile = state['profile']
+                    other_setting = profile_to_setting(profile)
+                    if not other_setting:
+                        continue
+                    
+                    # 호환성 확인
+                    if self._is_compatible(my_setting, other_setting):
+                        yield profile_user(profile)
                     
-            return None
         except Exception as e:
             logger.error(f"Error finding compatible partner: {e}")
-            return None
 
-    def _is_compatible(self, my_setting: Dict[str, Any], other_setting: Dict[str, Any]) -> bool:
-        """매칭 호환성 확인"""
-        try:
-            # 필수 정보 확인
-            for key in ('user_age', 'user_gender', 'age_min', 'age_max', 'preferred_gender'):
-                if my_setting.get(key) is None or other_setting.get(key) is None:
-                    return False
+    async def _scan_candidate_buckets(self, redis_client, my_setting: Dict[str, Any]) -> List[str]:
+        """호환 가능한 버킷들의 대기자를 한 번의 파이프라인으로 모아 오래 기다린 순으로 반환"""
+        bucket_keys = candidate_bucket_keys(my_setting)
+        if not bucket_keys:
+            return []
 
-            # 나이 범위 확인
-            if not (my_setting['age_min'] <= other_setting['user_age'] <= my_setting['age_max']):
-                return False
-            if not (other_setting['age_min'] <= my_setting['user_age'] <= other_setting['age_max']):
-                return False
+        pipe = redis_client.pipeline(transaction=False)
+        for key in bucket_keys:
+            pipe.zrange(key, 0, MATCH_BUCKET_SCAN_LIMIT - 1, withscores=True)
 
-            # 성별 선호도 확인
-            if (my_setting['preferred_gender'] != 'any' and 
-                other_setting['user_gender'] != my_setting['preferred_gender']):
-                return False
-            if (other_setting['preferred_gender'] != 'any' and 
-                my_setting['user_gender'] != other_setting['preferred_gender']):
-                return False
+        scores = {}
+        for members in await pipe.execute():
+            for user_id_bytes, score in members:
+                scores[user_id_bytes.decode('utf-8')] = score
 
-            return True
-        except Exception as e:
-            logger.error(f"Error checking compatibility: {e}")
-            return False
+        return sorted(scores, key=scores.get)
 
-    async def _create_match(self, partner: User) -> Optional[str]:
-        """매치 생성"""
+    def _is_compatible(self, my_setting: Dict[str, Any], other_setting: Dict[str, Any]) -> bool:
+        """매칭 호환성 확인"""
+        return is_compatible(my_setting, other_setting)
+
+    def _pair_keys(self, partner_id: str, match_id: str) -> List[str]:
+        """CLAIM/RELEASE 스크립트 공통 KEYS"""
+        return [
+            self.queue_key,
+            f"user_matches:{self.user_id}",
+            f"user_matches:{partner_id}",
+            self.match_requests_key + ":" + match_id,
+            user_bucket_key(self.user_id),
+            user_bucket_key(partner_id),
+            PENDING_KEY,
+        ]
+
+    async def _create_match(self, partner: User, metrics: Optional[MetricsBatch] = None) -> Optional[Dict[str, Any]]:
+        """매치 생성 - 두 사용자를 Lua 스크립트로 원자적으로 선점 (경쟁에서 지면 None)"""
+        batch = metrics or MetricsBatch()
         try:
-            match_id = f"{min(self.user_id, str(partner.id))}:{max(self.user_id, str(partner.id))}"
+            partner_id = str(partner.id)
+            match_id = f"{min(self.user_id, partner_id)}:{max(self.user_id, partner_id)}"
             logger.info(f"Creating match with match_id: {match_id} for users {self.user_id} and {partner.id}")
             
             match_data = {
                 'match_id': str(match_id),
                 'user1': str(self.user_id),
-                'user2': str(partner.id),
+                'user2': partner_id,
                 'user1_name': self.user.username,
                 'user2_name': partner.username,
                 'status': 'pending',
@@ -283,47 +451,89 @@ class MatchService:
                 'user2_response': None
             }
             
-            # Django 캐시 인터페이스 사용 (timeout 파라미터 사용)
-            cache.set(self.match_requests_key + ":" + match_id, json.dumps(match_data), timeout=self.MATCH_TTL)
-            
-            # 각 유저에게 매치 ID 할당 (timeout 사용)
-            cache.set(f"user_matches:{str(self.user_id)}", str(match_id), timeout=self.MATCH_TTL)
-            cache.set(f"user_matches:{str(partner.id)}", str(match_id), timeout=self.MATCH_TTL)
-            
+            # 큐 확인 + 큐/버킷 제거 + 매치 기록을 한 번에 처리
+            redis_client = get_redis()
+            claim_pair = load_script(redis_client, CLAIM_PAIR_LUA)
+            claimed = await claim_pair(
+                keys=self._pair_keys(partner_id, match_id),
+                args=[self.user_id, partner_id, match_id, self.MATCH_TTL, MATCH_RESPONSE_TIMEOUT,
+                      *encode_match(match_data)],
+                client=redis_client,
+            )
+            if not claimed:
+                logger.info(f"Lost match claim race for {self.user_id} <-> {partner_id}")
+                batch.inc('match_claims_total', result='lost')
+                return None
+
+            score_a, score_b, bucket_a, bucket_b = claimed
+            batch.inc('match_claims_total', result='won')
+            now = time.time()
+            for score in (score_a, score_b):
+                batch.observe('match_time_in_queue_seconds', now - float(score))
             logger.info(f"Match created successfully: {match_id}")
-            return str(match_id)
+            return {
+                'match_id': str(match_id),
+                'created_at': match_data['created_at'],
+                'scores': [score_a, score_b],
+                'buckets': [bucket_a, bucket_b],
+            }
             
         except Exception as e:
             logger.error(f"Error creating match: {e}", exc_info=True)
             return None
+        finally:
+            if metrics is None:
+                await batch.flush()
+
+    async def _release_match(self, partner: User, claim: Dict[str, Any]):
+        """_create_match로 선점한 매치를 취소하고 두 사용자를 원래 대기 순서로 복구"""
+        try:
+            partner_id = str(partner.id)
+            match_id = claim['match_id']
+            redis_client = get_redis()
+            release_pair = load_script(redis_client, RELEASE_PAIR_LUA)
+            await release_pair(
+                keys=self._pair_keys(partner_id, match_id),
+                args=[self.user_id, partner_id, match_id, *claim['scores'], *claim['buckets']],
+                client=redis_client,
+            )
+            # 두 사람 설정을 모두 알 때만 호환되는 대기자로 좁힘 (하나라도 모르면 버킷만 보고 깨움)
+            settings = [await self.get_my_setting(), profile_to_setting(await aget_profile(partner_id))]
+            await publish_queue_change(redis_client, claim['buckets'], settings if all(settings) else ())
+            logger.info(f"Released match claim: {match_id}")
+        except Exception as e:
+            logger.error(f"Error releasing match claim {claim}: {e}")
+
+    async def _get_match_id(self, redis_client, user_id: str) -> Optional[str]:
+        """유저의 현재 매치 ID"""
+        match_id = await redis_client.get(f"user_matches:{user_id}")
+        return match_id.decode('utf-8') if match_id else None
+
+    async def _get_match_data(self, redis_client, match_id: str) -> Optional[Dict[str, Any]]:
+        """매치 데이터 (해시 match_requests:{match_id}, 없으면 None)"""
+        raw = await redis_client.hgetall(self.match_requests_key + ":" + match_id)
+        return decode_match(raw) if raw else None
 
     async def get_current_match_requests(self) -> List[Dict]:
         logger.info(f"User {self.user_id} get_current_match_requests called")
         try:
-            match_id = cache.get(f"user_matches:{str(self.user_id)}")
+            redis_client = get_redis()
+            match_id = await self._get_match_id(redis_client, self.user_id)
             logger.info(f"User {self.user_id} cache user_matches: {match_id}")
             
             if not match_id:
                 return []
             
-            # 매치 생성과 동일한 방식으로 데이터 조회 (Django 캐시 사용)
+            # 매치 생성 스크립트가 기록한 데이터 조회
             match_data_key = self.match_requests_key + ":" + match_id
-            match_data_str = cache.get(match_data_key)
-            logger.info(f"User {self.user_id} cache match_data key: {match_data_key}, data: {match_data_str}")
+            match_data = await self._get_match_data(redis_client, match_id)
+            logger.info(f"User {self.user_id} cache match_data key: {match_data_key}, data: {match_data}")
             
-            if not match_data_str:
+            if not match_data:
                 # 매치 데이터가 없으면 user_matches도 정리
-                cache.delete(f"user_matches:{str(self.user_id)}")
+                await redis_client.delete(f"user_matches:{self.user_id}")
                 logger.warning(f"Match data not found for key: {match_data_key}, cleaned up user_matches")
                 return []
-            
-            # JSON 파싱
-            try:
-                match_data = json.loads(match_data_str)
-            except json.JSONDecodeError as e:
-                logger.error(f"JSON decode error for match_id {match_id}: {e}")
-                cache.delete(f"user_matches:{str(self.user_id)}")
-                return []
                 
             logger.info(f"User {self.user_id} match_data decoded: {match_data}")
 
@@ -361,34 +571,36 @@ class MatchService:
     async def _has_active_match(self) -> bool:
         """활성 매치가 있는지 확인"""
         try:
-            match_id = cache.get(f"user_matches:{str(self.user_id)}")
-            return match_id is not None
+            return bool(await get_redis().exists(self.user_matches_key))
         except Exception:
             return False
 
     async def _cleanup_match(self, match_id: str, user1_id: str = None, user2_id: str = None):
-        """매치 정리 - Django 캐시 버전"""
+        """매치 정리"""
         try:
-            # 사용자 ID가 제공되지 않은 경우 매치 데이터에서 추출
-            if not user1_id or not user2_id:
-                match_data_key = self.match_requests_key + ":" + match_id
-                match_data_str = cache.get(match_data_key)
-                if match_data_str:
-                    try:
-                        match_data = json.loads(match_data_str)
-                        user1_id = match_data['user1']
-                        user2_id = match_data['user2']
-                    except json.JSONDecodeError:
-                        logger.error(f"Failed to parse match data for cleanup: {match_id}")
+            redis_client = get_redis()
+
+            # 사용자 ID가 제공되지 않은 경우 매치 데이터에서 추출 (홀드 해제 대상도 함께)
+            user1, user2, hold_user, hold_id = await redis_client.hmget(
+                self.match_requests_key + ":" + match_id, 'user1', 'user2', 'hold_user', 'hold_id'
+            )
+            user1_id = user1_id or (user1.decode('utf-8') if user1 else None)
+            user2_id = user2_id or (user2.decode('utf-8') if user2 else None)
             
             # 정리
-            match_data_key = self.match_requests_key + ":" + match_id
-            cache.delete(match_data_key)
-            
+            keys = [self.match_requests_key + ":" + match_id]
             if user1_id:
-                cache.delete(f"user_matches:{user1_id}")
+                keys.append(f"user_matches:{user1_id}")
             if user2_id:
-                cache.delete(f"user_matches:{user2_id}")
+                keys.append(f"user_matches:{user2_id}")
+            pipe = redis_client.pipeline()
+            pipe.delete(*keys)
+            pipe.zrem(PENDING_KEY, match_id)
+            await pipe.execute()
+
+            # 확정되지 않은 매칭 비용 홀드 반환 (이미 확정됐으면 아무 일도 없음)
+            if hold_user and hold_id:
+                await release_gems(hold_user.decode('utf-8'), hold_id.decode('utf-8'))
                 
             logger.info(f"Cleaned up match: {match_id} (users: {user1_id}, {user2_id})")
             
@@ -405,15 +617,20 @@ class MatchService:
                     ).first()
                     
                     if existing_room:
-                        return existing_room
+                        return existing_room, False
                     
                     room = MatchedRoom.objects.create(
                         user1=min(user1, user2, key=lambda u: u.id),
                         user2=max(user1, user2, key=lambda u: u.id)
                     )
-                    return room
+                    return room, True
                     
-            return await database_sync_to_async(create_room)()
+            started = time.monotonic()
+            room, created = await database_sync_to_async(create_room)()
+            await observe_metric('match_room_create_seconds', time.monotonic() - started)
+            if created:
+                await add_active_rooms(get_redis(), 1)
+            return room
         except Exception as e:
             logger.error(f"Error creating matched room: {e}")
             return None
@@ -422,60 +639,37 @@ class MatchService:
     # 연결 해제 처리 (기존 메서드명 유지)
     # ---------------------------
     async def handle_disconnect_cleanup(self) -> List[int]:
-        """연결 해제 시 정리"""
+        """
+        연결 해제 시 정리
+        Redis 상태(온라인/큐/버킷/진행 중 매치)는 DISCONNECT_USER_LUA 한 번으로 지우고,
+        방 삭제는 쿼리 한 번, 상대 재등록은 상태 조회/등록 파이프라인 한 번씩으로 처리한다.
+        """
         affected_users = []
         try:
-            # 온라인 상태 해제
-            cache.delete(self.user_online_key)
-            
-            # 큐에서 제거
-            await self.remove_from_queue()
-            
-            # 활성 매치 처리
-            match_id = cache.get(f"user_matches:{str(self.user_id)}")
-            if match_id:
-                # Django 캐시에서 매치 데이터 조회 (새로운 구조에 맞게)
-                match_data_key = self.match_requests_key + ":" + match_id
-                match_data_str = cache.get(match_data_key)
-                
-                if match_data_str:
-                    try:
-                        match_data = json.loads(match_data_str)
-                        user_id_str = str(self.user_id)
-                        other_user_id = match_data['user2'] if match_data['user1'] == user_id_str else match_data['user1']
-                        
-                        # 상대방을 다시 큐에 추가
-                        if await self.is_user_online(other_user_id):
-                            try:
-                                other_user = await database_sync_to_async(User.objects.get)(id=int(other_user_id))
-                                other_service = MatchService(other_user)
-                                await other_service.add_to_queue()
-                                affected_users.append(int(other_user_id))
-                                logger.info(f"Re-added user {other_user_id} to queue after partner disconnect")
-                            except User.DoesNotExist:
-                                logger.warning(f"Other user {other_user_id} not found during cleanup")
-                                pass
-                        
-                        # 매치 정리
-                        await self._cleanup_match(match_id, match_data['user1'], match_data['user2'])
-                        
-                    except json.JSONDecodeError as e:
-                        logger.error(f"Failed to parse match data during disconnect cleanup: {e}")
-                        # JSON 파싱 실패해도 기본 정리는 수행
-                        await self._cleanup_match(match_id)
-            
+            redis_client = get_redis()
+            partner_id, hold_user, hold_id, match_id, created_at = [
+                value.decode('utf-8') if isinstance(value, bytes) else value
+                for value in await load_script(redis_client, DISCONNECT_USER_LUA)(
+                    keys=[presence.PRESENCE_KEY, self.queue_key, user_bucket_key(self.user_id),
+                          self.user_matches_key, PENDING_KEY],
+                    args=[self.user_id, self.match_requests_key + ":"], client=redis_client,
+                )
+            ]
+
+            # 확정되지 않은 매칭 비용 홀드 반환
+            if hold_user and hold_id:
+                await release_gems(hold_user, hold_id)
+            if partner_id:
+                match_data = {'match_id': match_id, 'created_at': created_at, 'user1': self.user_id, 'user2': partner_id}
+                await emit_event(redis_client, events.CANCELLED, reason='disconnected', **events.match_fields(match_data))
+
             # 매칭된 방들 정리
-            room_partners = await self.get_matched_rooms_and_delete()
-            for partner_id in room_partners:
-                if await self.is_user_online(partner_id):
-                    try:
-                        partner_user = await database_sync_to_async(User.objects.get)(id=partner_id)
-                        partner_service = MatchService(partner_user)
-                        await partner_service.add_to_queue()
-                        affected_users.append(partner_id)
-                        logger.info(f"Re-added matched room partner {partner_id} to queue after disconnect")
-                    except User.DoesNotExist:
-                        logger.warning(f"Partner user {partner_id} not found during cleanup")
+            partner_ids = await self.get_matched_rooms_and_delete()
+            if partner_id:
+                partner_ids.append(int(partner_id))
+
+            # 온라인 상태인 상대는 다시 큐에 추가
+            affected_users = await self._requeue_partners(redis_client, set(partner_ids))
 
             affected_users.append(self.user.id)
             logger.info(f"Disconnect cleanup completed for user {self.user_id}, affected users: {affected_users}")
@@ -485,27 +679,46 @@ class MatchService:
             logger.error(f"Error in disconnect cleanup for user {self.user_id}: {e}", exc_info=True)
             return []
 
+    async def _requeue_partners(self, redis_client, partner_ids) -> List[int]:
+        """
+        온라인 상태인 상대 ID 반환 (매치 취소 알림 대상)
+        그중 다른 매치가 없는 사용자는 한 번에 다시 큐에 추가 (상태/프로필은 파이프라인 한 번으로 조회)
+        """
+        return await self.requeue_users(
+            redis_client, [partner_id for partner_id in partner_ids if str(partner_id) != self.user_id]
+        )
+
+    async def requeue_users(self, redis_client, user_ids) -> List[int]:
+        """온라인이고 다른 매치가 없는 사용자들을 한 번에 큐에 추가 - 온라인 사용자 ID 반환"""
+        partner_ids = [str(user_id) for user_id in user_ids]
+        if not partner_ids:
+            return []
+        states = await afetch_user_states(redis_client, partner_ids, with_profiles=True)
+        online_ids = [partner_id for partner_id, state in states.items() if state['online']]
+        now = time.time()
+        await self._enqueue_users(redis_client, [
+            (partner_id, profile_to_setting(states[partner_id]['profile']), now)
+            for partner_id in online_ids
+            if not states[partner_id]['match_id']
+        ])
+        return [int(partner_id) for partner_id in online_ids]
+
     async def get_matched_rooms_and_delete(self) -> List[int]:
         """매칭된 방들 조회 및 삭제"""
         try:
             def get_and_delete_rooms():
                 with transaction.atomic():
                     rooms = MatchedRoom.objects.select_for_update().filter(
-                        Q(user1=self.user) | Q(user2=self.user)
-                    ).select_related('user1', 'user2')
-
-                    partners = []
-                    room_ids = []
-                    for room in rooms:
-                        partner = room.user2 if room.user1 == self.user else room.user1
-                        partners.append(partner.id)
-                        room_ids.append(room.id)
-
-                    if room_ids:
-                        MatchedRoom.objects.filter(id__in=room_ids).delete()
-                    return partners
+                        Q(user1_id=self.user.id) | Q(user2_id=self.user.id)
+                    )
+                    pairs = list(rooms.values_list('id', 'user1_id', 'user2_id'))
+                    if pairs:
+                        MatchedRoom.objects.filter(id__in=[room_id for room_id, _, _ in pairs]).delete()
+                    return [user2_id if user1_id == self.user.id else user1_id for _, user1_id, user2_id in pairs]
                     
-            return await database_sync_to_async(get_and_delete_rooms)()
+            partners = await database_sync_to_async(get_and_delete_rooms)()
+            await add_active_rooms(get_redis(), -len(partners))
+            return partners
         except Exception as e:
             logger.error(f"Error in get_matched_rooms_and_delete: {e}")
             return []
@@ -514,60 +727,67 @@ class MatchService:
     # 모니터링 및 정리 (수정된 부분들)
     # ---------------------------
     async def get_queue_status(self) -> Dict[str, Any]:
-        """큐 상태 조회"""
+        """큐 상태 조회 (집계 값만 읽음 - 사용자별 목록은 get_queue_users)"""
         try:
-            redis_client = cache.client.get_client()
-            queue_count = redis_client.zcard(self.queue_key)
-            
-            # 매치 수 계산 (Django 캐시 구조에 맞게 수정)
-            # Hash 구조가 아니므로 직접 계산하기 어려움 - 큐 사용자 기반으로 추정
-            active_matches = 0
-            
-            queue_users = []
-            user_ids = redis_client.zrange(self.queue_key, 0, -1)
-            for user_id_bytes in user_ids:
-                user_id = user_id_bytes.decode('utf-8')
-                online_status = await self.is_user_online(user_id)
-                # 수정: 각 사용자의 매치 상태 확인 (기존 버그 수정)
-                has_match = bool(cache.get(f"user_matches:{user_id}"))
-                if has_match:
-                    active_matches += 1
-                    
-                queue_users.append({
-                    'user_id': user_id,
-                    'online': online_status,
-                    'has_match': has_match
-                })
-            
-            # 매치는 2명씩이므로 2로 나누기 (중복 카운트 보정)
-            estimated_matches = active_matches // 2
+            redis_client = get_redis()
+            counters = await read_counters(redis_client)
+            pending_matches = counters['pending_matches']
             
             return {
-                'queue_count': queue_count,
-                'estimated_match_count': estimated_matches,
-                'active_match_users': active_matches,
-                'queue_users': queue_users
+                'queue_count': counters['queue_count'],
+                'bucket_depths': counters['bucket_depths'],
+                'estimated_match_count': pending_matches,
+                'active_match_users': pending_matches * 2,
+                'active_rooms': counters['active_rooms'],
+                'lock_stats': await get_lock_stats(redis_client),
             }
         except Exception as e:
             logger.error(f"Error getting queue status: {e}")
             return {}
 
-    async def cleanup_offline_users_from_queue(self) -> int:
-        """오프라인 사용자들 정리"""
+    async def get_queue_users(self, offset: int = 0, limit: int = MATCH_STATE_PAGE_SIZE) -> Dict[str, Any]:
+        """대기열 사용자 목록 (관리자용, 오래 기다린 순으로 offset부터 limit명)"""
         try:
-            redis_client = cache.client.get_client()
-            queue_users = redis_client.zrange(self.queue_key, 0, -1)
-            cleaned_count = 0
+            redis_client = get_redis()
+            members = await redis_client.zrange(QUEUE_KEY, offset, offset + limit - 1, withscores=True)
+            user_ids = [user_id_bytes.decode('utf-8') for user_id_bytes, _ in members]
+            states = await afetch_user_states(redis_client, user_ids)
             
-            for user_id_bytes in queue_users:
-                user_id = user_id_bytes.decode('utf-8')
-                if not await self.is_user_online(user_id):
-                    redis_client.zrem(self.queue_key, user_id)
-                    cache.delete(f"user_matches:{user_id}")
-                    cleaned_count += 1
-                    logger.info(f"Cleaned offline user {user_id} from queue")
-            
-            return cleaned_count
+            return {
+                'total': await redis_client.zcard(QUEUE_KEY),
+                'offset': offset,
+                'limit': limit,
+                'users': [
+                    {
+                        'user_id': user_id,
+                        'queued_at': score,
+                        'online': states[user_id]['online'],
+                        'has_match': states[user_id]['match_id'] is not None,
+                    }
+                    for user_id, (_, score) in zip(user_ids, members)
+                ],
+            }
+        except Exception as e:
+            logger.error(f"Error getting queue users: {e}")
+            return {}
+
+    async def iter_queue_snapshot(self, page_size: int = MATCH_STATE_PAGE_SIZE, after: Optional[float] = None):
+        """대기열 전체 스냅샷 (관리자용) - 페이지 단위로 읽고 상태를 일괄 조회해 사용자별로 반환"""
+        redis_client = get_redis()
+        async for page in aiter_queue_pages(redis_client, page_size, after):
+            states = await afetch_user_states(redis_client, [user_id for user_id, _ in page])
+            for user_id, score in page:
+                yield {
+                    'user_id': user_id,
+                    'queued_at': score,
+                    'online': states[user_id]['online'],
+                    'match_id': states[user_id]['match_id'],
+                }
+
+    async def cleanup_offline_users_from_queue(self) -> int:
+        """오프라인 사용자들 정리 (주기 정리는 python manage.py run_sweeper)"""
+        try:
+            return await sweep_stale_users(get_redis(), get_channel_layer())
         except Exception as e:
             logger.error(f"Error cleaning offline users: {e}")
             return 0
@@ -575,11 +795,10 @@ class MatchService:
     async def get_user_status(self) -> Dict[str, Any]:
         """사용자 상태 조회"""
         try:
-            redis_client = cache.client.get_client()
             return {
                 'user_id': self.user_id,
                 'online': await self.is_user_online(),
-                'in_queue': redis_client.zscore(self.queue_key, self.user_id) is not None,
+                'in_queue': await get_redis().zscore(self.queue_key, self.user_id) is not None,
                 'has_active_match': await self._has_active_match(),
                 'timestamp': time.time()
             }
@@ -597,58 +816,69 @@ class MatchService:
             logger.info(f"Received response: {response} (type: {type(response)}) from user {self.user_id}")
             match_id = match_data['match_id']
             
-            # Django 캐시에서 현재 매치 데이터 조회 (새로운 구조에 맞게)
-            match_data_key = self.match_requests_key + ":" + match_id
-            current_match_str = cache.get(match_data_key)
-            if not current_match_str:
-                cache.delete(f"user_matches:{str(self.user_id)}")
+            # 응답 기록 + 상태 전이를 스크립트 한 번으로 처리 (양쪽 동시 응답에도 덮어쓰기 없음)
+            redis_client = get_redis()
+            respond = load_script(redis_client, RESPOND_MATCH_LUA)
+            result = await respond(
+                keys=[self.match_requests_key + ":" + match_id],
+                args=[self.user_id, response, time.time()],
+                client=redis_client,
+            )
+            outcome = result[0].decode('utf-8')
+            if outcome == 'expired':
+                await redis_client.delete(self.user_matches_key)
                 return ("match_expired", None)
-            
-            try:
-                current_match = json.loads(current_match_str)
-            except json.JSONDecodeError as e:
-                logger.error(f"JSON decode error for match {match_id}: {e}")
-                await self._cleanup_match(match_id)
+            if outcome == 'not_participant':
+                await redis_client.delete(self.user_matches_key)
                 return ("invalid_match_data", None)
+            if outcome == 'closed':
+                return ("match_closed", None)
+            await inc_metric('match_responses_total', response=response)
+            current_match = decode_match(result[1:])
+            await emit_event(
+                redis_client, events.ACCEPTED if response == 'accept' else events.REJECTED,
+                user_id=self.user_id, **events.match_fields(current_match),
+            )
             
             # 상대방 정보 확인
             user_id_str = str(self.user_id)
             other_user_id = current_match['user2'] if current_match['user1'] == user_id_str else current_match['user1']
+
+            # 결과가 나온 쌍은 한동안 서로 다시 제안하지 않음
+            if outcome in ('both_accepted', 'rejected'):
+                await exclude_pair(redis_client, self.user_id, other_user_id)
             
             if not await self.is_user_online(other_user_id):
-                await self._cleanup_match(match_id)
+                await self._cleanup_match(match_id, current_match['user1'], current_match['user2'])
                 return ("partner_offline", None)
             
-            try:
-                other_user = await database_sync_to_async(User.objects.get)(id=int(other_user_id))
-            except User.DoesNotExist:
-                await self._cleanup_match(match_id)
+            other_profile = await aget_profile(other_user_id)
+            if not other_profile:
+                await self._cleanup_match(match_id, current_match['user1'], current_match['user2'])
                 return ("partner_not_found", None)
-            
-            # 응답 업데이트
-            response_key = 'user1_response' if current_match['user1'] == user_id_str else 'user2_response'
-            current_match[response_key] = response
-            current_match['updated_at'] = time.time()
-            
-            if response == 'accept':
-                # 양쪽 모두 수락했는지 확인
-                other_response_key = 'user2_response' if current_match['user1'] == user_id_str else 'user1_response'
-                
-                if current_match[other_response_key] == 'accept':
-                    # 둘 다 수락 -> 방 생성
-                    room = await self._create_matched_room_atomic(self.user, other_user)
-                    if room:
-                        await self._cleanup_match(match_id, current_match['user1'], current_match['user2'])
-                        logger.info(f"Room created successfully for users {self.user_id} and {other_user_id}")
-                        return ("success", other_user)
-                    else:
-                        logger.error(f"Room creation failed for users {self.user_id} and {other_user_id}")
-                        return ("room_creation_failed", None)
+            other_user = profile_user(other_profile)
+            
+            if outcome == 'both_accepted':
+                # 둘 다 수락 -> 매칭 비용 확정 -> 방 생성
+                if not await self._capture_match_cost(match_id, current_match, other_user):
+                    await emit_event(redis_client, events.CANCELLED, reason='not_enough_gems',
+                                     **events.match_fields(current_match))
+                    await self._cleanup_match(match_id, current_match['user1'], current_match['user2'])
+                    return ("not_enough_gems", None)
+                room = await self._create_matched_room_atomic(self.user, other_user)
+                if room:
+                    await emit_event(redis_client, events.ROOM_CREATED, room_id=room.id,
+                                     **events.match_fields(current_match))
+                    await self._cleanup_match(match_id, current_match['user1'], current_match['user2'])
+                    logger.info(f"Room created successfully for users {self.user_id} and {other_user_id}")
+                    return ("success", other_user)
                 else:
-                    # 내가 수락, 상대방 대기 중 - Django 캐시로 업데이트
-                    cache.set(match_data_key, json.dumps(current_match), timeout=self.MATCH_TTL)
-                    logger.info(f"User {self.user_id} accepted, waiting for partner {other_user_id}")
-                    return ("waiting_for_partner", None)
+                    logger.error(f"Room creation failed for users {self.user_id} and {other_user_id}")
+                    return ("room_creation_failed", None)
+            elif outcome == 'waiting':
+                # 내가 수락, 상대방 대기 중 (응답은 스크립트가 이미 기록)
+                logger.info(f"User {self.user_id} accepted, waiting for partner {other_user_id}")
+                return ("waiting_for_partner", None)
             else:
                 logger.info(f"User {self.user_id} rejected match with {other_user_id}")
                 # 거절 -> 매치 정리하고 다시 큐에 추가
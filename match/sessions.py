@@ -0,0 +1,179 @@
+# match/sessions.py
+"""
+재접속 유예 (Session resume)
+
+모바일 클라이언트는 네트워크가 잠깐 끊겼다가 다시 붙는 일이 잦다.
+연결이 끊기자마자 매치/방을 정리하고 상대를 다시 큐에 넣는 대신 MATCH_RECONNECT_GRACE_SECONDS 동안
+대기열 위치, 응답 대기 중 매치, 방을 그대로 두고 재접속을 기다린다.
+- match_resume:{user_id}  Hash: token(연결마다 새로 발급), room(끊길 때 있던 방)
+- match_grace             Sorted Set: 멤버=user_id, 스코어=유예 종료 시각
+ws/match/?resume=<token>으로 다시 연결하면 정리 없이 이어서 사용하고,
+유예가 끝날 때까지 돌아오지 않으면 정리 작업(run_sweeper)이 연결 해제 정리를 수행한다.
+
+세션 레지스트리 (중복 로그인)
+- match_session:{user_id}  Hash: channel(현재 연결의 channel_name), epoch(연결마다 1씩 증가, 삭제하지 않음)
+새 연결은 등록과 동시에 이전 연결의 channel_name을 받아 그 채널에만 force_disconnect를 보낸다.
+대체된 연결은 끊길 때 epoch가 달라 정리를 건너뛰므로, 새 연결이 기다릴 필요가 없다.
+"""
+import logging
+import secrets
+import time
+from typing import List, Optional, Tuple
+
+from django.contrib.auth import get_user_model
+
+from tori_backend.redis_client import load_script
+from tori_backend.settings.constants import MATCH_RECONNECT_GRACE_SECONDS
+
+from . import presence
+from .profiles import aget_profile, profile_user
+from .scripts import (
+    SESSION_DROP_LUA, SESSION_END_GRACE_LUA, SESSION_REGISTER_LUA, SESSION_RELEASE_LUA, SESSION_RESUME_LUA,
+)
+from .services import MatchService
+
+User = get_user_model()
+logger = logging.getLogger(__name__)
+
+RESUME_KEY_PREFIX = "match_resume"
+SESSION_KEY_PREFIX = "match_session"
+GRACE_KEY = presence.GRACE_KEY
+
+# release_session 결과
+SESSION_REPLACED = "replaced"  # 새 연결로 대체됨 - 정리하지 않음
+SESSION_GRACE = "grace"  # 재접속 유예 시작
+SESSION_ENDED = "ended"  # 바로 정리해야 함
+
+
+def resume_key(user_id) -> str:
+    return f"{RESUME_KEY_PREFIX}:{user_id}"
+
+
+def session_key(user_id) -> str:
+    return f"{SESSION_KEY_PREFIX}:{user_id}"
+
+
+def _decode(value) -> str:
+    return value.decode('utf-8') if isinstance(value, bytes) else (value or "")
+
+
+async def issue_token(redis_client, user_id, room: str = "") -> str:
+    """새 연결의 재개 토큰 발급 (이전 토큰은 무효)"""
+    token = secrets.token_urlsafe(16)
+    pipe = redis_client.pipeline()
+    pipe.delete(resume_key(user_id))
+    pipe.hset(resume_key(user_id), mapping={'token': token, 'room': room})
+    await pipe.execute()
+    return token
+
+
+async def register_session(redis_client, user_id, channel_name: str) -> Tuple[int, Optional[str]]:
+    """이 연결을 사용자의 현재 세션으로 등록 - (epoch, 대체된 연결의 channel_name 또는 None)"""
+    epoch, old_channel = await load_script(redis_client, SESSION_REGISTER_LUA)(
+        keys=[session_key(user_id)], args=[channel_name], client=redis_client,
+    )
+    old_channel = _decode(old_channel)
+    return int(epoch), (old_channel if old_channel and old_channel != channel_name else None)
+
+
+async def release_session(redis_client, user_id, epoch: int, token: str,
+                          room: Optional[str] = None, grace: bool = True) -> str:
+    """
+    연결 종료 시 세션 해제
+    - 이미 새 연결로 대체된 epoch면 SESSION_REPLACED (정리는 새 연결 몫)
+    - 유예가 허용되고 토큰이 아직 유효하면 SESSION_GRACE (유예 동안 온라인으로 보이도록 heartbeat도 갱신)
+    - 그 외 SESSION_ENDED
+    """
+    grace = grace and MATCH_RECONNECT_GRACE_SECONDS > 0 and bool(token)
+    now = time.time()
+    result = await load_script(redis_client, SESSION_RELEASE_LUA)(
+        keys=[session_key(user_id), resume_key(user_id), GRACE_KEY, presence.PRESENCE_KEY],
+        args=[str(user_id), epoch, token or "", now + MATCH_RECONNECT_GRACE_SECONDS,
+              MATCH_RECONNECT_GRACE_SECONDS * 2, now, room or "", 1 if grace else 0],
+        client=redis_client,
+    )
+    if result < 0:
+        return SESSION_REPLACED
+    return SESSION_GRACE if result else SESSION_ENDED
+
+
+async def resume(redis_client, user_id, token: str, takeover: bool = False) -> Optional[str]:
+    """
+    세션 재개 - 성공하면 끊길 때 있던 방 이름('' = 없음), 실패하면 None
+    takeover: 이전 연결이 아직 등록돼 있는 경우 (반쯤 끊긴 소켓) - 유예가 시작되지 않았어도 토큰만 맞으면 재개
+    """
+    if not token:
+        return None
+    result = await load_script(redis_client, SESSION_RESUME_LUA)(
+        keys=[resume_key(user_id), GRACE_KEY], args=[str(user_id), token, 1 if takeover else 0],
+        client=redis_client,
+    )
+    return _decode(result[0]) if result else None
+
+
+async def set_room(redis_client, user_id, room_name: str):
+    """현재 연결이 들어간 방 기록 (재개할 때 이전 연결의 방을 이어받도록)"""
+    await redis_client.hset(resume_key(user_id), 'room', room_name)
+
+
+async def end_grace(redis_client, user_id) -> Optional[str]:
+    """유예 종료 - 정리를 맡게 되면 방 이름('' = 없음), 이미 다른 쪽이 맡았으면 None"""
+    result = await load_script(redis_client, SESSION_END_GRACE_LUA)(
+        keys=[GRACE_KEY, resume_key(user_id)], args=[str(user_id)], client=redis_client,
+    )
+    return _decode(result[0]) if result else None
+
+
+async def drop_token(redis_client, user_id, token: str):
+    """연결 종료 시 재개 정보 삭제 (다른 연결의 토큰이면 유지)"""
+    if token:
+        await load_script(redis_client, SESSION_DROP_LUA)(
+            keys=[resume_key(user_id)], args=[token], client=redis_client,
+        )
+
+
+async def end_session(user, channel_layer, room_name: Optional[str] = None) -> List[int]:
+    """연결 해제 정리 후 상대/음성 채팅방에 알림 - 영향받은 사용자 ID 반환"""
+    affected_users = await MatchService(user).handle_disconnect_cleanup()
+    logger.info(f"User {user.id} disconnected, affected users: {affected_users}")
+
+    for user_id in affected_users:
+        if user_id != user.id:
+            await channel_layer.group_send(
+                f"user_{user_id}",
+                {
+                    "type": "match_cancelled",
+                    "from": user.username
+                }
+            )
+
+    if room_name:
+        await channel_layer.group_send(
+            f"voicechat_{room_name}",
+            {
+                "type": "force_disconnect",
+                "reason": "match_disconnected"
+            }
+        )
+    return affected_users
+
+
+async def end_user_session(user_id, channel_layer, room_name: Optional[str] = None) -> List[int]:
+    """연결 객체 없이 사용자 ID로 연결 해제 정리 (정리 작업용 - 프로필 캐시에서 사용자 복원)"""
+    profile = await aget_profile(user_id)
+    user = profile_user(profile) if profile else User(id=int(user_id), username="")
+    return await end_session(user, channel_layer, room_name)
+
+
+async def sweep_expired_sessions(redis_client, channel_layer, now: Optional[float] = None) -> int:
+    """유예가 끝난 세션 정리 (정리 작업에서 호출)"""
+    now = now if now is not None else time.time()
+    user_ids = [_decode(user_id) for user_id in await redis_client.zrangebyscore(GRACE_KEY, "-inf", now)]
+    ended = 0
+    for user_id in user_ids:
+        room_name = await end_grace(redis_client, user_id)
+        if room_name is None:
+            continue  # 그 사이 재접속했거나 다른 쪽이 정리
+        await end_user_session(user_id, channel_layer, room_name)
+        ended += 1
+    return ended
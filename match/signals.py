@@ -0,0 +1,27 @@
+# match/signals.py
+"""매칭 프로필 캐시 갱신/무효화 + 대기 중인 사용자 버킷 이동 시그널 (match/profiles.py)"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import MatchSetting
+from .profiles import invalidate_profile, rebucket_queued_user, refresh_profile
+
+
+@receiver(post_save, sender=MatchSetting)
+def refresh_profile_on_setting_save(sender, instance, **kwargs):
+    transaction.on_commit(lambda: refresh_profile(instance.user, instance))
+    transaction.on_commit(lambda: rebucket_queued_user(instance.user_id))
+
+
+@receiver(post_delete, sender=MatchSetting)
+def invalidate_profile_on_setting_delete(sender, instance, **kwargs):
+    transaction.on_commit(lambda: invalidate_profile(instance.user_id))
+    transaction.on_commit(lambda: rebucket_queued_user(instance.user_id))
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_profile_on_user_save(sender, instance, **kwargs):
+    transaction.on_commit(lambda: invalidate_profile(instance.id))
+    transaction.on_commit(lambda: rebucket_queued_user(instance.id))
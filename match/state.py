@@ -0,0 +1,118 @@
+# match/state.py
+"""
+큐 스캔용 사용자 상태 일괄 조회
+
+후보마다 온라인 여부 / user_matches를 따로 읽으면 사용자당 왕복 2번이 든다.
+여기서는 한 페이지의 사용자에 대해 온라인 여부, 현재 매치 ID, (선택) 매칭 프로필을
+파이프라인 한 번(ZMSCORE x2 + MGET + HGETALL)으로 가져온다.
+재접속 유예가 끝난 사용자는 정리 작업이 처리하기 전이라도 오프라인으로 본다.
+"""
+import time
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+from channels.db import database_sync_to_async
+
+from tori_backend.settings.constants import MATCH_STATE_PAGE_SIZE
+
+from .buckets import user_bucket_key
+from .presence import GRACE_KEY, PRESENCE_KEY, grace_expired, is_fresh, presence_cutoff
+from .profiles import decode_profile, load_profiles_from_db, profile_key
+
+QUEUE_KEY = "match_queue"
+
+
+def _queue_pipeline(redis_client, user_ids: List[str], with_profiles: bool):
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.zmscore(PRESENCE_KEY, user_ids)
+    pipe.zmscore(GRACE_KEY, user_ids)
+    pipe.mget([f"user_matches:{user_id}" for user_id in user_ids])
+    if with_profiles:
+        for user_id in user_ids:
+            pipe.hgetall(profile_key(user_id))
+    return pipe
+
+
+def _build_states(user_ids: List[str], results: list, with_profiles: bool) -> Dict[str, Dict[str, Any]]:
+    heartbeats, grace_deadlines, match_ids = results[0], results[1], results[2]
+    profiles = results[3:] if with_profiles else [None] * len(user_ids)
+    now = time.time()
+    cutoff = presence_cutoff(now)
+
+    states = {}
+    for user_id, heartbeat, grace_until, match_id, profile in zip(user_ids, heartbeats, grace_deadlines,
+                                                                   match_ids, profiles):
+        state = {
+            'online': is_fresh(heartbeat, cutoff) and not grace_expired(grace_until, now),
+            'match_id': match_id.decode('utf-8') if match_id else None,
+        }
+        if with_profiles:
+            state['profile'] = decode_profile(profile) if profile else None
+        states[user_id] = state
+    return states
+
+
+async def afetch_user_states(redis_client, user_ids: Iterable, with_profiles: bool = False) -> Dict[str, Dict[str, Any]]:
+    """
+    {user_id: {'online': bool, 'match_id': str|None, 'profile': dict|None}}
+    with_profiles=True에서 캐시에 없는 프로필은 DB에서 한 번에 채운다 (캐시 미스일 때만 DB 스레드로 이동).
+    """
+    user_ids = [str(user_id) for user_id in user_ids]
+    if not user_ids:
+        return {}
+    results = await _queue_pipeline(redis_client, user_ids, with_profiles).execute()
+    states = _build_states(user_ids, results, with_profiles)
+    if with_profiles:
+        missing = [user_id for user_id, state in states.items() if state['profile'] is None]
+        if missing:
+            loaded = await database_sync_to_async(load_profiles_from_db)(missing)
+            for user_id in missing:
+                states[user_id]['profile'] = loaded.get(user_id)
+    return states
+
+
+async def aiter_queue_pages(redis_client, page_size: int = MATCH_STATE_PAGE_SIZE,
+                            after: Optional[float] = None) -> AsyncIterator[List[Tuple[str, float]]]:
+    """
+    match_queue를 점수(대기 시작 시각) 커서로 나눠 [(user_id, score), ...] 페이지 단위로 반환
+    순위 구간과 달리 읽는 도중 사용자가 빠져도 건너뛰는 사용자가 없고,
+    페이지마다 ZRANGEBYSCORE LIMIT 한 번이라 큐가 커도 Redis를 오래 막지 않는다.
+    after를 주면 그 점수 다음부터 이어서 읽는다.
+    """
+    lower = "-inf" if after is None else f"({after!r}"
+    last_score = None
+    seen_at_last = set()  # 같은 점수의 사용자가 페이지 경계에 걸친 경우 중복 제외
+    while True:
+        fetch = page_size + len(seen_at_last)
+        members = await redis_client.zrangebyscore(QUEUE_KEY, lower, "+inf", start=0, num=fetch, withscores=True)
+        page = [
+            (user_id_bytes.decode('utf-8'), score)
+            for user_id_bytes, score in members
+            if user_id_bytes not in seen_at_last
+        ][:page_size]
+        if not page:
+            return
+        yield page
+        if len(members) < fetch:
+            return
+
+        if page[-1][1] != last_score:
+            seen_at_last = set()
+        last_score = page[-1][1]
+        seen_at_last |= {user_id.encode('utf-8') for user_id, score in page if score == last_score}
+        lower = repr(last_score)
+
+
+async def adequeue_users(redis_client, user_ids: List[str]):
+    """여러 사용자를 match_queue와 버킷 인덱스에서 한 번에 제거"""
+    if not user_ids:
+        return
+    member_keys = [user_bucket_key(user_id) for user_id in user_ids]
+    buckets = await redis_client.mget(member_keys)
+
+    pipe = redis_client.pipeline()
+    pipe.zrem(QUEUE_KEY, *user_ids)
+    for user_id, bucket in zip(user_ids, buckets):
+        if bucket:
+            pipe.zrem(bucket.decode('utf-8'), user_id)
+    pipe.delete(*member_keys)
+    await pipe.execute()
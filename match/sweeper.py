@@ -0,0 +1,186 @@
+# match/sweeper.py
+"""
+큐 정리 작업 (Sweeper)
+
+매칭 경로(_iter_compatible_partners)는 오프라인 사용자를 건너뛰기만 하고,
+쓰레기 정리는 별도 프로세스(python manage.py run_sweeper)가 주기적으로 한 번에 처리한다.
+- stale_users: heartbeat가 끊긴 사용자 -> 연결 해제 정리 + 상대에게 알림 (sessions.py, MATCH_SWEEP_STALE_USERS일 때만)
+- stale_queue: heartbeat가 끊긴 대기자 -> 큐/버킷에서만 제거 (항상 - 매칭 경로가 건너뛰기만 하는 죽은 멤버가 버킷 앞자리를 차지하지 않도록)
+- orphan_user_matches: 가리키는 match_requests가 없는 user_matches:*
+- expired_matches: 생성 후 MATCH_REQUEST_TTL이 지났는데 남아 있는 match_requests:* (TTL 유실 등)
+- expired_holds: 만료 시각이 지난 매칭 비용 홀드 (매치가 TTL로 사라진 경우)
+- expired_sessions: 재접속 유예가 끝난 사용자 -> 연결 해제 정리 + 상대에게 알림 (sessions.py)
+"""
+import asyncio
+import logging
+import time
+from typing import AsyncIterator, Dict, List
+
+from channels.layers import get_channel_layer
+from gem.services import release_expired_holds, release_gems
+from tori_backend.redis_client import get_redis, load_script
+from tori_backend.settings.constants import (
+    MATCH_REQUEST_TTL, MATCH_STATE_PAGE_SIZE, MATCH_SWEEP_INTERVAL_MS, MATCH_SWEEP_SCAN_COUNT, MATCH_SWEEP_STALE_USERS,
+)
+
+from . import presence
+from . import events
+from .counters import PENDING_KEY
+from .events import emit_event
+from .scripts import CLEAR_MATCH_LUA, CLEAR_ORPHAN_MATCH_LUA, DEQUEUE_STALE_LUA
+from .state import QUEUE_KEY
+
+logger = logging.getLogger(__name__)
+
+USER_MATCHES_PREFIX = "user_matches:"
+MATCH_REQUESTS_PREFIX = "match_requests:"
+
+
+async def sweep_stale_users(redis_client, channel_layer) -> int:
+    """
+    heartbeat가 끊긴 사용자(워커가 죽어 disconnect가 호출되지 않은 연결 등)를 연결 해제와 같은 경로로 정리
+    - DISCONNECT_USER_LUA로 큐/버킷/presence/진행 중 매치(상대 user_matches 포함) 제거, 매칭 비용 홀드 반환
+    - 방 정리, 상대 재등록 및 match_cancelled 알림
+    """
+    # sessions -> services -> sweeper 순환 import 방지
+    from .sessions import end_user_session
+
+    offline_users = await presence.stale_users(redis_client)
+    for user_id in offline_users:
+        await end_user_session(user_id, channel_layer)
+    if offline_users:
+        logger.info(f"Swept offline users: {offline_users}")
+    return len(offline_users)
+
+
+async def sweep_stale_queue(redis_client, page_size: int = MATCH_STATE_PAGE_SIZE, now: float = None) -> int:
+    """
+    heartbeat가 끊긴 대기자를 큐/버킷에서만 제거 (진행 중 매치/방/세션은 건드리지 않음)
+    재접속 유예 중인 사용자는 유지. 다시 연결해 join_queue하면 새로 등록된다.
+    """
+    cutoff = presence.presence_cutoff(now)
+    dequeue_stale = load_script(redis_client, DEQUEUE_STALE_LUA)
+    removed = []
+    start = 0
+    while True:
+        # 제거하면 뒤 멤버의 순번이 당겨지므로, 제거한 수만큼 다음 페이지 시작을 당긴다
+        members = await redis_client.zrange(QUEUE_KEY, start, start + page_size - 1)
+        if not members:
+            break
+        user_ids = [member.decode('utf-8') for member in members]
+        stale = await dequeue_stale(
+            keys=[QUEUE_KEY, presence.PRESENCE_KEY, presence.GRACE_KEY], args=[cutoff, *user_ids], client=redis_client,
+        )
+        removed.extend(user_id.decode('utf-8') for user_id in stale)
+        if len(members) < page_size:
+            break
+        start += page_size - len(stale)
+    if removed:
+        logger.info(f"Dequeued stale queue members: {removed}")
+    return len(removed)
+
+
+async def _scan_batches(redis_client, pattern: str, count: int) -> AsyncIterator[List[bytes]]:
+    """SCAN 결과를 count개씩 묶어서 반환"""
+    batch = []
+    async for key in redis_client.scan_iter(match=pattern, count=count):
+        batch.append(key)
+        if len(batch) >= count:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def sweep_orphan_user_matches(redis_client, scan_count: int = MATCH_SWEEP_SCAN_COUNT) -> int:
+    """매치 기록이 사라졌는데 남아 있는 user_matches:* 제거"""
+    clear_orphan = load_script(redis_client, CLEAR_ORPHAN_MATCH_LUA)
+    cleaned = 0
+    async for keys in _scan_batches(redis_client, f"{USER_MATCHES_PREFIX}*", scan_count):
+        match_ids = await redis_client.mget(keys)
+        pipe = redis_client.pipeline(transaction=False)
+        for match_id in match_ids:
+            pipe.exists(f"{MATCH_REQUESTS_PREFIX}{match_id.decode('utf-8')}" if match_id else "")
+        exists = await pipe.execute()
+
+        for key, match_id, found in zip(keys, match_ids, exists):
+            if not match_id or found:
+                continue
+            # 조회 이후 새 매치가 기록됐을 수 있으므로 스크립트에서 다시 확인하고 지운다
+            cleaned += await clear_orphan(
+                keys=[key, f"{MATCH_REQUESTS_PREFIX}{match_id.decode('utf-8')}"],
+                args=[match_id],
+                client=redis_client,
+            )
+    return cleaned
+
+
+async def sweep_expired_matches(redis_client, scan_count: int = MATCH_SWEEP_SCAN_COUNT, now: float = None) -> int:
+    """생성 후 MATCH_REQUEST_TTL이 지난 match_requests:*와 그 user_matches 제거"""
+    now = now if now is not None else time.time()
+    deadline = now - MATCH_REQUEST_TTL
+    # 응답 마감은 DeadlineScheduler(deadlines.py)가 처리 - 여기서는 스케줄러가 놓친 채 TTL로 사라진 매치만 제외
+    await redis_client.zremrangebyscore(PENDING_KEY, "-inf", deadline)
+    clear_match = load_script(redis_client, CLEAR_MATCH_LUA)
+    cleaned = 0
+    async for keys in _scan_batches(redis_client, f"{MATCH_REQUESTS_PREFIX}*", scan_count):
+        pipe = redis_client.pipeline(transaction=False)
+        for key in keys:
+            pipe.hmget(key, 'user1', 'user2', 'created_at', 'hold_user', 'hold_id')
+        records = await pipe.execute()
+
+        for key, (user1, user2, created_at, hold_user, hold_id) in zip(keys, records):
+            if created_at is None or float(created_at) >= deadline:
+                continue
+            match_id = key.decode('utf-8')[len(MATCH_REQUESTS_PREFIX):]
+            cleared = await clear_match(
+                keys=[key, f"{USER_MATCHES_PREFIX}{(user1 or b'').decode('utf-8')}",
+                      f"{USER_MATCHES_PREFIX}{(user2 or b'').decode('utf-8')}", PENDING_KEY],
+                args=[match_id, created_at],
+                client=redis_client,
+            )
+            if cleared and hold_user and hold_id:
+                await release_gems(hold_user.decode('utf-8'), hold_id.decode('utf-8'))
+            if cleared and user1 and user2:
+                match_data = {
+                    'match_id': match_id, 'created_at': created_at.decode('utf-8'),
+                    'user1': user1.decode('utf-8'), 'user2': user2.decode('utf-8'),
+                }
+                await emit_event(redis_client, events.CANCELLED, reason='expired', **events.match_fields(match_data))
+            cleaned += cleared
+    return cleaned
+
+
+class QueueSweeper:
+    def __init__(self, interval_ms: int = MATCH_SWEEP_INTERVAL_MS, scan_count: int = MATCH_SWEEP_SCAN_COUNT):
+        self.interval = interval_ms / 1000
+        self.scan_count = scan_count
+
+    async def run_forever(self):
+        logger.info(f"Queue sweeper started (interval={self.interval}s, scan_count={self.scan_count})")
+        while True:
+            started = time.monotonic()
+            try:
+                await self.run_sweep()
+            except Exception as e:
+                logger.error(f"Queue sweep failed: {e}", exc_info=True)
+            await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+    async def run_sweep(self) -> Dict[str, int]:
+        """한 번의 정리 - 항목별 정리 개수 반환"""
+        # sessions -> services -> sweeper 순환 import 방지
+        from .sessions import sweep_expired_sessions
+
+        redis_client = get_redis()
+        channel_layer = get_channel_layer()
+        counts = {
+            'expired_sessions': await sweep_expired_sessions(redis_client, channel_layer),
+            'stale_users': await sweep_stale_users(redis_client, channel_layer) if MATCH_SWEEP_STALE_USERS else 0,
+            'stale_queue': await sweep_stale_queue(redis_client),
+            'expired_matches': await sweep_expired_matches(redis_client, self.scan_count),
+            'orphan_user_matches': await sweep_orphan_user_matches(redis_client, self.scan_count),
+            'expired_holds': await release_expired_holds(),
+        }
+        if any(counts.values()):
+            logger.info(f"Queue sweep cleaned {counts}")
+        return counts
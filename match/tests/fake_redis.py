@@ -0,0 +1,57 @@
+"""
+테스트용 Redis - get_redis()가 이벤트 루프마다 fakeredis 클라이언트를 돌려주도록 교체한다.
+클라이언트는 실제 커넥션 풀처럼 자신을 만든 이벤트 루프에 묶여 있어서,
+다른 루프의 클라이언트를 잘못 재사용하면 바로 실패한다.
+fakeredis[lua]가 없으면 이 모듈을 쓰는 테스트는 건너뛴다.
+"""
+import asyncio
+from unittest import mock, skipIf
+
+from tori_backend import redis_client
+
+try:
+    import fakeredis
+except ImportError:  # 개발 의존성 (requirements-dev.txt)
+    fakeredis = None
+
+requires_fakeredis = skipIf(fakeredis is None, "fakeredis not installed")
+
+
+if fakeredis is not None:
+    class LoopBoundFakeRedis(fakeredis.FakeAsyncRedis):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.loop = asyncio.get_running_loop()
+
+        async def execute_command(self, *args, **options):
+            if asyncio.get_running_loop() is not self.loop:
+                raise RuntimeError("Redis client used outside the event loop it was created on")
+            return await super().execute_command(*args, **options)
+
+
+class _LoopClients(dict):
+    """tori_backend.redis_client._clients 대체 - 루프마다 같은 가짜 서버에 붙는 새 클라이언트"""
+
+    def __init__(self, server):
+        super().__init__()
+        self.server = server
+
+    def get(self, loop, default=None):
+        if loop not in self:
+            self[loop] = LoopBoundFakeRedis(server=self.server)
+        return dict.get(self, loop)
+
+
+class FakeRedisMixin:
+    """SimpleTestCase/TestCase에 섞어 쓰는 fakeredis 설정 (self.redis_server로 직접 확인 가능)"""
+
+    def setUp(self):
+        super().setUp()
+        self.redis_server = fakeredis.FakeServer()
+        patcher = mock.patch.object(redis_client, "_clients", _LoopClients(self.redis_server))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def sync_redis(self):
+        """이벤트 루프 밖에서 상태를 확인할 때 쓰는 동기 클라이언트"""
+        return fakeredis.FakeRedis(server=self.redis_server)
@@ -0,0 +1,30 @@
+from django.test import SimpleTestCase
+from match.buckets import age_band, bucket_for_setting, candidate_bucket_keys, bucket_key
+
+
+class BucketTests(SimpleTestCase):
+    def setUp(self):
+        self.me = {
+            'user_age': 25, 'user_gender': 'male',
+            'age_min': 20, 'age_max': 29, 'preferred_gender': 'female',
+        }
+
+    def test_bucket_for_setting(self):
+        self.assertEqual(bucket_for_setting(self.me), bucket_key('male', 'female', age_band(25)))
+
+    def test_bucket_for_setting_missing_info(self):
+        self.assertIsNone(bucket_for_setting({**self.me, 'user_age': None}))
+        self.assertIsNone(bucket_for_setting(None))
+
+    def test_candidate_buckets_only_mutually_compatible(self):
+        keys = candidate_bucket_keys(self.me)
+        self.assertIn(bucket_key('female', 'male', age_band(22)), keys)
+        self.assertIn(bucket_key('female', 'any', age_band(29)), keys)
+        self.assertNotIn(bucket_key('male', 'female', age_band(25)), keys)
+        self.assertNotIn(bucket_key('female', 'female', age_band(25)), keys)
+        self.assertNotIn(bucket_key('female', 'male', age_band(35)), keys)
+
+    def test_candidate_buckets_any_gender(self):
+        keys = candidate_bucket_keys({**self.me, 'preferred_gender': 'any'})
+        self.assertIn(bucket_key('male', 'male', age_band(25)), keys)
+        self.assertIn(bucket_key('female', 'any', age_band(25)), keys)
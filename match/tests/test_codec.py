@@ -0,0 +1,50 @@
+from unittest import skipIf
+
+from django.test import SimpleTestCase
+from match import codec
+from match.codec import JSON_CODEC, MESSAGE_CODES, get_codec, negotiate
+
+
+class CodecNegotiationTests(SimpleTestCase):
+    def test_defaults_to_json(self):
+        self.assertEqual(negotiate({"query_string": b""}), (JSON_CODEC, None))
+
+    def test_unknown_codec_falls_back_to_json(self):
+        self.assertEqual(negotiate({"query_string": b"codec=xml", "subprotocols": ["tori.xml"]}), (JSON_CODEC, None))
+
+    @skipIf(codec.msgpack is None, "msgpack not installed")
+    def test_subprotocol_wins_over_query(self):
+        selected, subprotocol = negotiate({"query_string": b"codec=json", "subprotocols": ["tori.msgpack"]})
+        self.assertEqual((selected.name, subprotocol), ("msgpack", "tori.msgpack"))
+
+    @skipIf(codec.msgpack is None, "msgpack not installed")
+    def test_query_parameter(self):
+        selected, subprotocol = negotiate({"query_string": b"resume=x&codec=msgpack"})
+        self.assertEqual((selected.name, subprotocol), ("msgpack", None))
+
+
+class CodecRoundTripTests(SimpleTestCase):
+    message = {"type": "match_found", "partner": "토리", "partner_age": 25}
+
+    def test_json_text_frame(self):
+        text_data, bytes_data = JSON_CODEC.encode(self.message)
+        self.assertIsNone(bytes_data)
+        self.assertEqual(JSON_CODEC.decode(text_data, None), self.message)
+
+    @skipIf(codec.msgpack is None, "msgpack not installed")
+    def test_msgpack_uses_type_codes(self):
+        msgpack_codec = get_codec("msgpack")
+        text_data, bytes_data = msgpack_codec.encode(self.message)
+        self.assertIsNone(text_data)
+        self.assertEqual(codec.msgpack.unpackb(bytes_data)["type"], MESSAGE_CODES["match_found"])
+        self.assertEqual(msgpack_codec.decode(None, bytes_data), self.message)
+
+    @skipIf(codec.msgpack is None, "msgpack not installed")
+    def test_msgpack_keeps_unknown_types_and_rejects_garbage(self):
+        msgpack_codec = get_codec("msgpack")
+        message = {"type": "custom", "action": MESSAGE_CODES["ping"]}
+        self.assertEqual(msgpack_codec.decode(None, codec.msgpack.packb(message)), {"type": "custom", "action": "ping"})
+        with self.assertRaises(ValueError):
+            msgpack_codec.decode(None, b"\xc1")
+        with self.assertRaises(ValueError):
+            msgpack_codec.decode(None, codec.msgpack.packb([1, 2]))
@@ -0,0 +1,47 @@
+import asyncio
+from unittest import mock
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from match.counters import COUNTERS_KEY, read_counters, reseed_active_rooms
+from match.models import MatchedRoom
+from tori_backend.redis_client import get_redis
+
+from .fake_redis import FakeRedisMixin, requires_fakeredis
+
+User = get_user_model()
+
+
+@requires_fakeredis
+class ActiveRoomsCounterTests(FakeRedisMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        first, second = [
+            User.objects.create_user(username=f"counter_{index}", email=f"counter_{index}@example.com", password="p")
+            for index in range(2)
+        ]
+        MatchedRoom.objects.create(user1=first, user2=second)
+        self.redis = self.sync_redis()
+        self.redis.hset(COUNTERS_KEY, 'active_rooms', 5)
+
+    def active_rooms(self):
+        async def read():
+            return (await read_counters(get_redis()))['active_rooms']
+        return asyncio.run(read())
+
+    def test_reseed_uses_database_count(self):
+        self.assertEqual(reseed_active_rooms(self.redis), 1)
+        self.assertEqual(self.active_rooms(), 1)
+
+    def test_drift_is_not_hidden(self):
+        self.redis.hset(COUNTERS_KEY, 'active_rooms', -2)
+        self.assertEqual(self.active_rooms(), -2)
+
+    def test_app_ready_keeps_rooms(self):
+        # 관리 명령(run_matcher 등)도 ready()를 거치므로 방/카운터를 건드리면 안 됨
+        with mock.patch.object(cache.client, 'get_client', return_value=self.redis):
+            apps.get_app_config('match').ready()
+        self.assertTrue(MatchedRoom.objects.exists())
+        self.assertEqual(self.active_rooms(), 5)
@@ -0,0 +1,113 @@
+import asyncio
+from unittest import mock
+
+from django.test import SimpleTestCase
+from match.event_consumers import (
+    EVENT_COUNTERS_EPOCH_KEY, EventGroupConsumer, check_group_lag, handle_metrics, rebuild_event_counters,
+)
+from match.events import STREAM_KEY, build_event, decode_entries
+from match.metrics import COUNTERS_KEY
+from tori_backend.redis_client import get_redis
+
+from .fake_redis import FakeRedisMixin, requires_fakeredis
+
+
+class TrimmedEntryTests(SimpleTestCase):
+    entries = [
+        (b'1-0', None),
+        (b'2-0', {}),
+        (b'3-0', {b'event': b'enqueued', b'at': b'1.0'}),
+    ]
+
+    def test_decode_skips_trimmed_entries(self):
+        self.assertEqual(decode_entries(self.entries), [('3-0', {'event': 'enqueued', 'at': '1.0'})])
+
+    def test_consume_acks_trimmed_entries(self):
+        redis_client = mock.Mock()
+        redis_client.xreadgroup = mock.AsyncMock(return_value=[[STREAM_KEY.encode(), self.entries]])
+        redis_client.xack = mock.AsyncMock()
+        handler = mock.AsyncMock()
+
+        handled = asyncio.run(EventGroupConsumer('metrics', handler, name='test')._consume(redis_client, "0", None))
+
+        self.assertEqual(handled, 3)
+        handler.assert_awaited_once_with([('3-0', {'event': 'enqueued', 'at': '1.0'})])
+        redis_client.xack.assert_awaited_once_with(STREAM_KEY, 'metrics', b'1-0', b'2-0', b'3-0')
+
+    def test_consume_only_trimmed_entries_skips_handler(self):
+        redis_client = mock.Mock()
+        redis_client.xreadgroup = mock.AsyncMock(return_value=[[STREAM_KEY.encode(), self.entries[:1]]])
+        redis_client.xack = mock.AsyncMock()
+        handler = mock.AsyncMock()
+
+        asyncio.run(EventGroupConsumer('metrics', handler, name='test')._consume(redis_client, "0", None))
+
+        handler.assert_not_awaited()
+        redis_client.xack.assert_awaited_once_with(STREAM_KEY, 'metrics', b'1-0')
+
+
+@requires_fakeredis
+class RebuildEventCountersTests(FakeRedisMixin, SimpleTestCase):
+    def count_events(self, names, trim_to=None):
+        async def scenario():
+            redis_client = get_redis()
+            entry_ids = [await redis_client.xadd(STREAM_KEY, build_event(name)) for name in names]
+            batch = decode_entries(await redis_client.xrange(STREAM_KEY))
+            await handle_metrics(batch)
+            if trim_to is not None:
+                await redis_client.xtrim(STREAM_KEY, maxlen=trim_to, approximate=False)
+            await redis_client.delete(COUNTERS_KEY)
+            await redis_client.hset(COUNTERS_KEY, 'match_events_total{event="enqueued"}', 99)
+            return entry_ids, await rebuild_event_counters(redis_client)
+        return asyncio.run(scenario())
+
+    def test_rebuilds_when_stream_covers_counters(self):
+        entry_ids, counts = self.count_events(['enqueued', 'enqueued', 'proposed'])
+        self.assertEqual(counts, {'enqueued': 2, 'proposed': 1})
+        redis = self.sync_redis()
+        self.assertEqual(redis.hget(COUNTERS_KEY, 'match_events_total{event="enqueued"}'), b'2')
+        self.assertEqual(redis.get(EVENT_COUNTERS_EPOCH_KEY), entry_ids[0])
+
+    def test_skips_when_stream_was_trimmed_past_epoch(self):
+        _, counts = self.count_events(['enqueued', 'enqueued', 'proposed'], trim_to=1)
+        self.assertIsNone(counts)
+        self.assertEqual(self.sync_redis().hget(COUNTERS_KEY, 'match_events_total{event="enqueued"}'), b'99')
+
+
+@requires_fakeredis
+class GroupStartTests(FakeRedisMixin, SimpleTestCase):
+    def run_once(self, group, before, after=0):
+        handler = mock.AsyncMock()
+
+        async def scenario():
+            redis_client = get_redis()
+            for _ in range(before):
+                await redis_client.xadd(STREAM_KEY, build_event('room_created'))
+            consumer = EventGroupConsumer(group, handler, name='test')
+            await consumer.run_once()
+            for _ in range(after):
+                await redis_client.xadd(STREAM_KEY, build_event('room_created'))
+            return await consumer.run_once()
+        return asyncio.run(scenario()), handler
+
+    def test_history_group_reads_events_added_before_it_existed(self):
+        _, handler = self.run_once('history', before=2)
+        self.assertEqual(len(handler.await_args_list[0].args[0]), 2)
+
+    def test_metrics_group_starts_at_new_events(self):
+        handled, handler = self.run_once('metrics', before=2, after=1)
+        self.assertEqual(handled, 1)
+        self.assertEqual(handler.await_count, 1)
+
+    def test_lag_check_reports_events_trimmed_before_read(self):
+        async def scenario():
+            redis_client = get_redis()
+            await redis_client.xgroup_create(STREAM_KEY, 'history', id="0", mkstream=True)
+            for _ in range(5):
+                await redis_client.xadd(STREAM_KEY, build_event('room_created'))
+            await redis_client.xtrim(STREAM_KEY, maxlen=2, approximate=False)
+            return await check_group_lag(redis_client, 'history')
+
+        with self.assertLogs('match.event_consumers', level='ERROR') as logs:
+            self.assertEqual(asyncio.run(scenario()), 5)
+        self.assertIn("lost 3 events", logs.output[0])
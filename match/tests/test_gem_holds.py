@@ -0,0 +1,85 @@
+import asyncio
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, override_settings
+from gem import services as gem_services
+from gem.services import AVAILABLE_KEY_PREFIX, HOLDS_KEY_PREFIX
+from match.matcher import BatchMatcher
+from match.services import MatchService
+
+from .fake_redis import FakeRedisMixin, requires_fakeredis
+
+User = get_user_model()
+
+IN_MEMORY_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+WANTS_FEMALE = {'age_min': 20, 'age_max': 30, 'preferred_gender': 'female', 'user_age': 25, 'user_gender': 'male'}
+WANTS_MALE = {'age_min': 20, 'age_max': 30, 'preferred_gender': 'male', 'user_age': 25, 'user_gender': 'female'}
+
+
+@requires_fakeredis
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYERS)
+class MatchingCostHoldTests(FakeRedisMixin, SimpleTestCase):
+    older = User(id=1, username="older", age=25, gender="female")
+    newer = User(id=2, username="newer", age=25, gender="male")
+
+    def setUp(self):
+        super().setUp()
+        redis_client = self.sync_redis()
+        for user in (self.older, self.newer):
+            redis_client.set(f"{AVAILABLE_KEY_PREFIX}:{user.id}", 100)
+
+    def available(self, user):
+        return int(self.sync_redis().get(f"{AVAILABLE_KEY_PREFIX}:{user.id}"))
+
+    def test_same_pair_gets_a_new_hold_per_match(self):
+        service = MatchService(self.newer)
+
+        async def charge_twice():
+            # 첫 매치의 홀드가 남아 있어도 같은 두 사람의 다음 매치는 따로 차감
+            for created_at in (100.0, 200.0):
+                claim = {'match_id': "1:2", 'created_at': created_at}
+                self.assertTrue(await service._charge_matching_cost(WANTS_FEMALE, self.older, claim))
+
+        asyncio.run(charge_twice())
+        self.assertEqual(self.available(self.newer), 40)
+        self.assertEqual(len(self.sync_redis().hgetall(f"{HOLDS_KEY_PREFIX}:{self.newer.id}")), 2)
+
+    def test_batch_matcher_charges_the_later_queued_user(self):
+        self.sync_redis().zadd("match_queue", {"1": 1.0, "2": 2.0})
+        waiting = {
+            "1": (1.0, self.older, WANTS_MALE),
+            "2": (2.0, self.newer, WANTS_FEMALE),
+        }
+        matcher = BatchMatcher()
+        # 대기자/제외 목록은 DB(MatchHistory)를 읽으므로 고정값으로 대체
+        no_exclusions = mock.AsyncMock(return_value={user_id: set() for user_id in waiting})
+        with mock.patch.object(matcher, "_load_waiting_users", mock.AsyncMock(return_value=waiting)), \
+                mock.patch("match.matcher.aget_exclusions", no_exclusions):
+            self.assertEqual(asyncio.run(matcher.run_tick()), 1)
+
+        # 소켓 경로에서 새로 들어온 사용자가 요청자로 차감되는 것과 같은 쪽
+        record = self.sync_redis().hgetall("match_requests:1:2")
+        self.assertEqual(record[b'hold_user'], b"2")
+        self.assertEqual(self.available(self.newer), 70)
+        self.assertEqual(self.available(self.older), 100)
+
+
+@requires_fakeredis
+class AvailableMirrorSeedTests(FakeRedisMixin, SimpleTestCase):
+    def test_balance_change_during_seed_is_not_cached(self):
+        balances = iter([100, 70])
+        redis_client = self.sync_redis()
+
+        def read_balance(user_id):
+            # 첫 DB 조회 직후 다른 워커가 30을 capture해 미러를 무효화한 상황
+            balance = next(balances)
+            if balance == 100:
+                redis_client.incr(f"gem_epoch:{user_id}")
+            return balance
+
+        with mock.patch.object(gem_services, "_wallet_balance", side_effect=read_balance):
+            available = asyncio.run(gem_services.get_available_gems(7))
+
+        self.assertEqual(available, 70)
+        self.assertEqual(redis_client.get(f"{AVAILABLE_KEY_PREFIX}:7"), b"70")
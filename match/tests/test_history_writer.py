@@ -0,0 +1,29 @@
+from django.test import SimpleTestCase
+from match.history_writer import build_record, event_record
+
+
+class HistoryRecordTests(SimpleTestCase):
+    def setUp(self):
+        self.match_data = {'match_id': '1:2', 'user1': '7', 'user2': '3', 'created_at': 1234567890.5}
+
+    def test_users_are_ordered(self):
+        record = build_record(self.match_data, 'accepted', now=10.0)
+        self.assertEqual((record['user1'], record['user2']), (3, 7))
+        self.assertEqual(record['at'], 10.0)
+
+    def test_event_id_is_stable_per_outcome(self):
+        first = build_record(self.match_data, 'rejected', now=1.0)
+        retry = build_record(self.match_data, 'rejected', now=2.0)
+        self.assertEqual(first['event_id'], retry['event_id'])
+        self.assertNotEqual(first['event_id'], build_record(self.match_data, 'expired')['event_id'])
+
+    def test_event_record(self):
+        fields = {'event': 'cancelled', 'reason': 'timeout', 'at': '5.0', **self.match_data}
+        record = event_record(fields)
+        self.assertEqual((record['outcome'], record['at']), ('expired', 5.0))
+        self.assertEqual(record['event_id'], build_record(self.match_data, 'expired')['event_id'])
+        self.assertEqual(event_record({**fields, 'reason': 'disconnected'})['outcome'], 'cancelled')
+
+    def test_event_record_skips_other_events(self):
+        self.assertIsNone(event_record({'event': 'accepted', 'at': '1.0', **self.match_data}))
+        self.assertIsNone(event_record({'event': 'rejected', 'at': '1.0', 'user1': '3'}))
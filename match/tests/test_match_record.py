@@ -0,0 +1,25 @@
+from django.test import SimpleTestCase
+from match.services import decode_match, encode_match
+
+
+class MatchRecordTests(SimpleTestCase):
+    def setUp(self):
+        self.match_data = {
+            'match_id': '1:2', 'user1': '1', 'user2': '2',
+            'user1_name': 'alice', 'user2_name': 'bob', 'status': 'pending',
+            'created_at': 1234567890.5, 'user1_response': None, 'user2_response': None,
+        }
+
+    def test_encode_flattens_fields(self):
+        args = encode_match(self.match_data)
+        self.assertEqual(args[:2], ['match_id', '1:2'])
+        self.assertEqual(dict(zip(args[::2], args[1::2]))['user1_response'], '')
+
+    def test_round_trip_from_hgetall(self):
+        args = encode_match(self.match_data)
+        raw = {key.encode(): value.encode() for key, value in zip(args[::2], args[1::2])}
+        self.assertEqual(decode_match(raw), self.match_data)
+
+    def test_decode_script_reply_list(self):
+        reply = [b'user1', b'1', b'user1_response', b'accept', b'updated_at', b'10']
+        self.assertEqual(decode_match(reply), {'user1': '1', 'user1_response': 'accept', 'updated_at': 10.0})
@@ -0,0 +1,53 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from match.buckets import user_bucket_key
+from match.models import MatchSetting
+from match.serializers import MatchSettingSerializer
+from rest_framework.test import APIClient
+
+from .fake_redis import FakeRedisMixin, requires_fakeredis
+
+User = get_user_model()
+
+
+@requires_fakeredis
+class MatchSettingTests(FakeRedisMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.redis = self.sync_redis()
+        patcher = mock.patch.object(cache.client, 'get_client', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user(username="setting_user", email="setting@example.com", password="p",
+                                             age=23, gender="male")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.setting = MatchSetting.objects.create(user=self.user, preferred_gender="female", age_min=20, age_max=30)
+
+    def test_cached_retrieve_matches_serializer(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get("/api/settings/")
+        self.assertEqual(response.json(), MatchSettingSerializer(self.setting).data)
+
+    def test_setting_change_moves_queued_user_to_new_bucket(self):
+        user_id = str(self.user.id)
+        self.redis.zadd("match_queue", {user_id: 12.0})
+        self.redis.zadd("match_bucket:male:female:4", {user_id: 12.0})
+        self.redis.set(user_bucket_key(user_id), "match_bucket:male:female:4")
+
+        self.setting.preferred_gender = "any"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.setting.save()
+
+        self.assertIsNone(self.redis.zscore("match_bucket:male:female:4", user_id))
+        self.assertEqual(self.redis.zscore("match_bucket:male:any:4", user_id), 12.0)
+        self.assertEqual(self.redis.get(user_bucket_key(user_id)), b"match_bucket:male:any:4")
+
+    def test_not_queued_user_is_left_alone(self):
+        self.setting.preferred_gender = "any"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.setting.save()
+        self.assertIsNone(self.redis.get(user_bucket_key(self.user.id)))
@@ -0,0 +1,37 @@
+import asyncio
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, override_settings
+from match.matcher import BatchMatcher
+
+from .fake_redis import FakeRedisMixin, requires_fakeredis
+
+User = get_user_model()
+
+IN_MEMORY_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+WANTS_MALE = {'age_min': 20, 'age_max': 30, 'preferred_gender': 'any', 'user_age': 25, 'user_gender': 'female'}
+WANTS_FEMALE = {'age_min': 20, 'age_max': 30, 'preferred_gender': 'any', 'user_age': 25, 'user_gender': 'male'}
+
+
+@requires_fakeredis
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYERS)
+class BatchMatcherTickTests(FakeRedisMixin, SimpleTestCase):
+    def run_tick(self, waiting):
+        matcher = BatchMatcher()
+        # 대기자/제외 목록은 DB를 읽으므로 고정값으로 대체
+        no_exclusions = mock.AsyncMock(return_value={user_id: set() for user_id in waiting})
+        with mock.patch.object(matcher, "_load_waiting_users", mock.AsyncMock(return_value=waiting)), \
+                mock.patch("match.matcher.aget_exclusions", no_exclusions):
+            return asyncio.run(matcher.run_tick())
+
+    def test_lost_claim_excludes_only_the_side_that_left(self):
+        # 1은 배치를 읽은 뒤 소켓 경로에서 이미 매칭돼 큐에서 빠짐 - 2는 다음 후보 3과 짝지어져야 함
+        self.sync_redis().zadd("match_queue", {"2": 2.0, "3": 3.0})
+        waiting = {
+            "1": (1.0, User(id=1, username="taken"), WANTS_FEMALE),
+            "2": (2.0, User(id=2, username="waiting"), WANTS_MALE),
+            "3": (3.0, User(id=3, username="newcomer"), WANTS_FEMALE),
+        }
+        self.assertEqual(self.run_tick(waiting), 1)
+        self.assertTrue(self.sync_redis().exists("match_requests:2:3"))
@@ -0,0 +1,171 @@
+import asyncio
+import time
+from unittest import mock
+
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TransactionTestCase, override_settings
+from gem.models import UserGemWallet
+from gem.services import get_available_gems
+from match.consumers import MatchConsumer
+from match.deadlines import DeadlineScheduler
+from match.models import MatchedRoom, MatchSetting
+from match.presence import PRESENCE_KEY
+from match.services import MatchService
+from tori_backend.redis_client import get_redis
+
+from .fake_redis import FakeRedisMixin, requires_fakeredis
+
+User = get_user_model()
+
+IN_MEMORY_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+
+
+@requires_fakeredis
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYERS)
+class MatchingFlowTests(FakeRedisMixin, TransactionTestCase):
+    """큐 등록 -> 선점 -> 응답/만료/연결 해제까지 Redis 상태와 보석 홀드를 함께 확인"""
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(cache.client, 'get_client', return_value=self.sync_redis())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # a가 요청자 (여성 선호 - 보석 30), b는 대기 중인 상대
+        self.a = self.make_user("flow_a", 25, "male", "female")
+        self.b = self.make_user("flow_b", 24, "female", "any")
+        user_ids = sorted([str(self.a.id), str(self.b.id)])  # MatchService._create_match와 같은 문자열 정렬
+        self.match_id = ":".join(user_ids)
+
+    def make_user(self, username, age, gender, preferred_gender):
+        user = User.objects.create_user(username=username, email=f"{username}@example.com", password="p",
+                                        age=age, gender=gender)
+        MatchSetting.objects.create(user=user, age_min=18, age_max=40, preferred_gender=preferred_gender)
+        UserGemWallet.objects.create(user=user, balance=100)
+        return user
+
+    async def claim(self):
+        """b가 먼저 기다리고 있고 a가 들어와 선점"""
+        service_a, service_b = MatchService(self.a), MatchService(self.b)
+        for service in (service_b, service_a):
+            await service.mark_user_online()
+            self.assertTrue(await service.add_to_queue())
+        result, partner = await service_a.find_and_match_atomic()
+        self.assertEqual((result, partner.id), ("match_created", self.b.id))
+        match_data = (await service_a.get_current_match_requests())[0]
+        return service_a, service_b, match_data
+
+    async def match_keys(self):
+        redis_client = get_redis()
+        return {
+            'queue': await redis_client.zrange("match_queue", 0, -1),
+            'user_matches': await redis_client.exists(f"user_matches:{self.a.id}", f"user_matches:{self.b.id}"),
+            'record': await redis_client.exists(f"match_requests:{self.match_id}"),
+            'pending': await redis_client.zcard("match_pending"),
+        }
+
+    def test_claim_removes_both_from_queue_and_holds_gems(self):
+        async def scenario():
+            _, _, match_data = await self.claim()
+            return match_data, await self.match_keys(), await get_available_gems(self.a.id)
+
+        match_data, keys, available = asyncio.run(scenario())
+        self.assertEqual(keys, {'queue': [], 'user_matches': 2, 'record': 1, 'pending': 1})
+        self.assertEqual((match_data['status'], match_data['hold_user']), ('pending', str(self.a.id)))
+        self.assertEqual(available, 70)
+
+    def test_both_accept_creates_room_and_captures_cost(self):
+        async def scenario():
+            service_a, service_b, match_data = await self.claim()
+            first = await service_a.update_match_status_and_create_room(match_data, 'accept')
+            second = await service_b.update_match_status_and_create_room(match_data, 'accept')
+            return first, second, await self.match_keys()
+
+        first, second, keys = asyncio.run(scenario())
+        self.assertEqual(first, ("waiting_for_partner", None))
+        self.assertEqual(second[0], "success")
+        self.assertEqual(keys, {'queue': [], 'user_matches': 0, 'record': 0, 'pending': 0})
+        self.assertTrue(MatchedRoom.objects.filter(user1=self.a, user2=self.b).exists())
+        self.assertEqual(UserGemWallet.objects.get(user=self.a).balance, 70)
+
+    def test_reject_requeues_both_and_releases_hold(self):
+        async def scenario():
+            service_a, _, match_data = await self.claim()
+            result = await service_a.update_match_status_and_create_room(match_data, 'reject')
+            return result, await self.match_keys(), await get_available_gems(self.a.id)
+
+        (result, partner), keys, available = asyncio.run(scenario())
+        self.assertEqual((result, partner.id), ("rejected", self.b.id))
+        self.assertEqual(sorted(keys['queue']), sorted([str(self.a.id).encode(), str(self.b.id).encode()]))
+        self.assertEqual((keys['user_matches'], keys['record'], keys['pending']), (0, 0, 0))
+        self.assertEqual(available, 100)
+        self.assertFalse(MatchedRoom.objects.exists())
+
+    def test_disconnect_cancels_match_and_requeues_partner(self):
+        async def scenario():
+            service_a, _, _ = await self.claim()
+            affected = await service_a.handle_disconnect_cleanup()
+            redis_client = get_redis()
+            return (affected, await self.match_keys(), await get_available_gems(self.a.id),
+                    await redis_client.zscore(PRESENCE_KEY, str(self.a.id)))
+
+        affected, keys, available, presence = asyncio.run(scenario())
+        self.assertEqual(sorted(affected), sorted([self.a.id, self.b.id]))
+        self.assertEqual(keys, {'queue': [str(self.b.id).encode()], 'user_matches': 0, 'record': 0, 'pending': 0})
+        self.assertEqual(available, 100)
+        self.assertIsNone(presence)
+
+    def test_deadline_expiry_requeues_only_the_responder(self):
+        async def scenario():
+            layer = get_channel_layer()
+            for user in (self.a, self.b):
+                await layer.group_add(f"user_{user.id}", f"flow.{user.id}")
+            _, service_b, match_data = await self.claim()
+            await service_b.update_match_status_and_create_room(match_data, 'accept')
+
+            scheduler = DeadlineScheduler()
+            self.assertEqual(await scheduler.run_due(), 0)  # 아직 마감 전
+            self.assertEqual(await scheduler.run_due(now=time.time() + 60), 1)
+            notices = {user.id: await layer.receive(f"flow.{user.id}") for user in (self.a, self.b)}
+            return notices, await self.match_keys(), await get_available_gems(self.a.id)
+
+        notices, keys, available = asyncio.run(scenario())
+        self.assertEqual(keys, {'queue': [str(self.b.id).encode()], 'user_matches': 0, 'record': 0, 'pending': 0})
+        self.assertEqual(available, 100)
+        self.assertEqual(notices[self.b.id]['reason'], 'timeout')
+        self.assertTrue(notices[self.b.id]['requeued'])
+        self.assertFalse(notices[self.a.id]['requeued'])
+
+    def test_duplicate_login_closes_old_socket_and_clears_its_queue(self):
+        def communicator():
+            client = WebsocketCommunicator(MatchConsumer.as_asgi(), "/ws/match/")
+            client.scope["user"] = self.a
+            return client
+
+        async def scenario():
+            redis_client = get_redis()
+            old = communicator()
+            self.assertTrue((await old.connect())[0])
+            await old.receive_json_from()  # session
+            await old.send_json_to({"action": "join_queue"})
+            await asyncio.sleep(0.1)
+            self.assertIsNotNone(await redis_client.zscore("match_queue", str(self.a.id)))
+
+            new = communicator()
+            self.assertTrue((await new.connect())[0])
+            session = await new.receive_json_from()
+            closed = await old.receive_output(1)
+            await old.disconnect()  # 대체된 연결의 해제는 새 세션을 건드리지 않음
+
+            state = (await redis_client.zscore("match_queue", str(self.a.id)),
+                     await redis_client.zscore(PRESENCE_KEY, str(self.a.id)))
+            await new.disconnect()
+            return session, closed, state
+
+        session, closed, (queued, presence) = asyncio.run(scenario())
+        self.assertFalse(session["resumed"])
+        self.assertEqual(closed["type"], "websocket.close")
+        self.assertIsNone(queued)
+        self.assertIsNotNone(presence)
@@ -0,0 +1,48 @@
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from match.metrics import MetricsBatch, _bucket_for, _sample
+from match.views import MetricsView
+
+from .fake_redis import FakeRedisMixin, requires_fakeredis
+
+
+class MetricsTests(SimpleTestCase):
+    def test_sample_labels_sorted(self):
+        self.assertEqual(_sample('match_stage_seconds', {}), 'match_stage_seconds')
+        self.assertEqual(
+            _sample('match_attempts_total', {'result': 'no_match', 'a': 'b'}),
+            'match_attempts_total{a="b",result="no_match"}',
+        )
+
+    def test_bucket_for(self):
+        self.assertEqual(_bucket_for('match_stage_seconds', 0.003), '0.005')
+        self.assertEqual(_bucket_for('match_stage_seconds', 60), '+Inf')
+        self.assertEqual(_bucket_for('match_time_in_queue_seconds', 45), '60.0')
+
+    def test_batch_collects(self):
+        batch = MetricsBatch()
+        batch.inc('match_attempts_total', result='no_match')
+        batch.inc('match_attempts_total', result='no_match')
+        with batch.time(stage='scan'):
+            pass
+        self.assertEqual(batch.counters['match_attempts_total{result="no_match"}'], 2)
+        self.assertEqual(batch.observations[0][:2], ('match_stage_seconds{stage="scan"}', 'match_stage_seconds'))
+
+
+@requires_fakeredis
+@override_settings(MATCH_METRICS_TOKEN="scrape-secret")
+class MetricsViewTests(FakeRedisMixin, SimpleTestCase):
+    def get(self, **headers):
+        return MetricsView.as_view()(RequestFactory().get('/metrics/', headers=headers))
+
+    def test_requires_credentials(self):
+        self.assertEqual(self.get().status_code, 401)
+        self.assertEqual(self.get(authorization="Token wrong").status_code, 401)
+
+    def test_scraper_token(self):
+        response = self.get(authorization="Token scrape-secret")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+
+    @override_settings(MATCH_METRICS_TOKEN="")
+    def test_empty_token_is_never_accepted(self):
+        self.assertEqual(self.get(authorization="Token ").status_code, 401)
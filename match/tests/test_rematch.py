@@ -0,0 +1,84 @@
+import asyncio
+from unittest import mock
+
+from django.test import SimpleTestCase
+from match.rematch import RematchDispatcher, backoff_delay, parse_queue_event, queue_event
+from tori_backend.settings.constants import MATCH_REMATCH_BACKOFF_BASE_MS, MATCH_REMATCH_BACKOFF_MAX_MS
+
+SETTING = {'age_min': 20, 'age_max': 25, 'preferred_gender': 'female', 'user_age': 22, 'user_gender': 'male'}
+WIDE_SETTING = {**SETTING, 'age_max': 35}
+NEWCOMER = {'age_min': 20, 'age_max': 30, 'preferred_gender': 'any', 'user_age': 30, 'user_gender': 'female'}
+
+
+class FakeConsumer:
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.attempts = 0
+
+    async def try_match(self):
+        self.attempts += 1
+
+
+@mock.patch.object(RematchDispatcher, "_ensure_listener", lambda self: None)
+class RematchDispatchTests(SimpleTestCase):
+    def test_wakes_only_the_oldest_waiters(self):
+        async def scenario():
+            dispatcher = RematchDispatcher(debounce_ms=0, wake_limit=2)
+            consumers = [FakeConsumer(str(user_id)) for user_id in range(5)]
+            for consumer in consumers:
+                dispatcher.register(consumer, SETTING)
+                await asyncio.sleep(0.001)
+            # 가장 오래 기다린 사용자가 재시도 후 다시 등록돼도 맨 앞 자리 유지
+            dispatcher.suspend("0")
+            dispatcher.register(consumers[0], SETTING)
+
+            dispatcher.dispatch(dispatcher.buckets_of["0"])
+            await asyncio.sleep(0.01)
+            return [consumer.attempts for consumer in consumers]
+
+        self.assertEqual(asyncio.run(scenario()), [1, 1, 0, 0, 0])
+
+    def test_unregister_forgets_the_waiting_order(self):
+        async def scenario():
+            dispatcher = RematchDispatcher(debounce_ms=0, wake_limit=1)
+            first, second = FakeConsumer("1"), FakeConsumer("2")
+            dispatcher.register(first, SETTING)
+            await asyncio.sleep(0.001)
+            dispatcher.register(second, SETTING)
+            dispatcher.unregister("1")  # 매칭됨 / 큐 이탈
+            await asyncio.sleep(0.001)
+            dispatcher.register(first, SETTING)  # 새로 대기 - 맨 뒤
+
+            dispatcher.dispatch(dispatcher.buckets_of["1"])
+            await asyncio.sleep(0.01)
+            return first.attempts, second.attempts
+
+        self.assertEqual(asyncio.run(scenario()), (0, 1))
+
+    def test_wakes_only_waiters_compatible_with_the_newcomer(self):
+        async def scenario():
+            dispatcher = RematchDispatcher(debounce_ms=0, wake_limit=2)
+            # 같은 버킷을 보지만 0, 1은 새 대기자(30세)가 나이 범위 밖
+            consumers = [FakeConsumer(str(user_id)) for user_id in range(4)]
+            for consumer in consumers:
+                dispatcher.register(consumer, SETTING if consumer.user_id in ("0", "1") else WIDE_SETTING)
+                await asyncio.sleep(0.001)
+
+            dispatcher.dispatch(*parse_queue_event(queue_event(dispatcher.buckets_of["0"], [NEWCOMER])))
+            await asyncio.sleep(0.01)
+            return [consumer.attempts for consumer in consumers]
+
+        self.assertEqual(asyncio.run(scenario()), [0, 0, 1, 1])
+
+    def test_reads_bucket_only_events(self):
+        self.assertEqual(parse_queue_event('["match_bucket:female:male:4"]'), (["match_bucket:female:male:4"], []))
+
+
+class BackoffDelayTests(SimpleTestCase):
+    def test_grows_with_jitter_up_to_the_cap(self):
+        for attempt in range(20):
+            ceiling = min(MATCH_REMATCH_BACKOFF_MAX_MS, MATCH_REMATCH_BACKOFF_BASE_MS * 2 ** attempt) / 1000
+            delay = backoff_delay(attempt)
+            self.assertGreaterEqual(delay, ceiling / 2)
+            self.assertLessEqual(delay, ceiling)
+        self.assertGreater(len({backoff_delay(5) for _ in range(10)}), 1)
@@ -0,0 +1,46 @@
+import asyncio
+
+from django.test import SimpleTestCase
+from match.deadlines import DeadlineScheduler
+from match.sessions import (
+    SESSION_GRACE, SESSION_REPLACED, end_grace, issue_token, register_session, release_session, resume,
+)
+from tori_backend.redis_client import get_redis
+
+from .fake_redis import FakeRedisMixin, requires_fakeredis
+
+
+@requires_fakeredis
+class ScriptClientTests(FakeRedisMixin, SimpleTestCase):
+    """스크립트 객체는 프로세스 전체에서 공유되므로 호출마다 현재 루프의 클라이언트를 넘겨야 한다"""
+
+    def test_scripts_run_from_separate_event_loops(self):
+        async def connect(channel_name):
+            redis_client = get_redis()
+            epoch, replaced = await register_session(redis_client, 7, channel_name)
+            return epoch, replaced, await issue_token(redis_client, 7)
+
+        async def disconnect(epoch, token):
+            return await release_session(get_redis(), 7, epoch, token)
+
+        async def reconnect(token):
+            return await resume(get_redis(), 7, token)
+
+        async def give_up():
+            return await end_grace(get_redis(), 7)
+
+        async def expire(match_id):
+            return await DeadlineScheduler().expire_match(get_redis(), match_id)
+
+        first_epoch, replaced, _ = asyncio.run(connect("first"))
+        self.assertEqual((first_epoch, replaced), (1, None))
+        second_epoch, replaced, token = asyncio.run(connect("second"))
+        self.assertEqual((second_epoch, replaced), (2, "first"))
+
+        self.assertEqual(asyncio.run(disconnect(first_epoch, "")), SESSION_REPLACED)
+        self.assertEqual(asyncio.run(disconnect(second_epoch, token)), SESSION_GRACE)
+        self.assertEqual(asyncio.run(reconnect(token)), "")
+        self.assertEqual(asyncio.run(disconnect(second_epoch, token)), SESSION_GRACE)
+        self.assertEqual(asyncio.run(give_up()), "")
+        self.assertFalse(asyncio.run(expire("1:2")))
+
@@ -0,0 +1,69 @@
+import asyncio
+import time
+
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, override_settings
+from match.consumers import MatchConsumer
+from match.presence import PRESENCE_KEY
+from match.sessions import GRACE_KEY, session_key
+from match.state import afetch_user_states
+from tori_backend.redis_client import get_redis
+
+from .fake_redis import FakeRedisMixin, requires_fakeredis
+
+User = get_user_model()
+
+IN_MEMORY_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+
+
+@requires_fakeredis
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYERS)
+class SessionTakeoverTests(FakeRedisMixin, SimpleTestCase):
+    user = User(id=7, username="resume_user")
+
+    def communicator(self, query=""):
+        communicator = WebsocketCommunicator(MatchConsumer.as_asgi(), f"/ws/match/{query}")
+        communicator.scope["user"] = self.user
+        return communicator
+
+    def test_resume_while_old_socket_is_still_registered(self):
+        async def scenario():
+            redis_client = get_redis()
+            old = self.communicator()
+            connected, _ = await old.connect()
+            self.assertTrue(connected)
+            token = (await old.receive_json_from())["resume_token"]
+            await redis_client.zadd("match_queue", {"7": 1.0})  # 대기열에 있던 세션
+
+            # 이전 소켓은 반쯤 끊겨 disconnect가 아직 오지 않음 -> 유예 없이 바로 재개 요청
+            new = self.communicator(f"?resume={token}")
+            connected, _ = await new.connect()
+            self.assertTrue(connected)
+            session = await new.receive_json_from()
+            self.assertTrue(session["resumed"])
+
+            # 이전 연결은 종료되지만 세션(대기열)은 정리하지 않음
+            self.assertEqual((await old.receive_output(1))["type"], "websocket.close")
+            await old.disconnect()
+            self.assertIsNotNone(await redis_client.zscore("match_queue", "7"))
+            self.assertIsNone(await redis_client.zscore(GRACE_KEY, "7"))
+            self.assertEqual(await redis_client.hget(session_key(7), "epoch"), b"2")
+            await new.disconnect()
+
+        asyncio.run(scenario())
+
+
+@requires_fakeredis
+class GraceExpiryTests(FakeRedisMixin, SimpleTestCase):
+    def test_expired_grace_is_offline_before_the_sweeper_runs(self):
+        async def states():
+            redis_client = get_redis()
+            now = time.time()
+            # 유예가 시작될 때 heartbeat가 갱신되므로 presence만 보면 둘 다 온라인
+            await redis_client.zadd(PRESENCE_KEY, {"1": now, "2": now, "3": now})
+            await redis_client.zadd(GRACE_KEY, {"1": now - 1, "2": now + 10})
+            return await afetch_user_states(redis_client, ["1", "2", "3"])
+
+        result = asyncio.run(states())
+        self.assertEqual([result[user_id]['online'] for user_id in ("1", "2", "3")], [False, True, True])
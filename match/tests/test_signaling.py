@@ -0,0 +1,42 @@
+import asyncio
+
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, override_settings
+from match.consumers_signaling import VoiceChatSignalingConsumer
+
+User = get_user_model()
+
+IN_MEMORY_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+ROOM_NAME = "31_32"
+
+
+def communicator(user):
+    client = WebsocketCommunicator(VoiceChatSignalingConsumer.as_asgi(), f"/ws/voicechat/{ROOM_NAME}/")
+    client.scope["user"] = user
+    client.scope["url_route"] = {"kwargs": {"room_name": ROOM_NAME}}
+    return client
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYERS)
+class SignalingRelayTests(SimpleTestCase):
+    def test_relays_frames_unchanged(self):
+        async def scenario():
+            offer_side = communicator(User(id=31, username="offer_side"))
+            answer_side = communicator(User(id=32, username="answer_side"))
+            await offer_side.connect()
+            await offer_side.receive_json_from()  # role_assignment
+            await answer_side.connect()
+            await answer_side.receive_json_from()  # role_assignment
+            await offer_side.receive_json_from()  # 상대 접속 후 role_assignment
+
+            # 중계는 타입/내용을 보지 않음 - 클라이언트가 정의한 메시지도 그대로 전달
+            await offer_side.send_json_to({"type": "offer", "sdp": "v=0"})
+            await offer_side.send_json_to({"type": "mute", "muted": True})
+            relayed = [await answer_side.receive_json_from() for _ in range(2)]
+
+            await offer_side.disconnect()
+            await answer_side.disconnect()
+            return relayed
+
+        self.assertEqual(asyncio.run(scenario()), [{"type": "offer", "sdp": "v=0"}, {"type": "mute", "muted": True}])
@@ -0,0 +1,37 @@
+import asyncio
+
+from django.test import SimpleTestCase
+from match.presence import GRACE_KEY, PRESENCE_KEY
+from match.sweeper import sweep_stale_queue
+from tori_backend.redis_client import get_redis
+
+from .fake_redis import FakeRedisMixin, requires_fakeredis
+
+NOW = 1000.0
+BUCKET = "match_bucket:male:female:4"
+
+
+@requires_fakeredis
+class StaleQueueSweepTests(FakeRedisMixin, SimpleTestCase):
+    def test_dequeues_only_stale_members_outside_grace(self):
+        redis_client = self.sync_redis()
+        # 1: heartbeat 정상, 2: 끊김, 3: 기록 없음, 4: 끊겼지만 재접속 유예 중
+        queued = {"1": 1.0, "2": 2.0, "3": 3.0, "4": 4.0}
+        redis_client.zadd("match_queue", queued)
+        redis_client.zadd(BUCKET, queued)
+        for user_id in queued:
+            redis_client.set(f"match_bucket_of:{user_id}", BUCKET)
+        redis_client.zadd(PRESENCE_KEY, {"1": NOW, "2": NOW - 600, "4": NOW - 600})
+        redis_client.zadd(GRACE_KEY, {"4": NOW + 10})
+
+        async def sweep():
+            return await sweep_stale_queue(get_redis(), page_size=2, now=NOW)
+
+        removed = asyncio.run(sweep())
+
+        self.assertEqual(removed, 2)
+        self.assertEqual(redis_client.zrange("match_queue", 0, -1), [b"1", b"4"])
+        self.assertEqual(redis_client.zrange(BUCKET, 0, -1), [b"1", b"4"])
+        self.assertEqual(redis_client.exists("match_bucket_of:2", "match_bucket_of:3"), 0)
+        # 오프라인 대기자 정리는 presence를 건드리지 않음 (연결 해제 정리는 MATCH_SWEEP_STALE_USERS 쪽)
+        self.assertIsNotNone(redis_client.zscore(PRESENCE_KEY, "2"))
@@ -1,12 +1,39 @@
 # match/views.py
-from rest_framework import generics, permissions
+import hmac
+import json
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from rest_framework import generics, permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from tori_backend.redis_client import get_redis
+from tori_backend.settings.constants import MATCH_STATE_PAGE_SIZE
 from .models import MatchSetting
+from .metrics import render_prometheus
+from .profiles import get_profile
+from .services import MatchService
 from .serializers import MatchSettingSerializer  # ✅ 필요한 serializer import
 
 class MatchSettingView(generics.RetrieveUpdateAPIView):
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = MatchSettingSerializer  # ✅ 이 줄 추가
 
+    def retrieve(self, request, *args, **kwargs):
+        # 매칭 프로필 캐시에 설정이 있으면 DB를 거치지 않고 응답
+        profile = get_profile(request.user.id)
+        if profile and profile.get('setting_id') is not None:
+            setting = MatchSetting(
+                id=profile['setting_id'],
+                user_id=request.user.id,
+                preferred_gender=profile['preferred_gender'],
+                age_min=profile['age_min'],
+                age_max=profile['age_max'],
+                radius_km=profile['radius_km'],
+            )
+            return Response(self.get_serializer(setting).data)
+        return super().retrieve(request, *args, **kwargs)
+
     def get_object(self):
         obj, created = MatchSetting.objects.get_or_create(
             user=self.request.user,
@@ -21,3 +48,68 @@ class MatchSettingView(generics.RetrieveUpdateAPIView):
     
     def get_queryset(self):
         return MatchSetting.objects.filter(user=self.request.user)
+
+
+class QueueStatusView(APIView):
+    """매칭 큐 집계 (관리자용)"""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(async_to_sync(MatchService(request.user).get_queue_status)())
+
+
+class QueueUsersView(APIView):
+    """대기열 사용자 목록 (관리자용, ?offset=&limit= 페이지 단위)"""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        try:
+            offset = max(int(request.query_params.get('offset', 0)), 0)
+            limit = min(max(int(request.query_params.get('limit', MATCH_STATE_PAGE_SIZE)), 1), MATCH_STATE_PAGE_SIZE)
+        except ValueError:
+            return Response({"error": "offset과 limit은 정수여야 합니다."}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(async_to_sync(MatchService(request.user).get_queue_users)(offset, limit))
+
+
+class QueueSnapshotView(APIView):
+    """
+    대기열 전체 스냅샷 (관리자용, NDJSON 스트리밍)
+    ?page_size= 페이지 크기, ?after= 이 queued_at 다음부터 이어서 조회
+    한 번에 한 페이지만 메모리에 두고 보내므로 대기 인원이 많아도 메모리가 일정하다.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        try:
+            page_size = min(max(int(request.query_params.get('page_size', MATCH_STATE_PAGE_SIZE)), 1), MATCH_STATE_PAGE_SIZE)
+            after = request.query_params.get('after')
+            after = float(after) if after else None
+        except ValueError:
+            return Response({"error": "page_size와 after는 숫자여야 합니다."}, status=status.HTTP_400_BAD_REQUEST)
+
+        async def rows():
+            async for row in MatchService(request.user).iter_queue_snapshot(page_size, after):
+                yield json.dumps(row) + "\n"
+
+        return StreamingHttpResponse(rows(), content_type='application/x-ndjson')
+
+
+class HasMetricsToken(permissions.BasePermission):
+    """지표 수집기용 - Authorization: Token <MATCH_METRICS_TOKEN> (설정이 비어 있으면 항상 거부)"""
+
+    def has_permission(self, request, view):
+        token = settings.MATCH_METRICS_TOKEN
+        if not token:
+            return False
+        return hmac.compare_digest(request.headers.get('Authorization', '').encode(), f"Token {token}".encode())
+
+
+class MetricsView(APIView):
+    """매칭 지표 (Prometheus 텍스트 형식, 모든 워커 합산) - 관리자 또는 지표 수집기 토큰"""
+    permission_classes = [HasMetricsToken | permissions.IsAdminUser]
+
+    def get(self, request):
+        return HttpResponse(async_to_sync(self.render)(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+    async def render(self):
+        return await render_prometheus(get_redis())
@@ -13,6 +13,7 @@ logger = logging.getLogger(__name__)
 
 # 3. 모델 임포트
 from match.models import MatchQueue, MatchRequest, MatchedRoom
+from match.counters import reseed_active_rooms
 from django.db import transaction
 from django.conf import settings
 
@@ -45,6 +46,7 @@ def clear_match_data():
             cleared_requests = MatchRequest.objects.all().delete()
             cleared_rooms = MatchedRoom.objects.all().delete()
             logger.info(f"Cleared DB: MatchQueue={cleared_queue}, MatchRequest={cleared_requests}, MatchedRoom={cleared_rooms}")
+        reseed_active_rooms(redis_client)
     except Exception as e:
         logger.error(f"DB clear failed: {e}")
 
@@ -0,0 +1,49 @@
+# tori_backend/redis_client.py
+"""
+앱 공용 redis.asyncio 클라이언트와 Lua 스크립트 로더 (match / gem이 함께 사용)
+
+django.core.cache(redis-py 동기 클라이언트)를 async 코드에서 직접 부르면
+Redis 왕복마다 Daphne 이벤트 루프 전체가 멈춘다.
+MatchService / 매처 / 컨슈머 / 보석 홀드 경로는 모두 이 클라이언트를 await 해서 사용한다.
+커넥션 풀은 이벤트 루프에 묶이므로 루프마다 하나씩 만든다.
+"""
+import asyncio
+import weakref
+
+import redis.asyncio as aioredis
+from django.conf import settings
+
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_redis() -> aioredis.Redis:
+    """현재 이벤트 루프의 공유 클라이언트 (settings.MATCH_REDIS로 설정)"""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        config = settings.MATCH_REDIS
+        pool = aioredis.ConnectionPool.from_url(
+            config['URL'],
+            max_connections=config.get('MAX_CONNECTIONS', 100),
+            decode_responses=False,
+        )
+        client = aioredis.Redis(connection_pool=pool)
+        _clients[loop] = client
+    return client
+
+
+_registered = {}
+
+
+def load_script(redis_client, source: str):
+    """
+    스크립트 객체를 한 번만 등록해 재사용 (EVALSHA 사용, 동기/asyncio 클라이언트 별도)
+    스크립트 객체는 처음 등록한 클라이언트(= 그 이벤트 루프의 풀)에 묶여 있으므로
+    호출할 때는 항상 client=로 현재 클라이언트를 넘긴다.
+    """
+    key = (source, isinstance(redis_client, aioredis.Redis))
+    script = _registered.get(key)
+    if script is None:
+        script = redis_client.register_script(source)
+        _registered[key] = script
+    return script
@@ -33,6 +33,8 @@ GOOGLE_OAUTH2_CLIENT_ID = os.getenv("GOOGLE_OAUTH2_CLIENT_ID")
 GOOGLE_OAUTH2_ANDROID_CLIENT_ID = os.getenv("GOOGLE_OAUTH2_ANDROID_CLIENT_ID")
 GOOGLE_OAUTH2_CLIENT_SECRET = os.getenv("GOOGLE_OAUTH2_CLIENT_SECRET")
 RECAPTCHA_SECRET_KEY = os.getenv("RECAPTCHA_SECRET_KEY")
+# /metrics/ 수집기 토큰 (Authorization: Token <값>) - 비어 있으면 관리자만 조회 가능
+MATCH_METRICS_TOKEN = os.getenv("MATCH_METRICS_TOKEN", "")
 
 # --------------------------------
 # 공통 앱 설정
@@ -167,4 +169,4 @@ SIMPLE_JWT = {
 # Redis 설정 불러오기 (dev/prod 분기 포함)
 from .redis import get_redis_settings
 
-CACHES, CHANNEL_LAYERS = get_redis_settings()
\ No newline at end of file
+CACHES, CHANNEL_LAYERS, MATCH_REDIS = get_redis_settings()
\ No newline at end of file
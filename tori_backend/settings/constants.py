@@ -6,3 +6,60 @@ GEM_COST_BY_GENDER = {
 
 # settings.py
 REWARD_AMOUNT_PER_AD = 30
+
+# 매칭 호환성 인덱스 나이 구간 크기 (년)
+MATCH_AGE_BAND_SIZE = 5
+# 파트너 검색 시 버킷당 조회하는 최대 인원 (오래 기다린 순)
+MATCH_BUCKET_SCAN_LIMIT = 200
+# 동시 매칭 경쟁에서 진 경우 다음 후보로 넘어가며 시도하는 최대 횟수
+MATCH_CLAIM_ATTEMPTS = 5
+# 버킷 매칭 락 획득 대기 시간 (초) - 초과하면 matching_in_progress
+MATCH_LOCK_WAIT_TIMEOUT = 0.2
+
+# 큐 변경 이벤트를 받은 대기자의 재매칭 지연 (ms) - 이 시간 안의 이벤트는 한 번으로 합침
+MATCH_REMATCH_DEBOUNCE_MS = 200
+# 큐 변경 이벤트 하나에 재매칭을 예약하는 최대 대기자 수 (오래 기다린 순)
+MATCH_REMATCH_WAKE_LIMIT = 5
+# matching_in_progress 재시도 지수 백오프 (ms) - 첫 지연 / 상한, 실제 지연은 그 절반~전부 사이 무작위
+MATCH_REMATCH_BACKOFF_BASE_MS = 100
+MATCH_REMATCH_BACKOFF_MAX_MS = 3000
+
+# 백그라운드 매처 (python manage.py run_matcher)
+MATCHER_TICK_INTERVAL_MS = 500
+MATCHER_BATCH_SIZE = 500
+# 큐 스캔 시 한 번에 상태를 읽어 오는 인원 (파이프라인 1회)
+MATCH_STATE_PAGE_SIZE = 500
+# 마지막 heartbeat(ping / 수신 프레임 / 매칭 시도) 이후 이 시간(초)이 지나면 오프라인으로 간주
+MATCH_PRESENCE_TIMEOUT = 60
+# 정리 작업이 오프라인 사용자를 연결 해제 정리(매치/방/홀드까지)할지 여부
+# ping을 보내지 않는 기존 클라이언트는 대기 중 아무 프레임도 보내지 않을 수 있으므로, 모든 클라이언트가 ping을 보낸 뒤 켠다
+# 꺼져 있어도 heartbeat가 끊긴 대기자는 큐/버킷에서 빠진다 (다시 join_queue하면 재등록)
+MATCH_SWEEP_STALE_USERS = False
+# 연결이 끊긴 뒤 대기열/매치/방을 유지하며 재접속(resume)을 기다리는 시간 (초)
+# MATCH_PRESENCE_TIMEOUT보다 짧아야 유예 중에 오프라인 정리 대상이 되지 않음, 0이면 즉시 정리
+MATCH_RECONNECT_GRACE_SECONDS = 15
+# 매치 요청(match_requests:{id}) 보관 시간 (초) - 응답 마감 처리가 멈춰도 이 시간이 지나면 사라짐
+MATCH_REQUEST_TTL = 300
+# 매치 제안 응답 마감 (초) - 지나면 매치를 만료시키고 수락한 쪽은 다시 큐에 추가 (match/deadlines.py)
+MATCH_RESPONSE_TIMEOUT = 20
+# 응답 마감 확인 주기 (ms) - 다음 마감이 더 가까우면 그때 깨어남
+MATCH_DEADLINE_POLL_MS = 500
+
+# 수락/거절로 끝난 상대를 다시 제안하지 않는 시간 (초, match_exclude:{id} TTL)
+MATCH_EXCLUDE_TTL = 1800
+
+# 매치 생명주기 이벤트 스트림(match_events) 최대 길이 (근사치로 자름)
+MATCH_EVENT_STREAM_MAXLEN = 100000
+# 컨슈머 그룹이 한 번에 읽는 이벤트 수
+MATCH_EVENT_BATCH_SIZE = 200
+# 그룹이 읽지 않은 이벤트가 MAXLEN의 이 비율을 넘으면 경고 (더 밀리면 MAXLEN으로 잘려 유실)
+MATCH_EVENT_LAG_WARN_RATIO = 0.5
+# 컨슈머 그룹 밀림(lag) 확인 주기 (초)
+MATCH_EVENT_LAG_CHECK_INTERVAL = 30
+
+# 큐 정리 작업 (python manage.py run_sweeper)
+MATCH_SWEEP_INTERVAL_MS = 5000
+# SCAN 한 번에 가져오는 키 수 (user_matches:* / match_requests:*)
+MATCH_SWEEP_SCAN_COUNT = 500
+# 매칭 비용 홀드 유지 시간 (초) - 응답 대기 시간보다 길게, 지나면 정리 작업이 해제
+GEM_HOLD_TTL = 600
@@ -30,6 +30,16 @@ def get_redis_settings():
         'MATCH_TTL': 600,
     }
 
+    # 매칭 서비스용 redis.asyncio 커넥션 풀 (CACHES와 같은 DB를 사용해 키를 공유)
+    # 단일 Redis 노드 전제 - Redis Cluster 불가. 매칭 Lua 스크립트(match/scripts.py) 일부가
+    # 상대의 user_matches, 버킷 키처럼 실행 중에 정해지는 키를 KEYS 없이 접근한다.
+    # 클러스터로 옮기려면 그 스크립트들을 KEYS를 먼저 읽어 오는 두 단계로 나눠야 한다.
+    MATCH_REDIS = {
+        #'URL': f'redis://:{REDIS_PASSWORD}@{REDIS_HOST}:{REDIS_PORT}/1',
+        'URL': f'redis://:@{REDIS_HOST}:{REDIS_PORT}/1',
+        'MAX_CONNECTIONS': 100,
+    }
+
     CHANNEL_LAYERS = {
     "default": {
         "BACKEND": "channels_redis.core.RedisChannelLayer",
@@ -40,4 +50,4 @@ def get_redis_settings():
     },
     }
 
-    return CACHES, CHANNEL_LAYERS
+    return CACHES, CHANNEL_LAYERS, MATCH_REDIS
@@ -16,11 +16,14 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from match.views import MetricsView
 
 urlpatterns = [
     path('api/auth/', include('accounts.urls')),
     path('api/settings/', include('match.urls')),
+    path('api/match/', include('match.monitor_urls')),
     path('api/gem/', include('gem.urls')),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
 ]
 
 from django.conf import settings